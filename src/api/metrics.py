@@ -0,0 +1,47 @@
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.metrics import Histogram
+
+ROUTE_SECONDS = Histogram(
+    "worldmodel_http_request_duration_seconds",
+    "latency of the api routes, streams count until they close",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """
+    asgi middleware that times every http request under its route template,
+    so /api/snapshot/1 and /api/snapshot/2 share one series.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router adds the matched route to the scope
+            route = scope.get("route")
+            ROUTE_SECONDS.observe(
+                perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
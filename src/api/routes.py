@@ -1,6 +1,17 @@
-from typing import Annotated, cast
-from src.models.world_model import WorldModel
+import asyncio
+from typing import Annotated, AsyncIterator, cast
+
+import orjson
+
+from src.models.enums import EntityEnum
+from src.models.instrumentation import update_world_gauges
+from src.models.line_events import LineEvent, event_id
+from src.models.async_world_model import AsyncWorldModel
+from src.cluster.remote import RemoteWorldModel
 from src.api.schemas import (
+    BatchBody,
+    BatchResponse,
+    EntityResponse,
     RegisterBody,
     AcceptPersonBody,
     RegisterResponse,
@@ -8,20 +19,40 @@ from src.api.schemas import (
     UpdateSelfBody,
     PersonDeathBody,
     PersonInjuryBody,
+    PersonResponse,
+    PersonsResultResponse,
+    SnapshotResponse,
+    UtilizationResponse,
 )
+from src.api.responses import ORJSONResponse
 from src.utils.logger import get_logger
+from src.utils.metrics import CONTENT_TYPE, REGISTRY
+from src.utils.profiler import SamplingProfiler, default_profiler
+import src.config as config
 
 
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 logger = get_logger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+
+# a world of this process, or of the owner process in an api worker of src.cluster
+WorldApi = AsyncWorldModel | RemoteWorldModel
 
 
-def get_world_model(request: Request) -> WorldModel:
-    return cast(WorldModel, request.state.world_model)
+async def get_world_model(
+    request: Request, x_world_id: Annotated[str | None, Header()] = None
+) -> WorldApi:
+    if x_world_id is None:
+        return cast(WorldApi, request.state.world_model)
+
+    world_model = request.state.worlds.get(x_world_id)
+    if world_model is None:
+        raise HTTPException(404, "world does not exist")
+    return cast(WorldApi, world_model)
 
 
 # we should migrate all logic to business service
@@ -29,73 +60,286 @@ def get_world_model(request: Request) -> WorldModel:
 
 
 @router.post("/api/register", response_model=RegisterResponse)
-def register(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], body: RegisterBody
+async def register(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: RegisterBody
 ):
-    logger.info(f"api - register - entity_type: {body.entity_type}")
-    response = world_model.register(body.entity_type, body.max_capacity, body.eav)
+    logger.info("api - register - entity_type: %s", body.entity_type)
+    response = await world_model.register(body.entity_type, body.max_capacity, body.eav)
 
     return response
 
 
-@router.get("/api/snapshot/{entity_id}")
-def snapshot(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], entity_id: int
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # weak comparison of a list of etags, proxies may have made ours weak with W/
+    for value in if_none_match.split(","):
+        value = value.strip()
+        if value == "*" or value.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+@router.get(
+    "/api/snapshot/{entity_id}",
+    response_model=SnapshotResponse,
+    responses={304: {"description": "line did not change since the given ETag"}},
+)
+async def snapshot(
+    world_model: Annotated[WorldApi, Depends(get_world_model)],
+    entity_id: int,
+    if_none_match: Annotated[str | None, Header()] = None,
 ):  
-    logger.info(f"api - snapshot - entity_id: {entity_id}")
-    response = world_model.snapshot(entity_id=entity_id)
+    logger.info("api - snapshot - entity_id: %s", entity_id)
+    response = await world_model.snapshot(entity_id=entity_id)
+    if not response:
+        logger.error("api - snapshot: entity_id was not found - id:%s", entity_id)
+        return JSONResponse({"message": "entity does not exist in the worldmodel"}, 404)
+
+    # the same url serves every world, the X-World-Id header picks one
+    headers = {"ETag": response.etag, "Vary": "X-World-Id"}
+    if if_none_match and etag_matches(if_none_match, response.etag):
+        return Response(status_code=304, headers=headers)
+
+    return ORJSONResponse(response.to_json(), headers=headers)
+
+
+def format_sse(event: LineEvent, token: str) -> bytes:
+    # the id names the start of the world too, a resume after a restart gets a snapshot
+    sequence, name, data = event
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+        event_id(token, sequence).encode(),
+        name.encode(),
+        data,
+    )
+
+
+@router.get("/api/snapshot/{entity_id}/stream")
+async def snapshot_stream(
+    world_model: Annotated[WorldApi, Depends(get_world_model)],
+    entity_id: int,
+    last_event_id: Annotated[str | None, Header()] = None,
+    since: str | None = None,
+):
+    logger.info("api - snapshot_stream - entity_id: %s", entity_id)
+    stream = await world_model.open_line_stream(
+        entity_id, since if since is not None else last_event_id
+    )
+    if not stream:
+        logger.error(
+            "api - snapshot_stream: entity_id was not found - id:%s",
+            entity_id,
+        )
+        return JSONResponse({"message": "entity does not exist in the worldmodel"}, 404)
+
+    subscription, initial_events = stream
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            for event in initial_events:
+                yield format_sse(event, subscription.token)
+            while not subscription.overflowed or not subscription.queue.empty():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), 15)
+                except TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield format_sse(event, subscription.token)
+        finally:
+            world_model.close_line_stream(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get("/api/person/national-code/{national_code}", response_model=PersonResponse)
+async def person_by_national_code(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], national_code: str
+):
+    logger.info("api - person_by_national_code - national_code: %s", national_code)
+    person_json = await world_model.person_json_by_national_code(national_code)
+    if not person_json:
+        return JSONResponse({"message": "person does not exist in the worldmodel"}, 404)
+
+    return ORJSONResponse(person_json)
+
+
+@router.get("/api/person/{person_id}", response_model=PersonResponse)
+async def person_by_id(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], person_id: int
+):
+    # archived persons are read back from the archive
+    logger.info("api - person_by_id - person_id: %s", person_id)
+    person_json = await world_model.person_json(person_id)
+    if not person_json:
+        return JSONResponse({"message": "person does not exist in the worldmodel"}, 404)
+
+    return ORJSONResponse(person_json)
+
+
+@router.get("/api/utilization", response_model=list[UtilizationResponse])
+async def utilization(
+    world_model: Annotated[WorldApi, Depends(get_world_model)],
+    entity_type: EntityEnum | None = None,
+):
+    logger.info("api - utilization - entity_type: %s", entity_type)
+    return await world_model.utilization(entity_type)
+
+
+@router.get("/api/utilization/{entity_id}", response_model=UtilizationResponse)
+async def entity_utilization(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], entity_id: int
+):
+    logger.info("api - entity_utilization - entity_id: %s", entity_id)
+    response = await world_model.entity_utilization(entity_id)
     if not response:
-        logger.error(f"api - snapshot: entity_id was not found - id:{entity_id}")
         return JSONResponse({"message": "entity does not exist in the worldmodel"}, 404)
 
     return response
 
 
-@router.post("/api/accept-person")
-def accept_person(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], body: AcceptPersonBody
+@router.post("/api/accept-person", response_model=PersonsResultResponse)
+async def accept_person(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: AcceptPersonBody
 ):
-    logger.info(f"api - accept_person - entity_id: {body.entity_id}  - persons_id: {body.persons_id}")
+    logger.info(
+        "api - accept_person - entity_id: %s  - persons_id: %s",
+        body.entity_id,
+        body.persons_id,
+    )
     
-    response = world_model.accept_person(body.entity_id, body.persons_id)
+    response = await world_model.accept_person(body.entity_id, body.persons_id)
     return response
 
 
-@router.post("/api/service-done")
-def service_done(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], body: ServiceDoneBody
+@router.post("/api/service-done", response_model=PersonsResultResponse)
+async def service_done(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: ServiceDoneBody
 ):
-    logger.info(f"api - service_done - entity_id: {body.entity_id}  - persons_id: {body.persons_id}")
+    logger.info(
+        "api - service_done - entity_id: %s  - persons_id: %s",
+        body.entity_id,
+        body.persons_id,
+    )
     
-    response = world_model.service_done(body.entity_id, body.persons_id)
+    response = await world_model.service_done(body.entity_id, body.persons_id)
     return response
 
 
+@router.get("/api/entities", response_model=list[EntityResponse])
+async def find_entities(
+    world_model: Annotated[WorldApi, Depends(get_world_model)],
+    name: str,
+    value: str | None = None,
+    entity_type: EntityEnum | None = None,
+):
+    """
+    entities that have the attribute `name`, with `value` when given. the value
+    is read as json when it parses, e.g. ?name=beds&value=10 matches the number 10.
+    """
+    logger.info(
+        "api - find_entities - name: %s - value: %s - entity_type: %s",
+        name,
+        value,
+        entity_type,
+    )
+    if value is None:
+        return await world_model.find_entities(name, entity_type=entity_type)
+    try:
+        parsed_value = orjson.loads(value)
+    except orjson.JSONDecodeError:
+        parsed_value = value
+    return await world_model.find_entities(name, parsed_value, entity_type)
+
+
 @router.put("/api/update-self")
-def update_self(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], body: UpdateSelfBody
+async def update_self(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: UpdateSelfBody
 ):
-    logger.info(f"api - update_self - entity_id: {body.entity_id}")
+    logger.info("api - update_self - entity_id: %s", body.entity_id)
     
-    response = world_model.update_self(body.entity_id, body.max_capacity, body.eav)
+    response = await world_model.update_self(body.entity_id, body.max_capacity, body.eav)
     return response
 
 
-@router.post("/api/person-injury")
-def person_injury(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], body: PersonInjuryBody
+@router.post("/api/person-injury", response_model=PersonsResultResponse)
+async def person_injury(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: PersonInjuryBody
 ):
-    logger.info(f"api - person_injury - entity_id: {body.entity_id}  - persons_id: {body.persons_id}")
+    logger.info(
+        "api - person_injury - entity_id: %s  - persons_id: %s",
+        body.entity_id,
+        body.persons_id,
+    )
     
-    response = world_model.person_injury(body.entity_id, body.persons_id)
+    response = await world_model.person_injury(body.entity_id, body.persons_id)
     return response
 
 
-@router.post("/api/person-death")
-def person_death(
-    world_model: Annotated[WorldModel, Depends(get_world_model)], body: PersonDeathBody
+@router.post("/api/person-death", response_model=PersonsResultResponse)
+async def person_death(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: PersonDeathBody
 ):
-    logger.info(f"api - person_death - entity_id: {body.entity_id}  - persons_id: {body.persons_id}")
+    logger.info(
+        "api - person_death - entity_id: %s  - persons_id: %s",
+        body.entity_id,
+        body.persons_id,
+    )
     
-    response = world_model.person_death(body.entity_id, body.persons_id)
+    response = await world_model.person_death(body.entity_id, body.persons_id)
     return response
+
+
+@router.post("/api/batch", response_model=BatchResponse)
+async def batch(
+    world_model: Annotated[WorldApi, Depends(get_world_model)], body: BatchBody
+):
+    logger.info("api - batch - operations: %s", len(body.operations))
+
+    results = await world_model.batch(
+        [(operation.op, operation.entity_id, operation.persons_id) for operation in body.operations]
+    )
+    return {"results": results}
+
+
+# ==metrics and profiling=====================================================
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if request.state.owner is not None:
+        # the world metrics are recorded by the owner, the route metrics by each worker
+        owner_metrics = await request.state.owner.call(None, "metrics")
+        return Response(owner_metrics + REGISTRY.render(skip_empty=True), media_type=CONTENT_TYPE)
+
+    update_world_gauges(
+        {world_id: world.world_model for world_id, world in request.state.worlds.items()}
+    )
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+async def get_profiler() -> SamplingProfiler:
+    if not config.PROFILER_ENABLED:
+        raise HTTPException(404, "profiler is disabled")
+    return default_profiler
+
+
+@router.post("/api/profiler/start")
+async def start_profiler(
+    profiler: Annotated[SamplingProfiler, Depends(get_profiler)],
+    interval: float | None = None,
+):
+    logger.info("api - start_profiler - interval: %s", interval)
+    if not profiler.start(interval or config.PROFILER_INTERVAL):
+        return JSONResponse({"message": "profiler is already running"}, 409)
+    return {"running": True}
+
+
+@router.post("/api/profiler/stop")
+async def stop_profiler(profiler: Annotated[SamplingProfiler, Depends(get_profiler)]):
+    logger.info("api - stop_profiler")
+    if not profiler.stop():
+        return JSONResponse({"message": "profiler is not running"}, 409)
+    path = profiler.dump(config.PROFILER_DIR)
+    return {"running": False, "samples": profiler.samples, "path": path}
+
+
+@router.get("/api/profiler/stacks", response_class=PlainTextResponse)
+async def profiler_stacks(profiler: Annotated[SamplingProfiler, Depends(get_profiler)]):
+    # collapsed stacks recorded so far, also while the profiler runs
+    return PlainTextResponse(profiler.collapsed())
@@ -1,5 +1,7 @@
 import datetime
+from typing import Literal
 from pydantic import BaseModel
+from src.models.enums import EntityEnum, EntityStatus, Gender, PersonStatus
 
 
 class RegisterBody(BaseModel):
@@ -14,6 +16,49 @@ class RegisterResponse(BaseModel):
     current_clock: int
 
 
+class PersonResponse(BaseModel):
+    id: int
+    creation_date: datetime.datetime
+    modified_date: datetime.datetime
+    name: str
+    gender: Gender
+    birth_date: datetime.datetime
+    national_code: str
+    status: PersonStatus
+    current_entity: EntityEnum
+    entity_status: EntityStatus
+    death_date: datetime.datetime | None
+
+
+class SnapshotResponse(BaseModel):
+    entity_id: int
+    persons: list[PersonResponse]
+    earthquake_status: bool
+
+
+class EntityResponse(BaseModel):
+    entity_id: int
+    entity_type: EntityEnum
+    max_capacity: int
+    used_capacity: int
+    eav: dict[str, str | int | dict | list]
+
+
+class UtilizationResponse(BaseModel):
+    entity_id: int
+    entity_type: EntityEnum
+    max_capacity: int
+    used_capacity: int
+    free_capacity: int
+    # used_capacity / max_capacity, None for an entity without capacity
+    utilization: float | None
+
+
+class PersonsResultResponse(BaseModel):
+    accepted: list[int]
+    rejected: list[int]
+
+
 class AcceptPersonBody(BaseModel):
     entity_id: int
     persons_id: list[int]
@@ -35,3 +80,20 @@ class UpdateSelfBody(BaseModel):
     entity_id: int
     max_capacity: int
     eav: dict[str, str | int | dict | list]
+
+
+class BatchOperation(AcceptPersonBody):
+    op: Literal["accept_person", "service_done", "person_injury", "person_death"]
+
+
+class BatchBody(BaseModel):
+    operations: list[BatchOperation]
+
+
+class BatchOperationResult(PersonsResultResponse):
+    op: str
+    entity_id: int
+
+
+class BatchResponse(BaseModel):
+    results: list[BatchOperationResult]
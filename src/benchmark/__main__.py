@@ -0,0 +1,140 @@
+"""
+benchmarks of the worldmodel hot paths and http api, the json output of two
+commits can be compared:
+
+    python -m src.benchmark micro --sizes 1000 10000 100000 1000000 --output before.json
+    python -m src.benchmark http --agents 4 --duration 10 --output http.json
+    python -m src.benchmark compare before.json after.json
+"""
+
+import argparse
+from datetime import datetime
+import json
+import logging
+import platform
+import subprocess
+
+import orjson
+
+from src.benchmark.http_load import run_http_load
+from src.benchmark.micro import run_microbenchmarks
+from src.utils.logger import APP_LOGGER_NAME
+
+
+def parse_overrides(items: list[str]) -> dict:
+    overrides = dict()
+    for item in items:
+        key, _, value = item.partition("=")
+        overrides[key] = json.loads(value)
+    return overrides
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result: dict) -> str:
+    labels = [result["benchmark"]] + [
+        f"{name}={result[name]}"
+        for name in ("population", "store", "agents", "count", "line_length")
+        if name in result
+    ]
+    return " ".join(labels)
+
+
+def compare(before: dict, after: dict) -> list[dict]:
+    # ratios above 1 are slower after than before
+    before_results = {result_key(result): result for result in before["results"]}
+    rows = []
+    for result in after["results"]:
+        old = before_results.get(result_key(result))
+        if not old:
+            continue
+        rows.append(
+            {
+                "benchmark": result_key(result),
+                "p50_us": [old["p50_us"], result["p50_us"]],
+                "p99_us": [old["p99_us"], result["p99_us"]],
+                "p50_ratio": result["p50_us"] / old["p50_us"] if old["p50_us"] else None,
+                "ops_per_second": [old["ops_per_second"], result["ops_per_second"]],
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    # options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--log-level", default="WARNING", help="app log level during the run")
+    common.add_argument("--output", help="also write the json report to this file")
+
+    parser = argparse.ArgumentParser(description="benchmark the worldmodel")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    micro = commands.add_parser("micro", parents=[common], help="world model microbenchmarks")
+    micro.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000],
+        help="population sizes",
+    )
+    micro.add_argument(
+        "--store", choices=["object", "columnar", "sqlite"], default="object",
+        help="person store of the benchmarked worlds",
+    )
+    micro.add_argument("--repeat", type=int, default=200, help="timed calls per benchmark")
+    micro.add_argument("--seed", type=int, default=0, help="random seed of the worlds")
+
+    http = commands.add_parser("http", parents=[common], help="in-process http load test")
+    http.add_argument("--agents", type=int, default=1, help="agents per entity type")
+    http.add_argument("--duration", type=float, default=10, help="seconds of load")
+    http.add_argument("--population", type=int, default=10_000, help="initial population")
+    http.add_argument("--max-capacity", type=int, default=5, help="capacity of every agent")
+    http.add_argument(
+        "--set", action="append", default=[], metavar="NAME=VALUE",
+        help="override a src.config setting, e.g. TIME_RATE=10",
+    )
+
+    diff = commands.add_parser("compare", parents=[common], help="compare two json reports")
+    diff.add_argument("before")
+    diff.add_argument("after")
+    args = parser.parse_args()
+
+    logging.getLogger(APP_LOGGER_NAME).setLevel(args.log_level)
+    match args.command:
+        case "micro":
+            results = run_microbenchmarks(args.sizes, args.store, args.repeat, args.seed)
+        case "http":
+            results = run_http_load(
+                args.agents,
+                args.duration,
+                args.population,
+                args.max_capacity,
+                parse_overrides(args.set),
+            )
+        case "compare":
+            with open(args.before, "rb") as before, open(args.after, "rb") as after:
+                results = compare(orjson.loads(before.read()), orjson.loads(after.read()))
+
+    report = {
+        "meta": {
+            "command": args.command,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now().isoformat(),
+        },
+        "results": results,
+    }
+    output = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    if args.output:
+        with open(args.output, "wb") as output_file:
+            output_file.write(output)
+    print(output.decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+import threading
+from time import perf_counter
+from typing import Any, Iterator
+
+from fastapi.testclient import TestClient
+
+from src.benchmark.stats import summarize
+from src.models.enums import EntityEnum
+import src.config as config
+
+
+@contextmanager
+def config_overrides(overrides: dict[str, Any]) -> Iterator[None]:
+    # the app builds its worlds from src.config, so the overrides go there
+    previous = {name: getattr(config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(config, name, value)
+
+
+class HttpAgent:
+    """
+    entity agent that talks to the app over http: it registers, then polls
+    its line, accepts persons up to its capacity and finishes their service
+    until the deadline.
+    """
+
+    def __init__(self, client: TestClient, entity_type: EntityEnum, max_capacity: int) -> None:
+        self.client = client
+        self.entity_type = entity_type
+        self.max_capacity = max_capacity
+        # route -> latency of every call, in seconds
+        self.latencies: dict[str, list[float]] = dict()
+        self.errors = 0
+
+    def call(self, route: str, method: str, url: str, **kwargs: Any) -> Any:
+        start = perf_counter()
+        response = self.client.request(method, url, **kwargs)
+        self.latencies.setdefault(route, []).append(perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors += 1
+            return None
+        return response.json()
+
+    def run(self, deadline: float) -> None:
+        registered = self.call(
+            "register",
+            "POST",
+            "/api/register",
+            json={
+                "entity_type": self.entity_type.value,
+                "max_capacity": self.max_capacity,
+                "eav": {},
+            },
+        )
+        if not registered:
+            return
+        entity_id = registered["entity_id"]
+        while perf_counter() < deadline:
+            snapshot = self.call("snapshot", "GET", f"/api/snapshot/{entity_id}")
+            if not snapshot:
+                continue
+            line = [person["id"] for person in snapshot["persons"][: self.max_capacity]]
+            if not line:
+                continue
+            result = self.call(
+                "accept_person",
+                "POST",
+                "/api/accept-person",
+                json={"entity_id": entity_id, "persons_id": line},
+            )
+            if result and result["accepted"]:
+                self.call(
+                    "service_done",
+                    "POST",
+                    "/api/service-done",
+                    json={"entity_id": entity_id, "persons_id": result["accepted"]},
+                )
+
+
+def run_http_load(
+    agents_per_type: int = 1,
+    duration: float = 10,
+    population: int = 10_000,
+    max_capacity: int = 5,
+    overrides: dict[str, Any] | None = None,
+) -> list[dict]:
+    """
+    load the app in-process with store, hospital and ecu agents running in
+    threads for `duration` seconds, and report every route. latencies include
+    the hop of the test client to the event loop thread of the app, a fixed
+    cost that stays the same across commits.
+    """
+    # import the app only now, it sets up logging and the router on import
+    from src.main import app
+
+    settings = {
+        "API_WORLDS": 1,
+        "PERSISTENCE_DIR": None,
+        "INITIAL_POPULATION": population,
+        # most of the population starts in a line so the agents find work
+        "INITIAL_STORE_LINE": population // 4,
+        "INITIAL_HOSPITAL_LINE": population // 4,
+        "INITIAL_ECU_LINE": population // 4,
+        **(overrides or {}),
+    }
+    with config_overrides(settings), TestClient(app) as client:
+        agents = [
+            HttpAgent(client, entity_type, max_capacity)
+            for entity_type in (EntityEnum.STORE, EntityEnum.HOSPITAL, EntityEnum.ECU)
+            for _ in range(agents_per_type)
+        ]
+        start = perf_counter()
+        deadline = start + duration
+        threads = [threading.Thread(target=agent.run, args=(deadline,)) for agent in agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - start
+
+    latencies: dict[str, list[float]] = dict()
+    for agent in agents:
+        for route, samples in agent.latencies.items():
+            latencies.setdefault(route, []).extend(samples)
+    labels = {"population": population, "agents": len(agents)}
+    results = []
+    for route, samples in sorted(latencies.items()):
+        summary = summarize(samples)
+        # throughput of a route under load is its calls over the wall time
+        summary["ops_per_second"] = len(samples) / elapsed
+        results.append({"benchmark": f"http:{route}", **labels, **summary})
+    every_call = [sample for samples in latencies.values() for sample in samples]
+    results.append(
+        {
+            "benchmark": "http:all",
+            **labels,
+            **summarize(every_call),
+            "ops_per_second": len(every_call) / elapsed,
+            "errors": sum(agent.errors for agent in agents),
+        }
+    )
+    return results
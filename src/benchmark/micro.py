@@ -0,0 +1,125 @@
+from dataclasses import replace
+import os
+import tempfile
+from time import perf_counter
+from typing import Callable
+
+from src.benchmark.stats import summarize
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+# persons moved into a line by one fill_entity_line call
+FILL_COUNT = 10
+# ids handed out per generate_id sample, a single call is too short to time
+ID_BATCH = 1000
+# longest line match_snapshot_persons is timed on
+MAX_LINE = 1000
+
+
+def bench_world(store: str, seed: int, directory: str) -> WorldModel:
+    # an empty virtual clock world, nothing runs unless the benchmark calls it
+    world_config = replace(
+        WorldConfig(),
+        seed=seed,
+        person_store="object" if store == "sqlite" else store,
+        storage="sqlite" if store == "sqlite" else "memory",
+        sqlite_path=os.path.join(directory, "benchmark.db"),
+        persistence_dir=None,
+        archive_interval=None,
+        archive_path=None,
+        initial_population=0,
+        initial_store_line=0,
+        initial_hospital_line=0,
+        initial_ecu_line=0,
+    )
+    return WorldModel(virtual_clock=True, world_config=world_config)
+
+
+def timed(call: Callable[[], object], repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        call()
+        samples.append(perf_counter() - start)
+    return samples
+
+
+def run_population(population: int, store: str, repeat: int, seed: int) -> list[dict]:
+    results = []
+
+    def record(benchmark: str, samples: list[float], operations: int = 1, **labels) -> None:
+        results.append(
+            {
+                "benchmark": benchmark,
+                "population": population,
+                "store": store,
+                **labels,
+                **summarize(samples, operations),
+            }
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        world_model = bench_world(store, seed, directory)
+        try:
+            record(
+                "populate_worldModel",
+                timed(lambda: world_model.populate_worldModel(population), 1),
+                population,
+            )
+
+            def generate_ids() -> None:
+                for _ in range(ID_BATCH):
+                    world_model.id_generator.generate_id("benchmark")
+
+            record("generate_id", timed(generate_ids, repeat), ID_BATCH)
+
+            # a quarter of the population at most leaves the city for the store line
+            fills = max(min(repeat, population // (4 * FILL_COUNT)), 1)
+            record(
+                "fill_entity_line",
+                timed(lambda: world_model.fill_entity_line(EntityEnum.STORE, FILL_COUNT), fills),
+                count=FILL_COUNT,
+            )
+
+            line_length = max(min(MAX_LINE, population // 10), 1)
+            world_model.fill_entity_line(EntityEnum.HOSPITAL, line_length)
+            hospital = world_model.entities[
+                world_model.register(EntityEnum.HOSPITAL.value, line_length, {})["entity_id"]
+            ]
+            record(
+                "match_snapshot_persons",
+                timed(lambda: world_model.match_snapshot_persons(hospital), repeat),
+                line_length=line_length,
+            )
+
+            # every call moves the head of the line into service, then back to the city
+            line = list(world_model.line_index.line(EntityEnum.HOSPITAL, EntityStatus.INLINE))
+            persons = line[:repeat]
+            accept_samples = []
+            for person_id in persons:
+                start = perf_counter()
+                world_model.accept_person(hospital.id, [person_id])
+                accept_samples.append(perf_counter() - start)
+            record("accept_person", accept_samples)
+            done_samples = []
+            for person_id in persons:
+                start = perf_counter()
+                world_model.service_done(hospital.id, [person_id])
+                done_samples.append(perf_counter() - start)
+            record("service_done", done_samples)
+        finally:
+            world_model.stop()
+    return results
+
+
+def run_microbenchmarks(
+    sizes: list[int], store: str = "object", repeat: int = 200, seed: int = 0
+) -> list[dict]:
+    """
+    time the world model hot paths on worlds of each population size.
+    """
+    results = []
+    for population in sizes:
+        results.extend(run_population(population, store, repeat, seed))
+    return results
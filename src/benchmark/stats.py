@@ -0,0 +1,28 @@
+import math
+from statistics import mean
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    # nearest rank on an already sorted list, the product is rounded first so
+    # 0.07 * 100 stays rank 7
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(round(fraction * len(ordered), 9)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: list[float], operations: int = 1) -> dict:
+    """
+    latency and throughput of timed samples in seconds, each sample covering
+    `operations` operations. latencies are per operation, in microseconds.
+    """
+    per_operation = sorted(sample / operations for sample in samples)
+    total = sum(samples)
+    return {
+        "samples": len(samples),
+        "operations": len(samples) * operations,
+        "p50_us": percentile(per_operation, 0.50) * 1e6,
+        "p99_us": percentile(per_operation, 0.99) * 1e6,
+        "mean_us": mean(per_operation) * 1e6 if per_operation else 0.0,
+        "ops_per_second": len(samples) * operations / total if total else None,
+    }
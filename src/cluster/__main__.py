@@ -0,0 +1,66 @@
+"""
+the api on several worker processes:
+
+    python -m src.cluster --workers 4 --port 8000
+
+a single owner process holds the worlds and runs their events, the uvicorn
+workers read snapshots from the lines it publishes in shared memory and
+forward every other call to it over a unix socket.
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import orjson
+import uvicorn
+
+from src.cluster.owner import run_owner
+from src.cluster.remote import OWNER_ENV
+from src.utils.logger import get_logger
+import src.config as config
+
+logger = get_logger(__name__)
+
+# seconds the owner has to create its worlds before the launcher gives up
+OWNER_START_TIMEOUT = 60
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="serve the worldmodel api from several processes")
+    parser.add_argument(
+        "--workers", type=int, default=config.API_WORKERS, help="api worker processes"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="worldmodel-")
+    socket_path = os.path.join(directory, "owner.sock")
+    line_names = {
+        str(world_id): f"worldmodel-{os.getpid()}-{world_id}"
+        for world_id in range(config.API_WORLDS)
+    }
+    # spawned like the uvicorn workers, so the owner sets up its own log handlers
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    owner = context.Process(
+        target=run_owner, args=(socket_path, line_names, ready), name="world-owner"
+    )
+    owner.start()
+    try:
+        if not ready.wait(OWNER_START_TIMEOUT) or not owner.is_alive():
+            raise RuntimeError("the owner process did not start")
+        os.environ[OWNER_ENV] = orjson.dumps({"socket": socket_path, "lines": line_names}).decode()
+        logger.info("cluster - owner pid %s, starting %s api workers", owner.pid, args.workers)
+        uvicorn.run("src.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        owner.terminate()
+        owner.join()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+messages between the api workers and the owner process: a json object behind
+a 4 byte length, over a unix socket.
+"""
+
+import asyncio
+import struct
+from typing import Any
+
+import orjson
+
+LENGTH = struct.Struct("!I")
+
+
+async def read_message(reader: asyncio.StreamReader) -> Any:
+    # raises asyncio.IncompleteReadError when the other side closed the socket
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return orjson.loads(await reader.readexactly(length))
+
+
+def write_message(writer: asyncio.StreamWriter, message: Any) -> None:
+    data = orjson.dumps(message)
+    writer.write(LENGTH.pack(len(data)) + data)
@@ -0,0 +1,237 @@
+import asyncio
+from multiprocessing.synchronize import Event
+import signal
+from typing import Any, cast
+
+from src.cluster.ipc import read_message, write_message
+from src.cluster.shared_lines import SharedLines
+from src.main import create_worlds
+from src.models.async_world_model import AsyncWorldModel
+from src.models.enums import EntityEnum
+from src.models.instrumentation import update_world_gauges
+from src.models.line_events import LineSubscription
+from src.utils.logger import get_logger
+from src.utils.metrics import REGISTRY
+import src.config as config
+
+logger = get_logger(__name__)
+
+
+class WorldOwner:
+    """
+    the process that holds the worlds and runs their events. it publishes the
+    lines of every world in shared memory and serves the calls the api
+    workers forward over a unix socket, one call at a time per worker.
+    the line events of the streams a worker opened are pushed to it on the
+    same socket.
+    """
+
+    def __init__(self, worlds: dict[str, AsyncWorldModel], lines: dict[str, SharedLines]) -> None:
+        self.worlds = worlds
+        self.lines = lines
+        # (world id, entity type) -> (line version, earthquake status) last published
+        self.published: dict[tuple[str, EntityEnum], tuple[int, bool]] = dict()
+        # connection handler task -> its socket, closed when the owner stops
+        self.connections: dict[asyncio.Task, asyncio.StreamWriter] = dict()
+        # socket -> stream id given by the worker -> task forwarding its events
+        self.streams: dict[asyncio.StreamWriter, dict[int, asyncio.Task]] = dict()
+
+    # ==shared lines===============================================================
+    def publish(self, world_id: str) -> None:
+        # only the lines that changed since their last publish are written
+        world_model = self.worlds[world_id].world_model
+        lines = self.lines[world_id]
+        earthquake_status = world_model.earthquake_status
+        for entity_type in EntityEnum:
+            key = (world_id, entity_type)
+            if self.published.get(key) == (
+                world_model.line_index.version(entity_type),
+                earthquake_status,
+            ):
+                continue
+            line_version, persons_json = world_model.serialized_line(entity_type)
+            version = world_model.snapshot_version(entity_type, line_version, earthquake_status)
+            if not lines.write(entity_type, persons_json, earthquake_status, version):
+                logger.warning(
+                    "owner - %s line of world %s is too long for shared memory: %s bytes",
+                    entity_type.value,
+                    world_id,
+                    len(persons_json),
+                )
+            self.published[key] = (line_version, earthquake_status)
+
+    async def publish_periodically(self, interval: float) -> None:
+        # lines changed by the scheduled events, the calls publish their own changes
+        while True:
+            for world_id in self.worlds:
+                self.publish(world_id)
+            await asyncio.sleep(interval)
+
+    # ==calls======================================================================
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        logger.info("owner - api worker connected")
+        task = cast(asyncio.Task, asyncio.current_task())
+        self.connections[task] = writer
+        self.streams[writer] = dict()
+        try:
+            while True:
+                message = await read_message(reader)
+                try:
+                    response = {"result": await self.call(message, writer)}
+                except Exception as error:
+                    logger.exception("owner - %s call failed", message.get("method"))
+                    response = {"error": repr(error)}
+                if "id" not in message:
+                    # a notification, nobody waits for its result
+                    continue
+                response["id"] = message["id"]
+                write_message(writer, response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info("owner - api worker disconnected")
+        finally:
+            self.connections.pop(task, None)
+            for stream_task in self.streams.pop(writer).values():
+                stream_task.cancel()
+            writer.close()
+
+    async def close_connections(self) -> None:
+        # the handlers see the end of their stream and return
+        tasks = list(self.connections)
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def forward_line_stream(
+        self,
+        world: AsyncWorldModel,
+        subscription: LineSubscription,
+        stream_id: int,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            while not subscription.overflowed or not subscription.queue.empty():
+                sequence, name, data = await subscription.queue.get()
+                write_message(
+                    writer, {"stream": stream_id, "event": [sequence, name, data.decode()]}
+                )
+                await writer.drain()
+            # the worker fell behind, its client resumes from the last event id
+            write_message(writer, {"stream": stream_id, "closed": True})
+        except ConnectionError:
+            pass
+        finally:
+            world.close_line_stream(subscription)
+            self.streams.get(writer, {}).pop(stream_id, None)
+
+    async def call(self, message: dict[str, Any], writer: asyncio.StreamWriter) -> Any:
+        method, args = message["method"], message["args"]
+        if method == "metrics":
+            update_world_gauges(
+                {world_id: world.world_model for world_id, world in self.worlds.items()}
+            )
+            return REGISTRY.render(skip_empty=True)
+
+        world_id = message["world"]
+        world = self.worlds[world_id]
+        match method:
+            case (
+                "register"
+                | "accept_person"
+                | "service_done"
+                | "person_injury"
+                | "person_death"
+                | "batch"
+                | "update_self"
+                | "entity_utilization"
+            ):
+                result = await getattr(world, method)(*args)
+            case "find_entities":
+                name, entity_type, *value = args
+                result = await world.find_entities(
+                    name, *value, entity_type=EntityEnum(entity_type) if entity_type else None
+                )
+            case "utilization":
+                result = await world.utilization(EntityEnum(args[0]) if args[0] else None)
+            case "entity_type":
+                entity = world.world_model.entity_exists(args[0])
+                result = entity.entity_type if entity else None
+            case "snapshot":
+                snapshot = await world.snapshot(args[0])
+                result = (
+                    [snapshot.persons_json.decode(), snapshot.earthquake_status, snapshot.version]
+                    if snapshot
+                    else None
+                )
+            case "open_line_stream":
+                stream_id, entity_id, since = args
+                stream = await world.open_line_stream(entity_id, since)
+                result = None
+                if stream:
+                    subscription, events = stream
+                    self.streams[writer][stream_id] = asyncio.get_running_loop().create_task(
+                        self.forward_line_stream(world, subscription, stream_id, writer),
+                        name=f"line-stream-{stream_id}",
+                    )
+                    result = [
+                        subscription.token,
+                        [[sequence, name, data.decode()] for sequence, name, data in events],
+                    ]
+            case "close_line_stream":
+                stream_task = self.streams[writer].pop(args[0], None)
+                if stream_task is not None:
+                    stream_task.cancel()
+                result = None
+            case "person_json" | "person_json_by_national_code":
+                person_json = await getattr(world, method)(args[0])
+                result = person_json.decode() if person_json is not None else None
+            case _:
+                raise ValueError(f"unknown method {method}")
+
+        # the caller reads its own changes from shared memory once it gets the result
+        self.publish(world_id)
+        return result
+
+
+async def serve_worlds(socket_path: str, line_names: dict[str, str], ready: Event) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+    worlds = create_worlds()
+    lines = {
+        world_id: SharedLines.create(line_names[world_id], config.SHARED_LINE_SIZE)
+        for world_id in worlds
+    }
+    owner = WorldOwner(worlds, lines)
+    for world in worlds.values():
+        await world.initialize()
+        world.start()
+    for world_id in worlds:
+        owner.publish(world_id)
+    publisher = loop.create_task(
+        owner.publish_periodically(config.SHARED_PUBLISH_INTERVAL), name="shared-lines"
+    )
+    server = await asyncio.start_unix_server(owner.handle_connection, socket_path)
+    logger.info("owner - %s worlds served at %s", len(worlds), socket_path)
+    ready.set()
+
+    await stop.wait()
+
+    server.close()
+    await owner.close_connections()
+    publisher.cancel()
+    for world in worlds.values():
+        await world.stop()
+    for shared_lines in lines.values():
+        shared_lines.close()
+        shared_lines.unlink()
+    logger.info("owner - stopped")
+
+
+def run_owner(socket_path: str, line_names: dict[str, str], ready: Event) -> None:
+    # the launcher stops the owner with SIGTERM once the api workers are gone
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(serve_worlds(socket_path, line_names, ready))
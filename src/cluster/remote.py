@@ -0,0 +1,269 @@
+import asyncio
+import itertools
+from typing import Any
+
+from src.cluster.ipc import read_message, write_message
+from src.cluster.shared_lines import SharedLines
+from src.models.enums import EntityEnum
+from src.models.line_events import LineEvent, LineSubscription
+from src.models.repository import ANY_VALUE
+from src.models.snapshot import Snapshot
+from src.utils.logger import get_logger
+import src.config as config
+
+logger = get_logger(__name__)
+
+# environment variable that tells an api worker where the owner process is:
+# {"socket": unix socket path, "lines": {world id: shared memory name}}
+OWNER_ENV = "WORLDMODEL_OWNER"
+
+
+class OwnerError(RuntimeError):
+    pass
+
+
+class OwnerConnection:
+    """
+    one unix socket per worker to the owner process, the calls of all requests
+    share it and their responses are matched by id. the owner pushes the
+    events of the open line streams on it too, tagged with the stream id.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.pending: dict[int, asyncio.Future] = dict()
+        self.streams: dict[int, LineSubscription] = dict()
+        self.closing = False
+        self.reader_task = asyncio.get_running_loop().create_task(
+            self.read_responses(), name="owner-connection"
+        )
+
+    @classmethod
+    async def open(cls, socket_path: str) -> "OwnerConnection":
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        return cls(reader, writer)
+
+    async def call(self, world_id: str | None, method: str, *args: Any) -> Any:
+        if self.reader_task.done():
+            raise OwnerError("connection to the owner process is closed")
+        call_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[call_id] = future
+        write_message(
+            self.writer, {"id": call_id, "world": world_id, "method": method, "args": args}
+        )
+        await self.writer.drain()
+        return await future
+
+    def notify(self, world_id: str | None, method: str, *args: Any) -> None:
+        # a call without an id, the owner sends no response
+        if not self.reader_task.done():
+            write_message(self.writer, {"world": world_id, "method": method, "args": args})
+
+    def open_stream(self, subscription: LineSubscription) -> int:
+        # registered before the owner is asked, its first events can come
+        # right after the response
+        stream_id = next(self.ids)
+        self.streams[stream_id] = subscription
+        return stream_id
+
+    def close_stream(self, stream_id: int) -> LineSubscription | None:
+        return self.streams.pop(stream_id, None)
+
+    def deliver(self, message: dict[str, Any]) -> None:
+        subscription = self.streams.get(message["stream"])
+        if subscription is None:
+            return
+        if "closed" in message:
+            # the owner dropped events, the client resumes from its last event id
+            self.streams.pop(message["stream"])
+            subscription.overflowed = True
+            return
+        sequence, name, data = message["event"]
+        subscription.deliver((sequence, name, data.encode()))
+
+    async def read_responses(self) -> None:
+        try:
+            while True:
+                response = await read_message(self.reader)
+                if "stream" in response:
+                    self.deliver(response)
+                    continue
+                future = self.pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(OwnerError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            if not self.closing:
+                logger.error("owner connection - closed by the owner process")
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(OwnerError("connection to the owner process is closed"))
+            self.pending.clear()
+            for subscription in self.streams.values():
+                subscription.overflowed = True
+            self.streams.clear()
+
+    async def close(self) -> None:
+        self.closing = True
+        self.reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class RemoteWorldModel:
+    """
+    the AsyncWorldModel calls of a world held by the owner process.
+    snapshots are read from the lines the owner publishes in shared memory,
+    every other call is sent to the owner. line streams get the line events
+    of the owner world, the same events a stream of a local world gets.
+    """
+
+    def __init__(self, world_id: str, owner: OwnerConnection, lines: SharedLines) -> None:
+        self.world_id = world_id
+        self.owner = owner
+        self.lines = lines
+        # entities never change their type, so it is asked once per entity
+        self.entity_types: dict[int, EntityEnum] = dict()
+        self.snapshot_cache: dict[int, Snapshot] = dict()
+        # open streams -> their id on the owner connection
+        self.streams: dict[LineSubscription, int] = dict()
+
+    def close(self) -> None:
+        self.lines.close()
+
+    async def call(self, method: str, *args: Any) -> Any:
+        return await self.owner.call(self.world_id, method, *args)
+
+    async def entity_type(self, entity_id: int) -> EntityEnum | None:
+        entity_type = self.entity_types.get(entity_id)
+        if entity_type is None:
+            value = await self.call("entity_type", entity_id)
+            if value is None:
+                return None
+            entity_type = self.entity_types[entity_id] = EntityEnum(value)
+        return entity_type
+
+    # ==world model calls==========================================================
+    async def register(
+        self, entity_type: str, max_capacity: int, eav: dict[str, str | int | dict | list]
+    ) -> dict:
+        return await self.call("register", entity_type, max_capacity, eav)
+
+    async def snapshot(self, entity_id: int) -> Snapshot | bool:
+        entity_type = await self.entity_type(entity_id)
+        if entity_type is None:
+            return False
+
+        line = self.lines.read(entity_type)
+        if line is None or line.persons_json is None:
+            # not published yet or longer than its slot
+            response = await self.call("snapshot", entity_id)
+            if response is None:
+                return False
+            persons_json, earthquake_status, version = response
+            return Snapshot(entity_id, persons_json.encode(), earthquake_status, version)
+
+        snapshot = self.snapshot_cache.get(entity_id)
+        if snapshot and snapshot.version == line.version:
+            return snapshot
+        snapshot = Snapshot(entity_id, line.persons_json, line.earthquake_status, line.version)
+        self.snapshot_cache[entity_id] = snapshot
+        return snapshot
+
+    async def open_line_stream(
+        self, entity_id: int, since: str | None = None
+    ) -> tuple[LineSubscription, list[LineEvent]] | None:
+        entity_type = await self.entity_type(entity_id)
+        if entity_type is None:
+            return None
+
+        # the token is the one of the owner world, it comes with the response
+        subscription = LineSubscription(
+            entity_type, asyncio.get_running_loop(), config.LINE_EVENTS_HISTORY, ""
+        )
+        stream_id = self.owner.open_stream(subscription)
+        try:
+            response = await self.call("open_line_stream", stream_id, entity_id, since)
+        except BaseException:
+            # the owner may have opened it before the call was cancelled
+            self.owner.close_stream(stream_id)
+            self.owner.notify(self.world_id, "close_line_stream", stream_id)
+            raise
+        if response is None:
+            self.owner.close_stream(stream_id)
+            return None
+        subscription.token, events = response
+        self.streams[subscription] = stream_id
+        return subscription, [(sequence, name, data.encode()) for sequence, name, data in events]
+
+    def close_line_stream(self, subscription: LineSubscription) -> None:
+        stream_id = self.streams.pop(subscription, None)
+        if stream_id is not None and self.owner.close_stream(stream_id):
+            self.owner.notify(self.world_id, "close_line_stream", stream_id)
+
+    async def accept_person(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call("accept_person", entity_id, persons_id)
+
+    async def service_done(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call("service_done", entity_id, persons_id)
+
+    async def person_injury(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call("person_injury", entity_id, persons_id)
+
+    async def person_death(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call("person_death", entity_id, persons_id)
+
+    async def batch(
+        self, operations: list[tuple[str, int, list[int]]]
+    ) -> list[dict[str, str | int | list[int]]]:
+        return await self.call("batch", operations)
+
+    async def update_self(
+        self, entity_id: int, max_capacity: int, eav: dict[str, str | int | dict | list]
+    ) -> bool:
+        return await self.call("update_self", entity_id, max_capacity, eav)
+
+    async def find_entities(
+        self, name: str, value: Any = ANY_VALUE, entity_type: EntityEnum | None = None
+    ) -> list[dict]:
+        # the value is left out to match any value
+        entity_type_value = entity_type.value if entity_type else None
+        if value is ANY_VALUE:
+            return await self.call("find_entities", name, entity_type_value)
+        return await self.call("find_entities", name, entity_type_value, value)
+
+    async def utilization(self, entity_type: EntityEnum | None = None) -> list[dict]:
+        return await self.call("utilization", entity_type.value if entity_type else None)
+
+    async def entity_utilization(self, entity_id: int) -> dict | None:
+        return await self.call("entity_utilization", entity_id)
+
+    async def person_json(self, person_id: int) -> bytes | None:
+        person_json = await self.call("person_json", person_id)
+        return person_json.encode() if person_json is not None else None
+
+    async def person_json_by_national_code(self, national_code: str) -> bytes | None:
+        person_json = await self.call("person_json_by_national_code", national_code)
+        return person_json.encode() if person_json is not None else None
+
+
+async def connect_worlds(
+    description: dict[str, Any],
+) -> tuple[OwnerConnection, dict[str, RemoteWorldModel]]:
+    owner = await OwnerConnection.open(description["socket"])
+    worlds = {
+        world_id: RemoteWorldModel(world_id, owner, SharedLines.attach(name))
+        for world_id, name in description["lines"].items()
+    }
+    logger.info("owner connection - %s worlds at %s", len(worlds), description["socket"])
+    return owner, worlds
@@ -0,0 +1,124 @@
+"""
+INLINE lines of a world in shared memory, written by the owner process and
+read by the api workers without a call to the owner.
+
+every entity type has a slot of its own, a header followed by the serialized
+line. a slot is guarded by a sequence number (a seqlock): the writer makes it
+odd while it writes and even when it is done, a reader retries when the
+number was odd or changed while it copied the slot.
+"""
+
+from multiprocessing.shared_memory import SharedMemory
+import struct
+from typing import NamedTuple
+
+from src.models.enums import EntityEnum
+
+SEQUENCE = struct.Struct("<Q")
+# line length, earthquake status, snapshot version
+FIELDS = struct.Struct("<Q?64s")
+SLOT_HEADER_SIZE = SEQUENCE.size + FIELDS.size
+# length of a line that did not fit in its slot
+OVERFLOW = 2**64 - 1
+READ_ATTEMPTS = 100
+
+
+class SharedLine(NamedTuple):
+    sequence: int
+    # None when the line is longer than the slot
+    persons_json: bytes | None
+    earthquake_status: bool
+    version: str
+
+
+class SharedLines:
+    def __init__(self, shm: SharedMemory, line_size: int) -> None:
+        self.shm = shm
+        self.line_size = line_size
+        self.offsets: dict[EntityEnum, int] = {
+            entity_type: index * (SLOT_HEADER_SIZE + line_size)
+            for index, entity_type in enumerate(EntityEnum)
+        }
+        # last line read from each slot, returned again while the slot is unchanged
+        self.last_read: dict[EntityEnum, SharedLine] = dict()
+
+    @classmethod
+    def create(cls, name: str, line_size: int) -> "SharedLines":
+        size = len(EntityEnum) * (SLOT_HEADER_SIZE + line_size)
+        shm = SharedMemory(name, create=True, size=size)
+        shm.buf[:] = bytes(shm.size)
+        return cls(shm, line_size)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedLines":
+        # the owner and the workers are spawned from the launcher and share its
+        # resource tracker, the region stays until the owner unlinks it
+        shm = SharedMemory(name)
+        return cls(shm, shm.size // len(EntityEnum) - SLOT_HEADER_SIZE)
+
+    def sequence(self, entity_type: EntityEnum) -> int:
+        return SEQUENCE.unpack_from(self.shm.buf, self.offsets[entity_type])[0]
+
+    def write(
+        self, entity_type: EntityEnum, persons_json: bytes, earthquake_status: bool, version: str
+    ) -> bool:
+        """
+        publish the line of an entity type, False when it is longer than the slot
+        and the readers have to ask the owner for it. only one process writes.
+        """
+        buf = self.shm.buf
+        offset = self.offsets[entity_type]
+        sequence = SEQUENCE.unpack_from(buf, offset)[0] + 1
+        SEQUENCE.pack_into(buf, offset, sequence)
+
+        fits = len(persons_json) <= self.line_size
+        if fits:
+            start = offset + SLOT_HEADER_SIZE
+            buf[start : start + len(persons_json)] = persons_json
+        FIELDS.pack_into(
+            buf,
+            offset + SEQUENCE.size,
+            len(persons_json) if fits else OVERFLOW,
+            earthquake_status,
+            version.encode(),
+        )
+
+        SEQUENCE.pack_into(buf, offset, sequence + 1)
+        return fits
+
+    def read(self, entity_type: EntityEnum) -> SharedLine | None:
+        # None when the line was not published yet or kept changing while it was read
+        buf = self.shm.buf
+        offset = self.offsets[entity_type]
+        for _ in range(READ_ATTEMPTS):
+            sequence = SEQUENCE.unpack_from(buf, offset)[0]
+            if sequence == 0:
+                return None
+            last_read = self.last_read.get(entity_type)
+            if last_read and last_read.sequence == sequence:
+                return last_read
+            if sequence % 2:
+                continue
+
+            length, earthquake_status, version = FIELDS.unpack_from(buf, offset + SEQUENCE.size)
+            persons_json = None
+            if length != OVERFLOW:
+                if length > self.line_size:
+                    continue
+                start = offset + SLOT_HEADER_SIZE
+                persons_json = bytes(buf[start : start + length])
+
+            if SEQUENCE.unpack_from(buf, offset)[0] == sequence:
+                line = SharedLine(
+                    sequence, persons_json, earthquake_status, version.rstrip(b"\0").decode()
+                )
+                self.last_read[entity_type] = line
+                return line
+        return None
+
+    def close(self) -> None:
+        self.last_read.clear()
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
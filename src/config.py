@@ -2,6 +2,77 @@
 # worldmodel time_rate: each secconds in realworld equals how many clocks in worldmodel
 TIME_RATE = 1
 
+# number of independent worlds served by the api, picked with the X-World-Id header (0, 1, ...)
+API_WORLDS = 1
+
+# person storage of the worldmodel:
+# "object" keeps a Person object per person, "columnar" keeps persons in typed arrays
+PERSON_STORE = "object"
+# serialized persons kept by the columnar and sqlite stores, the least recently
+# read are dropped first. Person objects keep their own json
+JSON_CACHE_SIZE = 10000
+
+# where a world keeps its persons, entities and eavs:
+# "memory" keeps them in python objects (PERSON_STORE picks how persons are kept),
+# "sqlite" keeps them in a sqlite database at SQLITE_PATH, each api world in its own file.
+# an existing database file is reset when its world starts
+STORAGE = "memory"
+SQLITE_PATH = "DATA/worldmodel.db"
+# changed persons buffered before they are written to sqlite in one batch
+SQLITE_BATCH_SIZE = 5000
+# clocks between two writes of the buffered persons to sqlite
+SQLITE_FLUSH_INTERVAL = 10
+
+# how many line events of each entity type are kept for resuming snapshot streams
+LINE_EVENTS_HISTORY = 1000
+
+
+## persistence
+
+# directory of the write-ahead log and snapshots, each api world uses a sub directory.
+# None keeps the worlds in memory only
+PERSISTENCE_DIR: str | None = None
+# snapshot interval clock, a restart replays only the log written after the last snapshot
+SNAPSHOT_INTERVAL = 500
+# fsync the log after every write, otherwise a write survives a process crash but not a machine crash.
+# the log is written by a thread of its own, records it did not write yet are lost in a crash
+WAL_FSYNC = False
+
+
+## archive
+
+# clock interval of moving dead persons out of the world into the archive,
+# where they are still found by id and national code. None keeps them in the world
+ARCHIVE_INTERVAL: int | None = 100
+# archive file of worlds without PERSISTENCE_DIR, each api world in its own file,
+# reset when its world starts. None keeps the archive in memory.
+# a persisted world keeps its archive next to its log
+ARCHIVE_PATH: str | None = None
+
+
+## profiling
+
+# the sampling profiler behind /api/profiler/start and /api/profiler/stop, off unless enabled
+PROFILER_ENABLED = False
+# seconds between two stack samples of the profiler
+PROFILER_INTERVAL = 0.005
+# directory of the collapsed stack files (flamegraph.pl, speedscope) the profiler writes
+PROFILER_DIR = "LOGS/profiles"
+
+
+## multi worker
+
+# api worker processes of `python -m src.cluster`, a single owner process holds the
+# worlds and their events, the workers read snapshots from shared memory and
+# forward every other call to the owner
+API_WORKERS = 2
+# bytes of shared memory per entity type line of each world, a longer line is
+# read from the owner instead
+SHARED_LINE_SIZE = 8 * 1024 * 1024
+# seconds between two publishes of the lines changed by scheduled events, lines
+# changed by api calls are published before the call returns
+SHARED_PUBLISH_INTERVAL = 0.01
+
 
 ## intial data for worldmodel
 
@@ -34,3 +105,24 @@ EQ_INTERVAL = 300
 
 #earchquake duration clock:
 EQ_DURATION = 15
+
+
+## logging
+
+# level of every app logger that has no level in LOG_LEVELS
+LOG_LEVEL = "INFO"
+# log file, rotated when it grows past LOG_FILE_MAX_BYTES
+LOG_DIR = "LOGS"
+LOG_FILE_NAME = "worldmodel.log"
+LOG_FILE_MAX_BYTES = 50 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+# records buffered before a file write, WARNING and above are written immediately
+LOG_BUFFER_CAPACITY = 200
+# write log records from a background thread instead of the calling thread
+LOG_QUEUE = True
+# log level per module (logger name), e.g. {"src.models.person": "WARNING"}
+LOG_LEVELS: dict[str, str] = {}
+# write the log file as one json object per line
+LOG_JSON = False
+# fraction of DEBUG/INFO records that are kept, WARNING and above are always kept
+LOG_SAMPLE_RATE = 1.0
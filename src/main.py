@@ -1,10 +1,16 @@
 from contextlib import asynccontextmanager
+import os
 from typing import AsyncIterator, TypedDict
 from fastapi import FastAPI
+import orjson
+from src.api.metrics import MetricsMiddleware
 from src.api.routes import router
-from src.models.enums import EntityEnum
+from src.cluster.remote import OWNER_ENV, OwnerConnection, RemoteWorldModel, connect_worlds
+from src.models.async_world_model import AsyncWorldModel
+from src.models.world_config import WorldConfig
 from src.models.world_model import WorldModel
 from src.utils.logger import get_logger
+from src.utils.profiler import default_profiler
 import src.config as config
 
 # Configure the root logge
@@ -14,27 +20,73 @@ logger = get_logger(__name__)
 
 
 class State(TypedDict):
-    world_model: WorldModel
+    world_model: AsyncWorldModel | RemoteWorldModel
+    worlds: dict[str, AsyncWorldModel] | dict[str, RemoteWorldModel]
+    # connection to the owner process in an api worker, None when the worlds are local
+    owner: OwnerConnection | None
+
+
+def api_world_config(world_id: int) -> WorldConfig:
+    # every world keeps its log, snapshots and database in files of its own
+    sqlite_root, sqlite_extension = os.path.splitext(config.SQLITE_PATH)
+    archive_path = None
+    if config.ARCHIVE_PATH:
+        archive_root, archive_extension = os.path.splitext(config.ARCHIVE_PATH)
+        archive_path = f"{archive_root}-{world_id}{archive_extension}"
+    return WorldConfig(
+        persistence_dir=(
+            os.path.join(config.PERSISTENCE_DIR, str(world_id))
+            if config.PERSISTENCE_DIR
+            else None
+        ),
+        sqlite_path=f"{sqlite_root}-{world_id}{sqlite_extension}",
+        archive_path=archive_path,
+    )
+
+
+def create_worlds() -> dict[str, AsyncWorldModel]:
+    # the first world serves requests without an X-World-Id header
+    return {
+        str(world_id): AsyncWorldModel(
+            WorldModel(config.TIME_RATE, world_config=api_world_config(world_id))
+        )
+        for world_id in range(config.API_WORLDS)
+    }
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[State]:
     logger.info("Setting up application dependencies...")
 
-    # create world model
-    world_model = WorldModel(config.TIME_RATE)
-    world_model.populate_worldModel(config.INITIAL_POPULATION)
-    world_model.fill_entity_line(EntityEnum.HOSPITAL, config.INITIAL_HOSPITAL_LINE)
-    world_model.fill_entity_line(EntityEnum.ECU, config.INITIAL_ECU_LINE)
-    world_model.fill_entity_line(EntityEnum.STORE, config.INITIAL_STORE_LINE)
+    owner_description = os.environ.get(OWNER_ENV)
+    if owner_description:
+        # an api worker of `python -m src.cluster`, the worlds live in the owner process
+        owner, remote_worlds = await connect_worlds(orjson.loads(owner_description))
+        yield {"world_model": remote_worlds["0"], "worlds": remote_worlds, "owner": owner}
+
+        await owner.close()
+        for remote_world in remote_worlds.values():
+            remote_world.close()
+        default_profiler.stop()
+        return
+
+    # every world is owned by the event loop, its events run as tasks of the loop
+    worlds = create_worlds()
+    for world in worlds.values():
+        await world.initialize()
+        world.start()
 
     # return dependencies
-    yield {"world_model": world_model}
+    yield {"world_model": worlds["0"], "worlds": worlds, "owner": None}
 
-    del world_model
+    for world in worlds.values():
+        await world.stop()
+    default_profiler.stop()
+    del worlds
 
 
 # setup fastapi app
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.include_router(router=router)
@@ -0,0 +1,49 @@
+from typing import Mapping
+
+from src.models.entity import Entity
+
+
+class AdmissionControl:
+    """
+    slot accounting of the entities. every person in SERVICE is mapped to the
+    entity serving them and holds one slot of its used_capacity, so admitting
+    and releasing a person are O(1). callers hold the line lock of the
+    entity type.
+    """
+
+    def __init__(self) -> None:
+        # person id -> id of the entity serving the person
+        self.serving: dict[int, int] = dict()
+
+    def admit(self, entity: Entity, person_id: int) -> bool:
+        # an entity at or over its max_capacity admits nobody until slots are released
+        if entity.used_capacity >= entity.max_capacity:
+            return False
+        self.serving[person_id] = entity.id
+        entity.change_used_capacity(1)
+        return True
+
+    def is_served_by(self, entity: Entity, person_id: int) -> bool:
+        return self.serving.get(person_id) == entity.id
+
+    def release(self, person_id: int, entities: Mapping[int, Entity]) -> Entity | None:
+        # frees the slot of the entity serving the person, if any
+        entity_id = self.serving.pop(person_id, None)
+        if entity_id is None:
+            return None
+        entity = entities.get(entity_id)
+        if entity:
+            entity.change_used_capacity(-1)
+        return entity
+
+    def utilization(self, entity: Entity) -> dict:
+        return {
+            "entity_id": entity.id,
+            "entity_type": entity.entity_type,
+            "max_capacity": entity.max_capacity,
+            "used_capacity": entity.used_capacity,
+            "free_capacity": max(entity.max_capacity - entity.used_capacity, 0),
+            "utilization": (
+                entity.used_capacity / entity.max_capacity if entity.max_capacity > 0 else None
+            ),
+        }
@@ -0,0 +1,108 @@
+import io
+import os
+import threading
+from typing import BinaryIO, Iterable
+
+from src.models.person import Person, PersonMixin
+from src.models.persistence import (
+    RECORD_HEADER,
+    RecordKind,
+    decode_persons,
+    encode_persons,
+    iter_records,
+)
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PersonArchive:
+    """
+    cold store of persons that left the world, e.g. the dead. every person is
+    one packed record in an append-only file, only the offset of the record
+    and the national code stay in memory. without a path the records are
+    kept in an in-memory buffer, still a fraction of a Person object each.
+    """
+
+    def __init__(self, path: str | None = None, reset: bool = False) -> None:
+        self.path = path
+        # person id -> position of the person record
+        self.offsets: dict[int, int] = dict()
+        # national_code -> person id
+        self.national_codes: dict[str, int] = dict()
+        self.lock = threading.Lock()
+        self.file: BinaryIO
+        if path is None:
+            self.file = io.BytesIO()
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if reset and os.path.exists(path):
+            os.remove(path)
+        self.file = open(path, "a+b")
+        self._load_index()
+
+    def _load_index(self) -> None:
+        self.file.seek(0)
+        data = self.file.read()
+        end = 0
+        for position, kind, payload in iter_records(data, self.path or "archive"):
+            if kind == RecordKind.PERSONS:
+                _, persons = decode_persons(payload)
+                for person in persons:
+                    self.offsets[person.id] = position
+                    self.national_codes[person.national_code] = person.id
+            end = position + RECORD_HEADER.size + len(payload)
+        if end < len(data):
+            # drop a torn tail so new records follow the last complete one
+            self.file.truncate(end)
+        if self.offsets:
+            logger.info("archive - %s persons found in %s", len(self.offsets), self.path)
+
+    def add(self, persons: Iterable[PersonMixin]) -> None:
+        # one record per person, so a person is read back without its neighbours.
+        # a person already in the archive is not written again
+        with self.lock:
+            records = [
+                (person.id, person.national_code, encode_persons([person], 0))
+                for person in persons
+                if person.id not in self.offsets
+            ]
+            if not records:
+                return
+            position = self.file.seek(0, io.SEEK_END)
+            self.file.write(b"".join(record for _, _, record in records))
+            self.file.flush()
+            for person_id, national_code, record in records:
+                self.offsets[person_id] = position
+                self.national_codes[national_code] = person_id
+                position += len(record)
+
+    def get(self, person_id: int) -> Person | None:
+        with self.lock:
+            position = self.offsets.get(person_id)
+            if position is None:
+                return None
+            self.file.seek(position)
+            _, length, _ = RECORD_HEADER.unpack(self.file.read(RECORD_HEADER.size))
+            payload = self.file.read(length)
+        _, persons = decode_persons(payload)
+        return persons[0]
+
+    def find_by_national_code(self, national_code: str) -> Person | None:
+        person_id = self.national_codes.get(national_code)
+        return None if person_id is None else self.get(person_id)
+
+    def __contains__(self, person_id: object) -> bool:
+        return person_id in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def nbytes(self) -> int:
+        with self.lock:
+            return self.file.seek(0, io.SEEK_END)
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,135 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from src.models.enums import EntityEnum
+from src.models.line_events import LineEvent, LineSubscription
+from src.models.repository import ANY_VALUE
+from src.models.snapshot import Snapshot
+from src.models.world_model import WorldModel
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+R = TypeVar("R")
+
+
+class AsyncWorldModel:
+    """
+    asyncio facade of a WorldModel served from one event loop. calls on the
+    in-memory state run inline on the loop thread, the write-ahead log they
+    append to is written by a thread of its own. everything that waits on a
+    disk runs on the io thread of the world, one job at a time: the scheduled
+    events (snapshots, storage flushes, the archive, repopulation), the
+    initial populate or restore, the final snapshot, person reads that may
+    hit the archive and, with sqlite storage, every call. the world keeps a
+    single writer of its files and the loop never waits on them.
+    """
+
+    def __init__(self, world_model: WorldModel) -> None:
+        self.world_model = world_model
+        self.scheduler_task: asyncio.Task | None = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="world-model-io")
+        # the persons of a sqlite world are rows on disk, any call may read them
+        self.offload_calls = world_model.config.storage != "memory"
+
+    async def run_blocking(self, function: Callable[..., R], *args: Any) -> R:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def call(self, function: Callable[..., R], *args: Any) -> R:
+        if self.offload_calls:
+            return await self.run_blocking(function, *args)
+        return function(*args)
+
+    async def initialize(self) -> None:
+        await self.run_blocking(self.world_model.initialize)
+
+    def start(self) -> None:
+        if self.world_model.virtual_clock is not None:
+            raise RuntimeError("virtual clock worlds are driven with advance")
+        if self.scheduler_task is not None:
+            return
+        self.scheduler_task = asyncio.get_running_loop().create_task(
+            self.world_model.scheduler.run_async(self.executor), name="world-model-scheduler"
+        )
+        logger.info("world_model automation started at clock=%s", self.world_model.clock())
+
+    async def stop(self) -> None:
+        if self.scheduler_task is not None:
+            self.scheduler_task.cancel()
+            try:
+                await self.scheduler_task
+            except asyncio.CancelledError:
+                pass
+            self.scheduler_task = None
+        # runs after an event still in progress on the io thread
+        await self.run_blocking(self.world_model.stop)
+        self.executor.shutdown()
+
+    # ==world model calls==========================================================
+    async def register(
+        self, entity_type: str, max_capacity: int, eav: dict[str, str | int | dict | list]
+    ) -> dict:
+        return await self.call(self.world_model.register, entity_type, max_capacity, eav)
+
+    async def snapshot(self, entity_id: int) -> Snapshot | bool:
+        return await self.call(self.world_model.snapshot, entity_id)
+
+    async def open_line_stream(
+        self, entity_id: int, since: str | None = None
+    ) -> tuple[LineSubscription, list[LineEvent]] | None:
+        return await self.call(
+            self.world_model.open_line_stream, entity_id, asyncio.get_running_loop(), since
+        )
+
+    def close_line_stream(self, subscription: LineSubscription) -> None:
+        self.world_model.close_line_stream(subscription)
+
+    async def accept_person(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call(self.world_model.accept_person, entity_id, persons_id)
+
+    async def service_done(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call(self.world_model.service_done, entity_id, persons_id)
+
+    async def person_injury(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call(self.world_model.person_injury, entity_id, persons_id)
+
+    async def person_death(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
+        return await self.call(self.world_model.person_death, entity_id, persons_id)
+
+    async def batch(
+        self, operations: list[tuple[str, int, list[int]]]
+    ) -> list[dict[str, str | int | list[int]]]:
+        return await self.call(self.world_model.batch, operations)
+
+    async def update_self(
+        self, entity_id: int, max_capacity: int, eav: dict[str, str | int | dict | list]
+    ) -> bool:
+        return await self.call(self.world_model.update_self, entity_id, max_capacity, eav)
+
+    async def find_entities(
+        self, name: str, value: Any = ANY_VALUE, entity_type: EntityEnum | None = None
+    ) -> list[dict]:
+        return await self.call(self.world_model.find_entities, name, value, entity_type)
+
+    async def utilization(self, entity_type: EntityEnum | None = None) -> list[dict]:
+        return await self.call(self.world_model.utilization, entity_type)
+
+    async def entity_utilization(self, entity_id: int) -> dict | None:
+        return await self.call(self.world_model.entity_utilization, entity_id)
+
+    # persons are handed out as json, the form the api and the owner send them in.
+    # an archived person is read from the archive file
+    async def person_json(self, person_id: int) -> bytes | None:
+        return await self.run_blocking(self._person_json, person_id)
+
+    async def person_json_by_national_code(self, national_code: str) -> bytes | None:
+        return await self.run_blocking(self._person_json_by_national_code, national_code)
+
+    def _person_json(self, person_id: int) -> bytes | None:
+        person = self.world_model.get_person(person_id)
+        return person.to_json() if person else None
+
+    def _person_json_by_national_code(self, national_code: str) -> bytes | None:
+        person = self.world_model.find_person_by_national_code(national_code)
+        return person.to_json() if person else None
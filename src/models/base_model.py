@@ -1,10 +1,25 @@
 from datetime import datetime
 
-from src.utils.random_id_generator import UniqueIDGenerator
+from src.utils.random_id_generator import UniqueIDGenerator, default_id_generator
 
 
 class BaseEntity:
-    def __init__(self) -> None:
-        self.id = UniqueIDGenerator.generate_id()
+    # subclasses may set their own id space so their ids stay dense
+    id_space: str = "default"
+
+    def __init__(self, id_generator: UniqueIDGenerator | None = None) -> None:
+        self.id = (id_generator or default_id_generator).generate_id(self.id_space)
         self.creation_date = datetime.now()
         self.modified_date = self.creation_date
+
+    @classmethod
+    def restore(
+        cls, object_id: int, creation_date: datetime, modified_date: datetime, /, **attributes
+    ):
+        # rebuild a persisted object without drawing a new id
+        obj = cls.__new__(cls)
+        obj.id = object_id
+        obj.creation_date = creation_date
+        obj.modified_date = modified_date
+        obj.__dict__.update(attributes)
+        return obj
@@ -1,11 +1,17 @@
 from datetime import datetime
 from src.models.base_model import BaseEntity
 from src.models.enums import EntityEnum
+from src.utils.random_id_generator import UniqueIDGenerator
 
 
 class Entity(BaseEntity):
-    def __init__(self, entity_type: EntityEnum, max_capacity: int) -> None:
-        super().__init__()
+    def __init__(
+        self,
+        entity_type: EntityEnum,
+        max_capacity: int,
+        id_generator: UniqueIDGenerator | None = None,
+    ) -> None:
+        super().__init__(id_generator)
         self.entity_type: EntityEnum = entity_type
         self.max_capacity: int = max_capacity
         self.used_capacity: int = 0
@@ -30,8 +36,14 @@ class Entity(BaseEntity):
 
 
 class EntityAttributeValue(BaseEntity):
-    def __init__(self, entity_id: int, name: str, value: int | str | list | dict):
-        super().__init__()
+    def __init__(
+        self,
+        entity_id: int,
+        name: str,
+        value: int | str | list | dict,
+        id_generator: UniqueIDGenerator | None = None,
+    ):
+        super().__init__(id_generator)
         self.entity_id = entity_id
         self.name = name.lower()
         self.value = value
@@ -0,0 +1,95 @@
+from functools import wraps
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Mapping, ParamSpec, TypeVar
+
+from src.models.enums import EntityEnum, EntityStatus, PersonStatus
+from src.utils.metrics import Counter, Gauge, Histogram
+
+if TYPE_CHECKING:
+    from src.models.world_model import WorldModel
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+METHOD_SECONDS = Histogram(
+    "worldmodel_method_duration_seconds",
+    "time spent in world model methods",
+    ("method",),
+)
+OPERATION_PERSONS = Counter(
+    "worldmodel_operation_persons",
+    "persons accepted or rejected by the world model operations",
+    ("operation", "result"),
+)
+SCHEDULER_LAG = Histogram(
+    "worldmodel_scheduler_lag_seconds",
+    "delay between the due time of a scheduled event and its start",
+    ("event",),
+)
+SCHEDULER_LAST_LAG = Gauge(
+    "worldmodel_scheduler_last_lag_seconds",
+    "delay of the last run of each scheduled event",
+    ("event",),
+)
+POPULATION = Gauge(
+    "worldmodel_population",
+    "persons of a world by status, archived persons count as dead",
+    ("world", "status"),
+)
+LINE_LENGTH = Gauge(
+    "worldmodel_line_length",
+    "persons in each line of a world",
+    ("world", "entity", "status"),
+)
+
+
+def timed_method(method: Callable[P, R]) -> Callable[P, R]:
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            METHOD_SECONDS.observe(perf_counter() - start, method=name)
+
+    return wrapper
+
+
+def person_operation(
+    method: Callable[P, dict[str, list[int]]],
+) -> Callable[P, dict[str, list[int]]]:
+    # timed, and the accepted and rejected persons of every call are counted
+    name = method.__name__
+    timed = timed_method(method)
+
+    @wraps(method)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> dict[str, list[int]]:
+        result = timed(*args, **kwargs)
+        OPERATION_PERSONS.inc(len(result["accepted"]), operation=name, result="accepted")
+        OPERATION_PERSONS.inc(len(result["rejected"]), operation=name, result="rejected")
+        return result
+
+    return wrapper
+
+
+def observe_scheduler_lag(event: str, lag: float) -> None:
+    SCHEDULER_LAG.observe(lag, event=event)
+    SCHEDULER_LAST_LAG.set(lag, event=event)
+
+
+def update_world_gauges(worlds: Mapping[str, "WorldModel"]) -> None:
+    # gauges are read from the worlds when they are scraped
+    for world_id, world_model in worlds.items():
+        population = world_model.population_by_status()
+        for status in PersonStatus:
+            POPULATION.set(population.get(status, 0), world=world_id, status=status.value)
+        for entity in EntityEnum:
+            for status in EntityStatus:
+                LINE_LENGTH.set(
+                    world_model.line_index.line_length(entity, status),
+                    world=world_id,
+                    entity=entity.value,
+                    status=status.value,
+                )
@@ -0,0 +1,100 @@
+import asyncio
+from collections import deque
+import threading
+
+from src.models.enums import EntityEnum
+
+# (sequence number, event name, json encoded data)
+LineEvent = tuple[int, str, bytes]
+
+
+def event_id(token: str, sequence: int) -> str:
+    # the id a client sees, the sequence numbers start over with every world start
+    return f"{token}-{sequence}"
+
+
+def parse_event_id(token: str, value: str | None) -> int | None:
+    # sequence of an event id given by the world started with `token`, None for
+    # an id of another start or of another world
+    if value is None:
+        return None
+    value_token, _, sequence = value.rpartition("-")
+    if value_token != token or not sequence.isdigit():
+        return None
+    return int(sequence)
+
+
+class LineSubscription:
+    def __init__(
+        self,
+        entity_type: EntityEnum,
+        loop: asyncio.AbstractEventLoop,
+        max_size: int,
+        token: str,
+    ) -> None:
+        self.entity_type = entity_type
+        self.loop = loop
+        # the events are numbered by the world started with this token
+        self.token = token
+        self.queue: asyncio.Queue[LineEvent] = asyncio.Queue(max_size)
+        # set when the subscriber fell behind and events had to be dropped,
+        # the stream is closed so the client resumes from its last sequence
+        self.overflowed = False
+
+    def deliver(self, event: LineEvent) -> None:
+        # runs on the subscriber event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class LineEventBus:
+    """
+    numbered stream of line changes per entity type.
+    the last `history` events of each type are kept so a client can resume
+    from a sequence number, live events are pushed to asyncio subscribers.
+    `token` tells the numbers of this bus apart from those of an earlier start.
+    """
+
+    def __init__(self, history: int = 1000, token: str = "") -> None:
+        self.history = history
+        self.token = token
+        self._lock = threading.Lock()
+        self._sequences: dict[EntityEnum, int] = {entity: 0 for entity in EntityEnum}
+        self._events: dict[EntityEnum, deque[LineEvent]] = {
+            entity: deque(maxlen=history) for entity in EntityEnum
+        }
+        self._subscriptions: dict[EntityEnum, set[LineSubscription]] = {
+            entity: set() for entity in EntityEnum
+        }
+
+    def publish(self, entity_type: EntityEnum, event: str, data: bytes) -> None:
+        with self._lock:
+            self._sequences[entity_type] += 1
+            line_event = (self._sequences[entity_type], event, data)
+            self._events[entity_type].append(line_event)
+            for subscription in self._subscriptions[entity_type]:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, line_event)
+
+    def subscribe(
+        self, entity_type: EntityEnum, loop: asyncio.AbstractEventLoop
+    ) -> tuple[LineSubscription, int]:
+        with self._lock:
+            subscription = LineSubscription(entity_type, loop, self.history, self.token)
+            self._subscriptions[entity_type].add(subscription)
+            return subscription, self._sequences[entity_type]
+
+    def unsubscribe(self, subscription: LineSubscription) -> None:
+        with self._lock:
+            self._subscriptions[subscription.entity_type].discard(subscription)
+
+    def replay(self, entity_type: EntityEnum, since: int, until: int) -> list[LineEvent] | None:
+        # None when events after `since` are no longer in the history
+        with self._lock:
+            events = self._events[entity_type]
+            if since > until or (since < until and (not events or events[0][0] > since + 1)):
+                return None
+            return [event for event in events if since < event[0] <= until]
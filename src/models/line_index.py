@@ -0,0 +1,152 @@
+from collections import Counter
+import random
+import threading
+from typing import Callable, Iterable, Iterator
+
+from src.models.enums import EntityEnum, EntityStatus, PersonStatus
+
+LineKey = tuple[EntityEnum, EntityStatus]
+
+# called with (event, entity_type, person_id) whenever an INLINE line changes,
+# event is one of "joined", "left", "died" or "updated"
+LineListener = Callable[[str, EntityEnum, int], None]
+
+
+class IdlePool:
+    """
+    set of person ids backed by an array and a position map, so a random
+    sample and a removal are both O(1) per person. it has the dict interface
+    LineIndex uses for its lines.
+    """
+
+    def __init__(self) -> None:
+        self.ids: list[int] = []
+        self.positions: dict[int, int] = dict()
+
+    def __setitem__(self, person_id: int, _: None) -> None:
+        if person_id not in self.positions:
+            self.positions[person_id] = len(self.ids)
+            self.ids.append(person_id)
+
+    def pop(self, person_id: int, default=None):
+        position = self.positions.pop(person_id, None)
+        if position is None:
+            return default
+        # move the last id into the freed slot
+        last = self.ids.pop()
+        if last != person_id:
+            self.ids[position] = last
+            self.positions[last] = position
+        return None
+
+    def __contains__(self, person_id: object) -> bool:
+        return person_id in self.positions
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids)
+
+    def reset(self, person_ids: list[int]) -> None:
+        self.ids = list(person_ids)
+        self.positions = dict(zip(self.ids, range(len(self.ids))))
+
+    def sample(self, rng: random.Random, count: int) -> list[int]:
+        # partial fisher-yates shuffle: only the first `count` slots are drawn
+        ids, positions = self.ids, self.positions
+        count = min(count, len(ids))
+        for i in range(count):
+            j = rng.randrange(i, len(ids))
+            ids[i], ids[j] = ids[j], ids[i]
+            positions[ids[i]] = i
+            positions[ids[j]] = j
+        return ids[:count]
+
+
+class LineIndex:
+    """
+    secondary index of alive persons keyed by (current_entity, entity_status).
+    each line is a dict used as an insertion-ordered set of person ids, except
+    the persons idle in the city which live in an IdlePool.
+    every change to an INLINE line bumps the version of its entity type.
+    """
+
+    def __init__(self) -> None:
+        self.lines: dict[LineKey, dict[int, None] | IdlePool] = {
+            (entity, status): dict() for entity in EntityEnum for status in EntityStatus
+        }
+        # persons idle in the city are the pool every line refill samples from
+        self.idle_pool = IdlePool()
+        self.lines[(EntityEnum.CITY, EntityStatus.IDLE)] = self.idle_pool
+        self.versions: dict[EntityEnum, int] = {entity: 0 for entity in EntityEnum}
+        self.listener: LineListener | None = None
+        # persons of the world by status, kept up to date as they are added and
+        # change status, so no statistic has to scan the persons.
+        # archived persons stay counted as dead
+        self.population: Counter[PersonStatus] = Counter()
+        # persons change status under the lock of their own line, the
+        # counters are shared by all of them
+        self.population_lock = threading.Lock()
+
+    def _bump(self, key: LineKey, event: str, person_id: int) -> None:
+        if key[1] == EntityStatus.INLINE:
+            self.versions[key[0]] += 1
+            if self.listener:
+                self.listener(event, key[0], person_id)
+
+    def add(self, person_id: int, entity: EntityEnum, status: EntityStatus) -> None:
+        self.lines[(entity, status)][person_id] = None
+        self._bump((entity, status), "joined", person_id)
+
+    def remove(
+        self,
+        person_id: int,
+        entity: EntityEnum,
+        status: EntityStatus,
+        event: str = "left",
+    ) -> None:
+        if self.lines[(entity, status)].pop(person_id, False) is None:
+            self._bump((entity, status), event, person_id)
+
+    def move(self, person_id: int, old_key: LineKey, new_key: LineKey) -> None:
+        if old_key == new_key:
+            self._bump(old_key, "updated", person_id)
+            return
+        self.lines[old_key].pop(person_id, None)
+        self.lines[new_key][person_id] = None
+        self._bump(old_key, "left", person_id)
+        self._bump(new_key, "joined", person_id)
+
+    def restore_line(
+        self, entity: EntityEnum, status: EntityStatus, person_ids: Iterable[int]
+    ) -> None:
+        # replace a whole line, keeping the given order, without any event
+        if (entity, status) == (EntityEnum.CITY, EntityStatus.IDLE):
+            self.idle_pool.reset(list(person_ids))
+        else:
+            self.lines[(entity, status)] = dict.fromkeys(person_ids)
+
+    def touch(self, person_id: int, entity: EntityEnum, status: EntityStatus) -> None:
+        # a person in the line changed without moving
+        if person_id in self.lines[(entity, status)]:
+            self._bump((entity, status), "updated", person_id)
+
+    def contains(self, person_id: int, entity: EntityEnum, status: EntityStatus) -> bool:
+        return person_id in self.lines[(entity, status)]
+
+    def line(self, entity: EntityEnum, status: EntityStatus) -> dict[int, None] | IdlePool:
+        return self.lines[(entity, status)]
+
+    def version(self, entity: EntityEnum) -> int:
+        return self.versions[entity]
+
+    def count_status(self, old: PersonStatus | None, new: PersonStatus) -> None:
+        # old is None for a person that joins the world
+        with self.population_lock:
+            if old is not None:
+                self.population[old] -= 1
+            self.population[new] += 1
+
+    def line_length(self, entity: EntityEnum, status: EntityStatus) -> int:
+        return len(self.lines[(entity, status)])
@@ -0,0 +1,686 @@
+from array import array
+from datetime import datetime
+from enum import IntEnum
+import gc
+import mmap
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+from typing import TYPE_CHECKING, Iterable, Iterator
+import zlib
+
+import orjson
+
+from src.models.entity import Entity, EntityAttributeValue
+from src.models.enums import EntityEnum, EntityStatus, Gender, PersonStatus
+from src.models.person import Person, PersonMixin
+from src.models.person_store import (
+    COLUMN_NAMES,
+    ColumnarNationalCodeIndex,
+    ColumnarPersonStore,
+    line_key,
+    split_line_key,
+)
+from src.utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from src.models.world_model import WorldModel
+
+logger = get_logger(__name__)
+
+_PERSON_STATUSES = list(PersonStatus)
+_GENDERS = list(Gender)
+_PERSON_STATUS_CODES = {status: code for code, status in enumerate(_PERSON_STATUSES)}
+_GENDER_CODES = {gender: code for code, gender in enumerate(_GENDERS)}
+_NO_DATE = float("nan")
+# (current_entity, entity_status) of every packed line key
+_LINES = [
+    split_line_key(key) for key in range(len(EntityEnum) * len(EntityStatus))
+]
+
+# ==write-ahead log=============================================================
+# every record is a header (kind, payload length, crc32 of the payload) and a payload
+RECORD_HEADER = struct.Struct("<BII")
+# id, status, line, gender, birth ordinal, national code, creation, modified, death, name length
+PERSON_ROW = struct.Struct("<qbbbiqdddH")
+# id, status, line, modified, death, id of the serving entity (0 for none)
+PERSON_STATE = struct.Struct("<qbbddq")
+# entity id, max capacity, used capacity
+CAPACITY = struct.Struct("<qqq")
+COUNT = struct.Struct("<I")
+# person count and the national code counter after the persons were created
+PERSONS_HEADER = struct.Struct("<Iq")
+
+
+class RecordKind(IntEnum):
+    PERSONS = 1
+    PERSON_STATES = 2
+    ENTITY = 3
+    CAPACITY = 4
+    NATIONAL_CODES = 5
+    ARCHIVED = 6
+
+
+WAL_FILE = re.compile(r"wal-(\d+)\.log")
+SNAPSHOT_FILE = re.compile(r"snapshot-(\d+)\.bin")
+SNAPSHOT_MAGIC = b"WMSNAP1\n"
+SNAPSHOT_HEADER = struct.Struct("<Q")
+
+
+def encode_record(kind: int, payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload
+
+
+def _timestamp(date: datetime | None) -> float:
+    return date.timestamp() if date else _NO_DATE
+
+
+def _date(timestamp: float) -> datetime | None:
+    return None if timestamp != timestamp else datetime.fromtimestamp(timestamp)
+
+
+def encode_persons(persons: Iterable[PersonMixin], national_code_counter: int) -> bytes:
+    rows = []
+    for person in persons:
+        name = person.name.encode()
+        rows.append(
+            PERSON_ROW.pack(
+                person.id,
+                _PERSON_STATUS_CODES[person.status],
+                line_key(person.current_entity, person.entity_status),
+                _GENDER_CODES[person.gender],
+                person.birth_date.toordinal(),
+                int(person.national_code),
+                person.creation_date.timestamp(),
+                person.modified_date.timestamp(),
+                _timestamp(person.death_date),
+                len(name),
+            )
+            + name
+        )
+    return encode_record(
+        RecordKind.PERSONS,
+        PERSONS_HEADER.pack(len(rows), national_code_counter) + b"".join(rows),
+    )
+
+
+def decode_persons(payload: bytes) -> tuple[int, list[Person]]:
+    # persons of a PERSONS payload, not yet attached to a line index
+    count, national_code_counter = PERSONS_HEADER.unpack_from(payload)
+    position = PERSONS_HEADER.size
+    persons = []
+    for _ in range(count):
+        (
+            person_id,
+            status,
+            line,
+            gender,
+            birth,
+            national_code,
+            created,
+            modified,
+            death,
+            name_length,
+        ) = PERSON_ROW.unpack_from(payload, position)
+        position += PERSON_ROW.size
+        name = payload[position : position + name_length].decode()
+        position += name_length
+        current_entity, entity_status = _LINES[line]
+        persons.append(
+            Person.restore(
+                person_id,
+                datetime.fromtimestamp(created),
+                datetime.fromtimestamp(modified),
+                name=name,
+                gender=_GENDERS[gender],
+                birth_date=datetime.fromordinal(birth),
+                national_code=str(national_code),
+                status=_PERSON_STATUSES[status],
+                current_entity=current_entity,
+                entity_status=entity_status,
+                death_date=_date(death),
+                line_index=None,
+                json_cache=None,
+            )
+        )
+    return national_code_counter, persons
+
+
+def encode_person_states(persons: Iterable[PersonMixin], serving: dict[int, int]) -> bytes:
+    rows = [
+        PERSON_STATE.pack(
+            person.id,
+            _PERSON_STATUS_CODES[person.status],
+            line_key(person.current_entity, person.entity_status),
+            person.modified_date.timestamp(),
+            _timestamp(person.death_date),
+            serving.get(person.id, 0),
+        )
+        for person in persons
+    ]
+    return encode_record(RecordKind.PERSON_STATES, COUNT.pack(len(rows)) + b"".join(rows))
+
+
+def entity_record(entity: Entity, eavs: list[EntityAttributeValue]) -> dict:
+    return {
+        "id": entity.id,
+        "entity_type": entity.entity_type.value,
+        "max_capacity": entity.max_capacity,
+        "used_capacity": entity.used_capacity,
+        "creation_date": entity.creation_date.timestamp(),
+        "modified_date": entity.modified_date.timestamp(),
+        "eavs": [
+            {
+                "id": eav.id,
+                "name": eav.name,
+                "value": eav.value,
+                "creation_date": eav.creation_date.timestamp(),
+                "modified_date": eav.modified_date.timestamp(),
+            }
+            for eav in eavs
+        ],
+    }
+
+
+def encode_capacity(entity: Entity) -> bytes:
+    return encode_record(
+        RecordKind.CAPACITY,
+        CAPACITY.pack(entity.id, entity.max_capacity, entity.used_capacity),
+    )
+
+
+class WriteAheadLog:
+    """
+    append-only log file of one generation. an append only queues its
+    records, a writer thread of the log writes whatever is queued in one
+    write and flushes it to the os, with fsync it also survives a machine
+    crash. the records are written in the order they were appended.
+    """
+
+    def __init__(self, path: str, fsync: bool = False) -> None:
+        self.path = path
+        self.fsync = fsync
+        self.file = open(path, "ab")
+        # None asks the writer to close the file once the records before it are written
+        self.queue: queue.SimpleQueue[bytes | None] = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write, name="wal-writer", daemon=True)
+        self.writer.start()
+
+    def append(self, *records: bytes) -> None:
+        self.queue.put(b"".join(records))
+
+    def _write(self) -> None:
+        while True:
+            records = [self.queue.get()]
+            while not self.queue.empty():
+                records.append(self.queue.get())
+            closing = records[-1] is None
+            if closing:
+                records.pop()
+            if records:
+                try:
+                    self.file.write(b"".join(records))
+                    self.file.flush()
+                    if self.fsync:
+                        os.fsync(self.file.fileno())
+                except OSError:
+                    logger.exception(
+                        "wal - writing %s records to %s failed", len(records), self.path
+                    )
+            if closing:
+                self.file.close()
+                return
+
+    def close(self) -> None:
+        # returns once every record appended before is written
+        self.queue.put(None)
+        self.writer.join()
+
+
+def iter_records(data: bytes, source: str) -> Iterator[tuple[int, int, bytes]]:
+    # (position, kind, payload) of every record, a torn or corrupt record
+    # ends the data, it was never fully written
+    position = 0
+    while position + RECORD_HEADER.size <= len(data):
+        kind, length, checksum = RECORD_HEADER.unpack_from(data, position)
+        start = position + RECORD_HEADER.size
+        payload = data[start : start + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            logger.warning("wal - ignoring torn record at %s:%s", source, position)
+            return
+        yield position, kind, payload
+        position = start + length
+
+
+def read_records(path: str) -> Iterator[tuple[int, bytes]]:
+    with open(path, "rb") as log_file:
+        data = log_file.read()
+    for _, kind, payload in iter_records(data, path):
+        yield kind, payload
+
+
+# ==snapshot===================================================================
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+def write_snapshot(path: str, meta: dict, sections: dict[str, array]) -> None:
+    """
+    snapshot file: magic, meta length, json meta, then every array section
+    8-byte aligned. the meta holds the offset of each section.
+    """
+    offset = 0
+    layout = {}
+    for name, section in sections.items():
+        layout[name] = [section.typecode, offset, len(section)]
+        offset = _align(offset + section.itemsize * len(section))
+    meta_bytes = orjson.dumps({**meta, "byteorder": sys.byteorder, "sections": layout})
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        snapshot_file.write(SNAPSHOT_HEADER.pack(len(meta_bytes)))
+        snapshot_file.write(meta_bytes)
+        data_start = _align(snapshot_file.tell())
+        for name, section in sections.items():
+            snapshot_file.seek(data_start + layout[name][1])
+            snapshot_file.write(section)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> tuple[dict, dict[str, array]]:
+    with open(path, "rb") as snapshot_file:
+        with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError(f"not a world snapshot: {path}")
+            (meta_length,) = SNAPSHOT_HEADER.unpack_from(mapped, len(SNAPSHOT_MAGIC))
+            meta_start = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size
+            meta = orjson.loads(mapped[meta_start : meta_start + meta_length])
+            if meta["byteorder"] != sys.byteorder:
+                raise ValueError(f"snapshot was written on a {meta['byteorder']}-endian machine")
+
+            data_start = _align(meta_start + meta_length)
+            sections = {}
+            view = memoryview(mapped)
+            try:
+                for name, (typecode, offset, length) in meta["sections"].items():
+                    section = array(typecode)
+                    start = data_start + offset
+                    section.frombytes(view[start : start + section.itemsize * length])
+                    sections[name] = section
+            finally:
+                view.release()
+    return meta, sections
+
+
+# ==world persistence===========================================================
+class WorldPersistence:
+    """
+    durability of a world model: mutations are appended to a write-ahead log
+    and the whole state is written to a snapshot every few clocks. each
+    snapshot starts a new log generation, so a restart loads the latest
+    snapshot and replays only the log generations written after it.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False) -> None:
+        self.directory = directory
+        self.fsync = fsync
+        self.generation = 0
+        self.wal: WriteAheadLog | None = None
+        self.snapshot_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _files(self, pattern: re.Pattern) -> dict[int, str]:
+        files = {}
+        for file_name in os.listdir(self.directory):
+            match = pattern.fullmatch(file_name)
+            if match:
+                files[int(match.group(1))] = os.path.join(self.directory, file_name)
+        return files
+
+    def _open_generation(self, generation: int, world: "WorldModel") -> None:
+        if self.wal:
+            self.wal.close()
+        self.generation = generation
+        self.wal = WriteAheadLog(
+            os.path.join(self.directory, f"wal-{generation:08d}.log"), self.fsync
+        )
+        # the national code keys open every generation, the log alone can
+        # then rebuild the allocator
+        self.wal.append(
+            encode_record(RecordKind.NATIONAL_CODES, orjson.dumps(world.national_codes.getstate()))
+        )
+
+    # ==logging=================================================================
+    def log_persons(self, persons: list[PersonMixin], national_code_counter: int) -> None:
+        if self.wal:
+            self.wal.append(encode_persons(persons, national_code_counter))
+
+    def log_operation(
+        self, entity: Entity | None, persons: list[PersonMixin], serving: dict[int, int]
+    ) -> None:
+        # new state of the persons an operation touched and of the entity capacity
+        if not self.wal:
+            return
+        records = [encode_person_states(persons, serving)] if persons else []
+        if entity:
+            records.append(encode_capacity(entity))
+        if records:
+            self.wal.append(*records)
+
+    def log_entity(self, entity: Entity, eavs: list[EntityAttributeValue]) -> None:
+        if self.wal:
+            self.wal.append(
+                encode_record(RecordKind.ENTITY, orjson.dumps(entity_record(entity, eavs)))
+            )
+
+    def log_archived(self, person_ids: list[int]) -> None:
+        # the persons moved to the archive, written after the archive has them
+        if self.wal:
+            self.wal.append(encode_record(RecordKind.ARCHIVED, array("q", person_ids).tobytes()))
+
+    # ==snapshot================================================================
+    def snapshot(self, world: "WorldModel") -> None:
+        with self.snapshot_lock:
+            # holding every line lock stops all mutations while the state is copied
+            with world.lock_lines(*EntityEnum):
+                if isinstance(world.persons, ColumnarPersonStore):
+                    store = world.persons
+                    columns = {name: column[:] for name, column in store.columns().items()}
+                else:
+                    store = ColumnarPersonStore()
+                    for person_id, person in world.persons.items():
+                        store[person_id] = person
+                    columns = store.columns()
+                sections = {f"column:{name}": column for name, column in columns.items()}
+                for (entity, status), line in world.line_index.lines.items():
+                    sections[f"line:{entity.value}:{status.value}"] = array("q", line)
+                sections["serving:person"] = array("q", world.admission.serving.keys())
+                sections["serving:entity"] = array("q", world.admission.serving.values())
+                meta = {
+                    "first_names": list(store.first_names),
+                    "last_names": list(store.last_names),
+                    "entities": [
+                        entity_record(entity, world.eavs.get(entity_id, []))
+                        for entity_id, entity in world.entities.items()
+                    ],
+                    "national_codes": world.national_codes.getstate(),
+                }
+                generation = self.generation + 1
+                self._open_generation(generation, world)
+
+            path = os.path.join(self.directory, f"snapshot-{generation:08d}.bin")
+            write_snapshot(path, {**meta, "generation": generation}, sections)
+
+            # older snapshots and log generations are covered by the new snapshot
+            for old_generation, old_path in self._files(SNAPSHOT_FILE).items():
+                if old_generation < generation:
+                    os.remove(old_path)
+            for old_generation, old_path in self._files(WAL_FILE).items():
+                if old_generation < generation:
+                    os.remove(old_path)
+            logger.info(
+                "persistence - snapshot %s written with %s persons", generation, len(store)
+            )
+
+    # ==restore=================================================================
+    def restore(self, world: "WorldModel") -> bool:
+        """
+        load the latest snapshot and replay the log generations after it into
+        an empty world. opens a new log generation in any case and returns
+        whether there was any state to restore.
+        """
+        snapshots = self._files(SNAPSHOT_FILE)
+        wal_files = self._files(WAL_FILE)
+        snapshot_generation = max(snapshots, default=0)
+        restored = bool(snapshots or wal_files)
+
+        listener, world.line_index.listener = world.line_index.listener, None
+        # millions of new objects would trigger the cyclic gc over and over
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with world.lock_lines(*EntityEnum):
+                if snapshots:
+                    self._load_snapshot(world, snapshots[snapshot_generation])
+                records = 0
+                for generation in sorted(wal_files):
+                    if generation >= snapshot_generation:
+                        for kind, payload in read_records(wal_files[generation]):
+                            self._replay(world, kind, payload)
+                            records += 1
+                self._finish_restore(world)
+        finally:
+            world.line_index.listener = listener
+            if gc_enabled:
+                gc.enable()
+
+        self._open_generation(max([snapshot_generation, *wal_files]) + 1, world)
+        if restored:
+            logger.info(
+                "persistence - restored %s persons and %s entities, replayed %s log records",
+                len(world.persons),
+                len(world.entities),
+                records,
+            )
+        return restored
+
+    def _load_snapshot(self, world: "WorldModel", path: str) -> None:
+        meta, sections = read_snapshot(path)
+        columns = {name: sections[f"column:{name}"] for name in COLUMN_NAMES}
+        store = ColumnarPersonStore.from_columns(
+            columns, meta["first_names"], meta["last_names"], world.config.json_cache_size
+        )
+        if isinstance(world.persons, ColumnarPersonStore):
+            store.line_index = world.line_index
+            world.persons = store
+            world.national_code_index = ColumnarNationalCodeIndex(store)
+        else:
+            world.persons = self._person_objects(store, world)
+            world.national_code_index = {
+                person.national_code: person_id for person_id, person in world.persons.items()
+            }
+        for entity in EntityEnum:
+            for status in EntityStatus:
+                world.line_index.restore_line(
+                    entity, status, sections[f"line:{entity.value}:{status.value}"]
+                )
+        for record in meta["entities"]:
+            self._restore_entity(world, record)
+        world.admission.serving = dict(
+            zip(sections["serving:person"], sections["serving:entity"])
+        )
+        world.national_codes.setstate(meta["national_codes"])
+
+    def _person_objects(
+        self, store: ColumnarPersonStore, world: "WorldModel"
+    ) -> dict[int, Person]:
+        # a single pass over the raw columns, going through PersonView or
+        # BaseEntity.restore for every person is several times slower
+        first_names, last_names = store.first_names, store.last_names
+        fromtimestamp, fromordinal = datetime.fromtimestamp, datetime.fromordinal
+        line_index = world.line_index
+        new_person = Person.__new__
+        persons = dict()
+        rows = zip(
+            range(len(store.status_col)),
+            *(column.tolist() for column in store.columns().values()),
+        )
+        for (
+            person_id,
+            status,
+            line,
+            gender,
+            birth_date,
+            national_code,
+            first_name,
+            last_name,
+            creation_date,
+            modified_date,
+            death_date,
+        ) in rows:
+            if status < 0:
+                continue
+            first, last = first_names[first_name], last_names[last_name]
+            current_entity, entity_status = _LINES[line]
+            person = new_person(Person)
+            person.__dict__ = {
+                "id": person_id,
+                "creation_date": fromtimestamp(creation_date),
+                "modified_date": fromtimestamp(modified_date),
+                "name": f"{first} {last}" if last else first,
+                "gender": _GENDERS[gender],
+                "birth_date": fromordinal(birth_date),
+                "national_code": str(national_code),
+                "status": _PERSON_STATUSES[status],
+                "current_entity": current_entity,
+                "entity_status": entity_status,
+                "death_date": None if death_date != death_date else fromtimestamp(death_date),
+                "line_index": line_index,
+                "json_cache": None,
+            }
+            persons[person_id] = person
+        return persons
+
+    def _restore_entity(self, world: "WorldModel", record: dict) -> None:
+        world.entities[record["id"]] = Entity.restore(
+            record["id"],
+            datetime.fromtimestamp(record["creation_date"]),
+            datetime.fromtimestamp(record["modified_date"]),
+            entity_type=EntityEnum(record["entity_type"]),
+            max_capacity=record["max_capacity"],
+            used_capacity=record["used_capacity"],
+        )
+        world.eavs.restore(
+            record["id"],
+            [
+                EntityAttributeValue.restore(
+                    eav["id"],
+                    datetime.fromtimestamp(eav["creation_date"]),
+                    datetime.fromtimestamp(eav["modified_date"]),
+                    entity_id=record["id"],
+                    name=eav["name"],
+                    value=eav["value"],
+                )
+                for eav in record["eavs"]
+            ],
+        )
+
+    def _replay(self, world: "WorldModel", kind: int, payload: bytes) -> None:
+        match kind:
+            case RecordKind.PERSONS:
+                national_code_counter, persons = decode_persons(payload)
+                for person in persons:
+                    self._replay_new_person(world, person)
+                self._replay_national_codes(world, {"counter": national_code_counter})
+            case RecordKind.PERSON_STATES:
+                (count,) = COUNT.unpack_from(payload)
+                for row in PERSON_STATE.iter_unpack(payload[COUNT.size :]):
+                    self._replay_person_state(world, *row)
+            case RecordKind.ENTITY:
+                self._restore_entity(world, orjson.loads(payload))
+            case RecordKind.CAPACITY:
+                entity_id, max_capacity, used_capacity = CAPACITY.unpack(payload)
+                entity = world.entities.get(entity_id)
+                if entity:
+                    entity.max_capacity = max_capacity
+                    entity.used_capacity = used_capacity
+            case RecordKind.NATIONAL_CODES:
+                self._replay_national_codes(world, orjson.loads(payload))
+            case RecordKind.ARCHIVED:
+                for person_id in array("q", payload):
+                    person = world.persons.get(person_id)
+                    if person is not None:
+                        world.national_code_index.pop(person.national_code, None)
+                        del world.persons[person_id]
+
+    def _replay_new_person(self, world: "WorldModel", person: Person) -> None:
+        person.line_index = world.line_index
+        world.persons[person.id] = person
+        world.national_code_index[person.national_code] = person.id
+        if person.status != PersonStatus.DEAD:
+            world.line_index.add(person.id, person.current_entity, person.entity_status)
+
+    def _replay_person_state(
+        self,
+        world: "WorldModel",
+        person_id: int,
+        status: int,
+        line: int,
+        modified: float,
+        death: float,
+        serving_entity_id: int,
+    ) -> None:
+        person = world.persons.get(person_id)
+        if person is None:
+            return
+        if serving_entity_id:
+            world.admission.serving[person_id] = serving_entity_id
+        else:
+            world.admission.serving.pop(person_id, None)
+        if person.status != PersonStatus.DEAD:
+            world.line_index.remove(person_id, person.current_entity, person.entity_status)
+        person.status = _PERSON_STATUSES[status]
+        person.current_entity, person.entity_status = split_line_key(line)
+        person.modified_date = datetime.fromtimestamp(modified)
+        person.death_date = _date(death)
+        person.json_cache = None
+        if person.status != PersonStatus.DEAD:
+            world.line_index.add(person_id, person.current_entity, person.entity_status)
+
+    def _replay_national_codes(self, world: "WorldModel", state: dict) -> None:
+        # persons may be logged out of allocation order, the counter only grows
+        current = world.national_codes.getstate()
+        world.national_codes.setstate(
+            {
+                "keys": state.get("keys", current["keys"]),
+                "counter": max(state["counter"], current["counter"]),
+            }
+        )
+
+    def _finish_restore(self, world: "WorldModel") -> None:
+        # persons the archive took before a crash kept the log from saying so
+        archived = [person_id for person_id in world.archive.offsets if person_id in world.persons]
+        for person_id in archived:
+            person = world.persons[person_id]
+            world.national_code_index.pop(person.national_code, None)
+            world.line_index.remove(person_id, person.current_entity, person.entity_status)
+            del world.persons[person_id]
+        if archived:
+            logger.info(
+                "persistence - %s persons found in the archive left the world", len(archived)
+            )
+        world.line_index.population = world.count_population()
+        # new ids must not collide with the restored or archived ones
+        world.id_generator.reserve(
+            "person",
+            max(max(world.persons.keys(), default=0), max(world.archive.offsets, default=0)),
+        )
+        default_ids = [*world.entities]
+        for eavs in world.eavs.values():
+            default_ids.extend(eav.id for eav in eavs)
+        world.id_generator.reserve("default", max(default_ids, default=0))
+        # dead persons restored into the world still wait for the archive
+        if isinstance(world.persons, ColumnarPersonStore):
+            dead = _PERSON_STATUS_CODES[PersonStatus.DEAD]
+            world.dead_persons = [
+                person_id
+                for person_id, status in enumerate(world.persons.status_col)
+                if status == dead
+            ]
+        else:
+            world.dead_persons = [
+                person_id
+                for person_id, person in world.persons.items()
+                if person.status == PersonStatus.DEAD
+            ]
+
+    def close(self) -> None:
+        if self.wal:
+            self.wal.close()
+            self.wal = None
@@ -1,73 +1,196 @@
 from datetime import datetime, timedelta
 import random
 import names
+import orjson
 from src.models.base_model import BaseEntity
 from src.models.enums import Gender, EntityStatus, PersonStatus, EntityEnum
+from src.models.line_index import LineIndex
 from src.utils.logger import get_logger
+from src.utils.national_code_allocator import (
+    NationalCodeAllocator,
+    default_national_code_allocator,
+)
+from src.utils.random_id_generator import UniqueIDGenerator
 
 logger = get_logger(__name__)
 
-class Person(BaseEntity):
-    def __init__(
-        self,
-        name: str,
-        gender: Gender,
-        birth_date: datetime,
-        national_code: str,
-        status: PersonStatus,
-        current_entity: EntityEnum,
-        entity_status: EntityStatus,
-        death_date=None,
-    ) -> None:
-        super().__init__()
-        self.name = name
-        self.gender = gender
-        self.birth_date = birth_date
-        self.national_code = national_code
-        self.status = status
-        self.current_entity = current_entity
-        self.entity_status = entity_status
-        self.death_date = death_date
-        logger.info(f"new person created: id={self.id} creation_date={self.creation_date} name={self.name}")     
+class PersonMixin:
+    """
+    person behaviour shared by Person objects and column-backed PersonView objects.
+    subclasses only have to provide the person attributes.
+    """
+
+    __slots__ = ()
+
+    id: int
+    name: str
+    gender: Gender
+    birth_date: datetime
+    national_code: str
+    status: PersonStatus
+    current_entity: EntityEnum
+    entity_status: EntityStatus
+    creation_date: datetime
+    modified_date: datetime
+    death_date: datetime | None
+    line_index: LineIndex | None
+    json_cache: bytes | None
 
     def heal(self) -> None:
+        old_status = self.status
         self.status = PersonStatus.ALIVE
         self.modified_date = datetime.now()
-        logger.info(f"person status changed to alive: id={self.id} name={self.name}")
+        self.json_cache = None
+        if self.line_index:
+            self.line_index.count_status(old_status, self.status)
+            self.line_index.touch(self.id, self.current_entity, self.entity_status)
+        logger.info("person status changed to alive: id=%s name=%s", self.id, self.name)
 
     def injure(self) -> None:
+        old_status = self.status
         self.status = PersonStatus.INJURED
         self.modified_date = datetime.now()
-        logger.info(f"person status changed to injured: id={self.id} name={self.name}")        
+        self.json_cache = None
+        if self.line_index:
+            self.line_index.count_status(old_status, self.status)
+            self.line_index.touch(self.id, self.current_entity, self.entity_status)
+        logger.info(
+            "person status changed to injured: id=%s name=%s",
+            self.id,
+            self.name,
+        )        
 
     def die(self) -> None:
+        old_status = self.status
+        was_alive = old_status != PersonStatus.DEAD
         self.status = PersonStatus.DEAD
         self.death_date = datetime.now()
         self.modified_date = datetime.now()
-        logger.info(f"person status changed to dead: id={self.id} name={self.name}")    
+        self.json_cache = None
+        if self.line_index:
+            self.line_index.count_status(old_status, self.status)
+        if self.line_index and was_alive:
+            self.line_index.remove(
+                self.id, self.current_entity, self.entity_status, event="died"
+            )
+        logger.info("person status changed to dead: id=%s name=%s", self.id, self.name)    
 
     def changeEntity(self, destination: EntityEnum) -> None:
+        old_key = (self.current_entity, self.entity_status)
         self.current_entity = destination
         self.modified_date = datetime.now()
-        logger.info(f"person entity changed to {destination.value}: id={self.id} name={self.name}")     
+        self.json_cache = None
+        if self.line_index and self.status != PersonStatus.DEAD:
+            self.line_index.move(self.id, old_key, (destination, self.entity_status))
+        logger.info(
+            "person entity changed to %s: id=%s name=%s",
+            destination.value,
+            self.id,
+            self.name,
+        )     
 
     def changeEntityStatus(self, status: EntityStatus) -> None:
+        old_key = (self.current_entity, self.entity_status)
         self.entity_status = status
         self.modified_date = datetime.now()
-        logger.info(f"person entity_status changed to {status.value}: id={self.id} name={self.name}")    
+        self.json_cache = None
+        if self.line_index and self.status != PersonStatus.DEAD:
+            self.line_index.move(self.id, old_key, (self.current_entity, status))
+        logger.info(
+            "person entity_status changed to %s: id=%s name=%s",
+            status.value,
+            self.id,
+            self.name,
+        )    
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "creation_date": self.creation_date,
+            "modified_date": self.modified_date,
+            "name": self.name,
+            "gender": self.gender,
+            "birth_date": self.birth_date,
+            "national_code": self.national_code,
+            "status": self.status,
+            "current_entity": self.current_entity,
+            "entity_status": self.entity_status,
+            "death_date": self.death_date,
+        }
+
+    def to_json(self) -> bytes:
+        # cached until the next mutation of the person
+        if self.json_cache is None:
+            self.json_cache = orjson.dumps(self.to_dict())
+        return self.json_cache
+
+    def __str__(self) -> str:
+        return (
+            f"Person ID: {self.id}\n"
+            f"Name: {self.name}\n"
+            f"Gender: {self.gender.name}\n"
+            f"Birth Date: {self.birth_date.strftime('%Y-%m-%d')}\n"
+            f"National Code: {self.national_code}\n"
+            f"Status: {self.status.name}\n"
+            f"Current Entity: {self.current_entity}\n"
+            f"Entity Status: {self.entity_status.name}\n"
+            f"Creation Date: {self.creation_date.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"Modified Date: {self.modified_date.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"Death Date: {self.death_date.strftime('%Y-%m-%d %H:%M:%S') if self.death_date else 'N/A'}"
+        )
+
+
+class Person(PersonMixin, BaseEntity):
+    id_space = "person"
+
+    def __init__(
+        self,
+        name: str,
+        gender: Gender,
+        birth_date: datetime,
+        national_code: str,
+        status: PersonStatus,
+        current_entity: EntityEnum,
+        entity_status: EntityStatus,
+        death_date=None,
+        id_generator: UniqueIDGenerator | None = None,
+    ) -> None:
+        super().__init__(id_generator)
+        self.name = name
+        self.gender = gender
+        self.birth_date = birth_date
+        self.national_code = national_code
+        self.status = status
+        self.current_entity = current_entity
+        self.entity_status = entity_status
+        self.death_date = death_date
+        self.line_index: LineIndex | None = None
+        self.json_cache: bytes | None = None
+        logger.info(
+            "new person created: id=%s creation_date=%s name=%s",
+            self.id,
+            self.creation_date,
+            self.name,
+        )     
 
     @staticmethod
-    def generateRandomPerson():
+    def generateRandomPerson(
+        rng: random.Random | None = None,
+        id_generator: UniqueIDGenerator | None = None,
+        national_codes: NationalCodeAllocator | None = None,
+    ):
+        # falls back to the module level random generator
+        source = rng or random
         genders = list(Gender)
-        gender = random.choice(genders)
+        gender = source.choice(genders)
         name = names.get_full_name(gender="male" if gender == "Male" else "female")
-        national_code = str(random.randint(1000000000, 9999999999))
+        national_code = (national_codes or default_national_code_allocator).allocate()
 
         start_date = datetime(1960, 1, 1)
         end_date = datetime(2005, 12, 31)
         time_between_dates = end_date - start_date
         days_between_dates = time_between_dates.days
-        random_number_of_days = random.randrange(days_between_dates)
+        random_number_of_days = source.randrange(days_between_dates)
         random_birth_date = start_date + timedelta(days=random_number_of_days)
 
         return Person(
@@ -78,19 +201,5 @@ class Person(BaseEntity):
             PersonStatus.ALIVE,
             EntityEnum.CITY,
             EntityStatus.IDLE,
-        )
-
-    def __str__(self) -> str:
-        return (
-            f"Person ID: {self.id}\n"
-            f"Name: {self.name}\n"
-            f"Gender: {self.gender.name}\n"
-            f"Birth Date: {self.birth_date.strftime('%Y-%m-%d')}\n"
-            f"National Code: {self.national_code}\n"
-            f"Status: {self.status.name}\n"
-            f"Current Entity: {self.current_entity}\n"
-            f"Entity Status: {self.entity_status.name}\n"
-            f"Creation Date: {self.creation_date.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"Modified Date: {self.modified_date.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"Death Date: {self.death_date.strftime('%Y-%m-%d %H:%M:%S') if self.death_date else 'N/A'}"
+            id_generator=id_generator,
         )
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import random
+import threading
+
+import names
+
+from src.models.enums import EntityEnum, EntityStatus, Gender, PersonStatus
+from src.models.person import Person
+from src.utils.national_code_allocator import (
+    NationalCodeAllocator,
+    default_national_code_allocator,
+)
+from src.utils.random_id_generator import UniqueIDGenerator, default_id_generator
+
+BIRTH_DATE_START = datetime(1960, 1, 1)
+BIRTH_DATE_END = datetime(2005, 12, 31)
+
+
+class NameTable:
+    """
+    the name distributions of the names package loaded once into memory,
+    names.get_full_name re-reads and scans the data files on every call.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.names: list[str] = []
+        self.cum_weights: list[float] = []
+        with open(file_name) as name_file:
+            for line in name_file:
+                name, _, cumulative, _ = line.split()
+                self.names.append(name.capitalize())
+                self.cum_weights.append(float(cumulative))
+
+    def sample(self, rng: random.Random, count: int) -> list[str]:
+        return rng.choices(self.names, cum_weights=self.cum_weights, k=count)
+
+
+_name_tables: dict[str, NameTable] = dict()
+_name_tables_lock = threading.Lock()
+
+
+def get_name_table(kind: str) -> NameTable:
+    # kind is one of the names package files: "first:male", "first:female", "last"
+    with _name_tables_lock:
+        table = _name_tables.get(kind)
+        if table is None:
+            table = _name_tables[kind] = NameTable(names.FILES[kind])
+        return table
+
+
+def generate_persons(
+    count: int,
+    rng: random.Random | None = None,
+    id_generator: UniqueIDGenerator | None = None,
+    national_codes: NationalCodeAllocator | None = None,
+) -> list[Person]:
+    """
+    create `count` random persons living idle in the city. every random field is
+    drawn for the whole batch at once instead of person by person, and the
+    persons are built without Person.__init__ and its log line per person.
+    """
+    # falls back to the module level random generator
+    source = rng or random
+    genders = source.choices(list(Gender), k=count)
+    male_count = genders.count(Gender.MALE)
+    male_first_names = iter(get_name_table("first:male").sample(source, male_count))
+    female_first_names = iter(
+        get_name_table("first:female").sample(source, count - male_count)
+    )
+    last_names = get_name_table("last").sample(source, count)
+    codes = (national_codes or default_national_code_allocator).allocate_many(count)
+    birth_days = source.choices(
+        range((BIRTH_DATE_END - BIRTH_DATE_START).days), k=count
+    )
+    ids = (id_generator or default_id_generator).generate_ids(count, Person.id_space)
+    created = datetime.now()
+
+    new_person = Person.__new__
+    persons = []
+    for person_id, gender, last_name, national_code, birth_day in zip(
+        ids, genders, last_names, codes, birth_days
+    ):
+        first_name = next(male_first_names) if gender == Gender.MALE else next(female_first_names)
+        person = new_person(Person)
+        person.__dict__ = {
+            "id": person_id,
+            "creation_date": created,
+            "modified_date": created,
+            "name": f"{first_name} {last_name}",
+            "gender": gender,
+            "birth_date": BIRTH_DATE_START + timedelta(days=birth_day),
+            "national_code": national_code,
+            "status": PersonStatus.ALIVE,
+            "current_entity": EntityEnum.CITY,
+            "entity_status": EntityStatus.IDLE,
+            "death_date": None,
+            "line_index": None,
+            "json_cache": None,
+        }
+        persons.append(person)
+    return persons
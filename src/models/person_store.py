@@ -0,0 +1,416 @@
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from src.models.enums import EntityEnum, EntityStatus, Gender, PersonStatus
+from src.models.line_index import LineIndex
+from src.models.person import Person, PersonMixin
+
+_ENTITIES = list(EntityEnum)
+_ENTITY_STATUSES = list(EntityStatus)
+_PERSON_STATUSES = list(PersonStatus)
+_GENDERS = list(Gender)
+
+_ENTITY_CODES = {entity: code for code, entity in enumerate(_ENTITIES)}
+_ENTITY_STATUS_CODES = {status: code for code, status in enumerate(_ENTITY_STATUSES)}
+_PERSON_STATUS_CODES = {status: code for code, status in enumerate(_PERSON_STATUSES)}
+_GENDER_CODES = {gender: code for code, gender in enumerate(_GENDERS)}
+
+# status column value for ids that do not belong to a stored person
+_MISSING = -1
+_NO_DATE = float("nan")
+# slots of the national code index without a person
+_EMPTY = -1
+_REMOVED = -2
+
+COLUMN_NAMES = (
+    "status",
+    "line",
+    "gender",
+    "birth_date",
+    "national_code",
+    "first_name",
+    "last_name",
+    "creation_date",
+    "modified_date",
+    "death_date",
+)
+
+
+def line_key(entity: EntityEnum, status: EntityStatus) -> int:
+    # current_entity and entity_status packed into a single byte column
+    return _ENTITY_CODES[entity] * len(_ENTITY_STATUSES) + _ENTITY_STATUS_CODES[status]
+
+
+def split_line_key(key: int) -> tuple[EntityEnum, EntityStatus]:
+    entity_code, status_code = divmod(key, len(_ENTITY_STATUSES))
+    return _ENTITIES[entity_code], _ENTITY_STATUSES[status_code]
+
+
+class PersonView(PersonMixin):
+    """
+    lightweight handle on one row of a ColumnarPersonStore.
+    attribute reads and writes go straight to the store columns.
+    """
+
+    __slots__ = ("store", "id")
+
+    def __init__(self, store: "ColumnarPersonStore", person_id: int) -> None:
+        self.store = store
+        self.id = person_id
+
+    @property
+    def name(self) -> str:
+        store = self.store
+        first = store.first_names[store.first_name_col[self.id]]
+        last = store.last_names[store.last_name_col[self.id]]
+        return f"{first} {last}" if last else first
+
+    @property
+    def gender(self) -> Gender:
+        return _GENDERS[self.store.gender_col[self.id]]
+
+    @property
+    def birth_date(self) -> datetime:
+        return datetime.fromordinal(self.store.birth_date_col[self.id])
+
+    @property
+    def national_code(self) -> str:
+        return str(self.store.national_code_col[self.id])
+
+    @property
+    def status(self) -> PersonStatus:
+        return _PERSON_STATUSES[self.store.status_col[self.id]]
+
+    @status.setter
+    def status(self, value: PersonStatus) -> None:
+        self.store.status_col[self.id] = _PERSON_STATUS_CODES[value]
+
+    @property
+    def current_entity(self) -> EntityEnum:
+        return _ENTITIES[self.store.line_col[self.id] // len(_ENTITY_STATUSES)]
+
+    @current_entity.setter
+    def current_entity(self, value: EntityEnum) -> None:
+        self.store.line_col[self.id] = line_key(value, self.entity_status)
+
+    @property
+    def entity_status(self) -> EntityStatus:
+        return _ENTITY_STATUSES[self.store.line_col[self.id] % len(_ENTITY_STATUSES)]
+
+    @entity_status.setter
+    def entity_status(self, value: EntityStatus) -> None:
+        self.store.line_col[self.id] = line_key(self.current_entity, value)
+
+    @property
+    def creation_date(self) -> datetime:
+        return datetime.fromtimestamp(self.store.creation_date_col[self.id])
+
+    @property
+    def modified_date(self) -> datetime:
+        return datetime.fromtimestamp(self.store.modified_date_col[self.id])
+
+    @modified_date.setter
+    def modified_date(self, value: datetime) -> None:
+        self.store.modified_date_col[self.id] = value.timestamp()
+
+    @property
+    def death_date(self) -> datetime | None:
+        timestamp = self.store.death_date_col[self.id]
+        return None if timestamp != timestamp else datetime.fromtimestamp(timestamp)
+
+    @death_date.setter
+    def death_date(self, value: datetime | None) -> None:
+        self.store.death_date_col[self.id] = value.timestamp() if value else _NO_DATE
+
+    @property
+    def line_index(self) -> LineIndex | None:
+        return self.store.line_index
+
+    @line_index.setter
+    def line_index(self, value: LineIndex | None) -> None:
+        self.store.line_index = value
+
+    @property
+    def json_cache(self) -> bytes | None:
+        return self.store.cached_json(self.id)
+
+    @json_cache.setter
+    def json_cache(self, value: bytes | None) -> None:
+        self.store.cache_json(self.id, value)
+
+
+class ColumnarPersonStore:
+    """
+    person store that keeps every field in a typed array indexed by person id,
+    so a person costs about 60 bytes here instead of a full python object.
+    its national codes are indexed by a ColumnarNationalCodeIndex, the lines
+    and the ids of the world still keep about 120 bytes per person.
+    it behaves like the dict[int, Person] it replaces and hands out
+    PersonView objects on access. the json of at most `json_cache_size`
+    persons is kept, the least recently read are dropped first.
+    """
+
+    def __init__(self, json_cache_size: int = 10000) -> None:
+        self.line_index: LineIndex | None = None
+        # serialized persons that were read since their last change, oldest read first
+        self.json_cache: OrderedDict[int, bytes] = OrderedDict()
+        self.json_cache_size = json_cache_size
+        self.count = 0
+        self.status_col = array("b")
+        self.line_col = array("b")
+        self.gender_col = array("b")
+        self.birth_date_col = array("i")
+        self.national_code_col = array("q")
+        self.first_name_col = array("i")
+        self.last_name_col = array("i")
+        self.creation_date_col = array("d")
+        self.modified_date_col = array("d")
+        self.death_date_col = array("d")
+        # interned name tables, persons only keep the position in these lists
+        self.first_names: list[str] = []
+        self.last_names: list[str] = []
+        self._first_name_ids: dict[str, int] = dict()
+        self._last_name_ids: dict[str, int] = dict()
+
+    def _columns(self) -> tuple[array, ...]:
+        return tuple(self.columns().values())
+
+    def columns(self) -> dict[str, array]:
+        return {name: getattr(self, f"{name}_col") for name in COLUMN_NAMES}
+
+    @classmethod
+    def from_columns(
+        cls,
+        columns: dict[str, array],
+        first_names: list[str],
+        last_names: list[str],
+        json_cache_size: int = 10000,
+    ) -> "ColumnarPersonStore":
+        # adopts the given arrays, e.g. the columns of a snapshot
+        store = cls(json_cache_size)
+        for name in COLUMN_NAMES:
+            setattr(store, f"{name}_col", columns[name])
+        store.count = len(store.status_col) - store.status_col.count(_MISSING)
+        store.first_names = first_names
+        store.last_names = last_names
+        store._first_name_ids = {name: code for code, name in enumerate(first_names)}
+        store._last_name_ids = {name: code for code, name in enumerate(last_names)}
+        return store
+
+    def _grow(self, size: int) -> None:
+        # over-allocate so appending ids one by one stays amortized O(1)
+        current = len(self.status_col)
+        if size <= current:
+            return
+        extra = max(size - current, current // 2, 1024)
+        self.status_col.extend(array("b", [_MISSING]) * extra)
+        for column in self._columns()[1:]:
+            if column.typecode == "d":
+                column.extend(array("d", [_NO_DATE]) * extra)
+            else:
+                column.extend(array(column.typecode, [0]) * extra)
+
+    def cached_json(self, person_id: int) -> bytes | None:
+        person_json = self.json_cache.get(person_id)
+        if person_json is not None:
+            self.json_cache.move_to_end(person_id)
+        return person_json
+
+    def cache_json(self, person_id: int, person_json: bytes | None) -> None:
+        if person_json is None:
+            self.json_cache.pop(person_id, None)
+            return
+        self.json_cache[person_id] = person_json
+        self.json_cache.move_to_end(person_id)
+        if len(self.json_cache) > self.json_cache_size:
+            self.json_cache.popitem(last=False)
+
+    def _intern(self, name: str, table: list[str], ids: dict[str, int]) -> int:
+        name_id = ids.get(name)
+        if name_id is None:
+            name_id = len(table)
+            table.append(name)
+            ids[name] = name_id
+        return name_id
+
+    def __setitem__(self, person_id: int, person: PersonMixin) -> None:
+        self._grow(person_id + 1)
+        if self.status_col[person_id] == _MISSING:
+            self.count += 1
+
+        self.json_cache.pop(person_id, None)
+        first, _, last = person.name.partition(" ")
+        self.status_col[person_id] = _PERSON_STATUS_CODES[person.status]
+        self.line_col[person_id] = line_key(person.current_entity, person.entity_status)
+        self.gender_col[person_id] = _GENDER_CODES[person.gender]
+        self.birth_date_col[person_id] = person.birth_date.toordinal()
+        self.national_code_col[person_id] = int(person.national_code)
+        self.first_name_col[person_id] = self._intern(
+            first, self.first_names, self._first_name_ids
+        )
+        self.last_name_col[person_id] = self._intern(
+            last, self.last_names, self._last_name_ids
+        )
+        self.creation_date_col[person_id] = person.creation_date.timestamp()
+        self.modified_date_col[person_id] = person.modified_date.timestamp()
+        self.death_date_col[person_id] = (
+            person.death_date.timestamp() if person.death_date else _NO_DATE
+        )
+
+    def __delitem__(self, person_id: int) -> None:
+        # the slot of the person stays allocated, ids index the columns
+        if person_id not in self:
+            raise KeyError(person_id)
+        self.status_col[person_id] = _MISSING
+        self.count -= 1
+        self.json_cache.pop(person_id, None)
+
+    def __contains__(self, person_id: object) -> bool:
+        return (
+            isinstance(person_id, int)
+            and 0 <= person_id < len(self.status_col)
+            and self.status_col[person_id] != _MISSING
+        )
+
+    def __getitem__(self, person_id: int) -> PersonView:
+        if person_id not in self:
+            raise KeyError(person_id)
+        return PersonView(self, person_id)
+
+    def get(self, person_id: int, default: PersonView | None = None) -> PersonView | None:
+        if person_id not in self:
+            return default
+        return PersonView(self, person_id)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        status_col = self.status_col
+        return (
+            person_id
+            for person_id in range(len(status_col))
+            if status_col[person_id] != _MISSING
+        )
+
+    def keys(self) -> Iterator[int]:
+        return iter(self)
+
+    def values(self) -> Iterator[PersonView]:
+        return (PersonView(self, person_id) for person_id in self)
+
+    def count_by_status(self) -> dict[PersonStatus, int]:
+        return {
+            status: self.status_col.count(code) for status, code in _PERSON_STATUS_CODES.items()
+        }
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self._columns())
+
+
+class ColumnarNationalCodeIndex:
+    """
+    national code -> person id for a ColumnarPersonStore. an open addressing
+    table of person ids, the codes are compared in the national code column
+    of the store, so an entry costs 8 to 16 bytes instead of a dict entry and
+    a string. the person has to be in the store before its code is added.
+    """
+
+    def __init__(self, store: ColumnarPersonStore) -> None:
+        self.store = store
+        self.count = 0
+        self.removed = 0
+        self.slots = array("i", [_EMPTY]) * 1024
+        self._rebuild(store)
+
+    def _rebuild(self, person_ids: Iterable[int]) -> None:
+        person_ids = list(person_ids)
+        size = 1024
+        while size < 2 * len(person_ids):
+            size *= 2
+        self.slots = array("i", [_EMPTY]) * size
+        self.count = self.removed = 0
+        codes = self.store.national_code_col
+        for person_id in person_ids:
+            self.slots[self._slot(codes[person_id])] = person_id
+            self.count += 1
+
+    def _slot(self, code: int) -> int:
+        # the slot holding the code, or the empty slot that ends its probe.
+        # the allocator permutes the codes, their low bits are spread already
+        slots, codes = self.slots, self.store.national_code_col
+        mask = len(slots) - 1
+        position = code & mask
+        while True:
+            person_id = slots[position]
+            if person_id == _EMPTY or (person_id != _REMOVED and codes[person_id] == code):
+                return position
+            position = (position + 1) & mask
+
+    @staticmethod
+    def _code(national_code: str) -> int | None:
+        # the codes are stored as numbers, only their canonical spelling matches
+        try:
+            code = int(national_code)
+        except ValueError:
+            return None
+        return code if str(code) == national_code else None
+
+    def get(self, national_code: str, default: int | None = None) -> int | None:
+        code = self._code(national_code)
+        if code is None:
+            return default
+        person_id = self.slots[self._slot(code)]
+        return default if person_id == _EMPTY else person_id
+
+    def __setitem__(self, national_code: str, person_id: int) -> None:
+        position = self._slot(int(national_code))
+        if self.slots[position] == _EMPTY:
+            self.count += 1
+        self.slots[position] = person_id
+        if 2 * (self.count + self.removed) > len(self.slots):
+            self._rebuild(person_id for person_id in self.slots if person_id >= 0)
+
+    def pop(self, national_code: str, default: int | None = None) -> int | None:
+        code = self._code(national_code)
+        if code is None:
+            return default
+        position = self._slot(code)
+        person_id = self.slots[position]
+        if person_id == _EMPTY:
+            return default
+        # the slot stays taken, later codes of its probe are still found
+        self.slots[position] = _REMOVED
+        self.count -= 1
+        self.removed += 1
+        return person_id
+
+    def __getitem__(self, national_code: str) -> int:
+        person_id = self.get(national_code)
+        if person_id is None:
+            raise KeyError(national_code)
+        return person_id
+
+    def keys(self) -> Iterator[str]:
+        codes = self.store.national_code_col
+        return (str(codes[person_id]) for person_id in self.slots if person_id >= 0)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def nbytes(self) -> int:
+        return self.slots.itemsize * len(self.slots)
+
+
+def create_person_store(
+    kind: str, json_cache_size: int = 10000
+) -> dict[int, Person] | ColumnarPersonStore:
+    match kind:
+        case "object":
+            return dict()
+        case "columnar":
+            return ColumnarPersonStore(json_cache_size)
+        case _:
+            raise ValueError(f"unknown person store: {kind}")
@@ -0,0 +1,168 @@
+import threading
+from typing import Any, Iterator
+
+import orjson
+
+from src.models.entity import Entity, EntityAttributeValue
+from src.models.person import Person
+from src.models.person_store import (
+    ColumnarNationalCodeIndex,
+    ColumnarPersonStore,
+    create_person_store,
+)
+from src.models.world_config import WorldConfig
+from src.utils.random_id_generator import UniqueIDGenerator
+
+
+class EntityRepository(dict[int, Entity]):
+    """
+    entities by id, kept in memory. storage backends subclass it and write an
+    entity through to their store in save().
+    """
+
+    def save(self, entity: Entity) -> None:
+        # the in-memory repository holds the entity itself, nothing to write
+        pass
+
+
+# matches every value of an attribute in EavRepository.find
+ANY_VALUE = object()
+
+
+def value_keys(value: Any) -> set[bytes]:
+    # canonical json of the value, a list value is also found by each of its items
+    keys = {orjson.dumps(value, option=orjson.OPT_SORT_KEYS)}
+    if isinstance(value, list):
+        keys.update(orjson.dumps(item, option=orjson.OPT_SORT_KEYS) for item in value)
+    return keys
+
+
+class EavRepository:
+    """
+    attributes keyed by (entity_id, name), kept in memory, with an inverted
+    index from attribute name and value to the entities that have them.
+    """
+
+    def __init__(self) -> None:
+        self.attributes: dict[int, dict[str, EntityAttributeValue]] = dict()
+        self.by_name: dict[str, set[int]] = dict()
+        self.by_value: dict[tuple[str, bytes], set[int]] = dict()
+        self.lock = threading.Lock()
+
+    def _index(self, attribute: EntityAttributeValue) -> None:
+        self.by_name.setdefault(attribute.name, set()).add(attribute.entity_id)
+        for key in value_keys(attribute.value):
+            self.by_value.setdefault((attribute.name, key), set()).add(attribute.entity_id)
+
+    def _unindex(self, attribute: EntityAttributeValue) -> None:
+        self.by_name[attribute.name].discard(attribute.entity_id)
+        for key in value_keys(attribute.value):
+            self.by_value[(attribute.name, key)].discard(attribute.entity_id)
+
+    def get(
+        self, entity_id: int, default: list[EntityAttributeValue] | None = None
+    ) -> list[EntityAttributeValue] | None:
+        attributes = self.attributes.get(entity_id)
+        return default if attributes is None else list(attributes.values())
+
+    def values(self) -> Iterator[list[EntityAttributeValue]]:
+        return (list(attributes.values()) for attributes in self.attributes.values())
+
+    def apply(
+        self,
+        entity_id: int,
+        eav: dict[str, Any],
+        id_generator: UniqueIDGenerator | None = None,
+    ) -> bool:
+        """
+        make the attributes of an entity equal to `eav`. only the attributes
+        that differ are touched, unchanged ones keep their object, id and
+        dates. returns whether anything changed.
+        """
+        values = {name.lower(): value for name, value in eav.items()}
+        changed = False
+        with self.lock:
+            attributes = self.attributes.setdefault(entity_id, dict())
+            for name in [name for name in attributes if name not in values]:
+                self._unindex(attributes.pop(name))
+                changed = True
+            for name, value in values.items():
+                attribute = attributes.get(name)
+                if attribute is None:
+                    attribute = EntityAttributeValue(entity_id, name, value, id_generator)
+                    attributes[name] = attribute
+                elif type(attribute.value) is type(value) and attribute.value == value:
+                    continue
+                else:
+                    self._unindex(attribute)
+                    attribute.update_value(value)
+                self._index(attribute)
+                changed = True
+        return changed
+
+    def restore(self, entity_id: int, eavs: list[EntityAttributeValue]) -> None:
+        # replace the attributes of an entity with persisted objects
+        with self.lock:
+            for attribute in self.attributes.pop(entity_id, dict()).values():
+                self._unindex(attribute)
+            self.attributes[entity_id] = {attribute.name: attribute for attribute in eavs}
+            for attribute in eavs:
+                self._index(attribute)
+
+    def find(self, name: str, value: Any = ANY_VALUE) -> set[int]:
+        """
+        ids of the entities that have the attribute, with the given value when
+        one is given. a list attribute matches each of its items too.
+        """
+        name = name.lower()
+        with self.lock:
+            if value is ANY_VALUE:
+                return set(self.by_name.get(name, ()))
+            key = orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+            return set(self.by_value.get((name, key), ()))
+
+    def save(self, entity_id: int) -> None:
+        pass
+
+
+class WorldStorage:
+    """
+    the persons, entities and eavs of a world. this backend keeps everything
+    in memory, the persons either as Person objects or in a columnar store.
+    """
+
+    def __init__(self, person_store: str = "object", json_cache_size: int = 10000) -> None:
+        self.persons: dict[int, Person] | ColumnarPersonStore = create_person_store(
+            person_store, json_cache_size
+        )
+        self.entities = EntityRepository()
+        self.eavs = EavRepository()
+        # national_code -> person id
+        self.national_code_index: dict[str, int] | ColumnarNationalCodeIndex = (
+            ColumnarNationalCodeIndex(self.persons)
+            if isinstance(self.persons, ColumnarPersonStore)
+            else dict()
+        )
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def create_storage(world_config: WorldConfig) -> WorldStorage:
+    match world_config.storage:
+        case "memory":
+            return WorldStorage(world_config.person_store, world_config.json_cache_size)
+        case "sqlite":
+            # imported here, the sqlite backend builds on the classes above
+            from src.models.sqlite_storage import SQLiteStorage
+
+            return SQLiteStorage(
+                world_config.sqlite_path,
+                world_config.sqlite_batch_size,
+                world_config.json_cache_size,
+            )
+        case _:
+            raise ValueError(f"unknown storage: {world_config.storage}")
@@ -0,0 +1,228 @@
+import asyncio
+from concurrent.futures import Executor
+import heapq
+import itertools
+import threading
+from typing import Callable
+
+from src.models.instrumentation import observe_scheduler_lag
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class VirtualClock:
+    """
+    worldmodel clock that only moves when the scheduler advances it.
+    """
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ScheduledEvent:
+    __slots__ = ("name", "callback", "due", "interval", "cancelled", "last_due")
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable[[], None],
+        due: float,
+        interval: float | None = None,
+    ) -> None:
+        self.name = name
+        self.callback = callback
+        self.due = due
+        self.interval = interval
+        self.cancelled = False
+        # due clock of the run in progress, due has moved on for periodic events
+        self.last_due = due
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class EventScheduler:
+    """
+    runs callbacks at given worldmodel clocks from a single background thread.
+    events are kept in a heap ordered by due clock and the thread sleeps until
+    the earliest one is due, so nothing runs between events.
+    """
+
+    def __init__(self, clock: Callable[[], float], time_rate: float) -> None:
+        self.clock = clock
+        self.time_rate = time_rate
+        self._heap: list[tuple[float, int, ScheduledEvent]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._running = False
+        # set while run_async drives the events from an event loop
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def schedule(
+        self,
+        name: str,
+        callback: Callable[[], None],
+        due: float,
+        interval: float | None = None,
+    ) -> ScheduledEvent:
+        event = ScheduledEvent(name, callback, due, interval)
+        with self._condition:
+            self._push(event)
+            self._condition.notify()
+            if self._loop is not None and self._wakeup is not None:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+        return event
+
+    def schedule_periodic(
+        self,
+        name: str,
+        callback: Callable[[], None],
+        interval: float,
+        first_due: float | None = None,
+    ) -> ScheduledEvent:
+        if first_due is None:
+            first_due = self.clock() + interval
+        return self.schedule(name, callback, first_due, interval)
+
+    def _push(self, event: ScheduledEvent) -> None:
+        heapq.heappush(self._heap, (event.due, next(self._counter), event))
+
+    def start(self) -> None:
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="world-model-scheduler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+            if self._loop is not None and self._wakeup is not None:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _next_due_event(self) -> ScheduledEvent | None:
+        # blocks until an event is due, None once the scheduler is stopped
+        with self._condition:
+            while self._running:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                wait = (self._heap[0][0] - self.clock()) / self.time_rate
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+
+                return self._pop()
+            return None
+
+    def _pop(self) -> ScheduledEvent:
+        event = heapq.heappop(self._heap)[2]
+        event.last_due = event.due
+        if event.interval:
+            # keep the original grid instead of drifting with the run time,
+            # occurrences that were missed entirely are skipped
+            event.due += event.interval
+            now = self.clock()
+            while event.due <= now:
+                event.due += event.interval
+            self._push(event)
+        return event
+
+    def run_until(self, target: float, clock: VirtualClock) -> int:
+        """
+        run every event due up to `target` on the calling thread, moving the
+        virtual clock to each event's due clock first. returns the events run.
+        """
+        ran = 0
+        while True:
+            with self._condition:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap or self._heap[0][0] > target:
+                    break
+                clock.now = max(clock.now, self._heap[0][0])
+                event = self._pop()
+            self.run_event(event)
+            ran += 1
+        clock.now = max(clock.now, target)
+        return ran
+
+    def run_event(self, event: ScheduledEvent) -> None:
+        if self.time_rate:
+            observe_scheduler_lag(
+                event.name, max(self.clock() - event.last_due, 0) / self.time_rate
+            )
+        try:
+            event.callback()
+        except Exception:
+            logger.exception("scheduled event %s failed", event.name)
+
+    async def run_async(self, executor: Executor | None = None) -> None:
+        """
+        run the events as they fall due from the running event loop instead of
+        a thread of their own, until the task is cancelled or stop() is called.
+        the loop stays free for other tasks while no event is due. with an
+        executor the events run on it one after the other, not on the loop.
+        """
+        with self._condition:
+            if self._running:
+                raise RuntimeError("scheduler is already running")
+            self._running = True
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+        wakeup = self._wakeup
+        try:
+            while True:
+                wakeup.clear()
+                event = None
+                with self._condition:
+                    if not self._running:
+                        return
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    wait = (
+                        (self._heap[0][0] - self.clock()) / self.time_rate if self._heap else None
+                    )
+                    if wait is not None and wait <= 0:
+                        event = self._pop()
+                if event is not None:
+                    if executor is not None:
+                        await asyncio.get_running_loop().run_in_executor(
+                            executor, self.run_event, event
+                        )
+                        continue
+                    self.run_event(event)
+                    # requests waiting on the loop go before the next due event
+                    await asyncio.sleep(0)
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), wait)
+                except TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._running = False
+                self._loop = None
+                self._wakeup = None
+
+    def _run(self) -> None:
+        while True:
+            event = self._next_due_event()
+            if event is None:
+                return
+            self.run_event(event)
@@ -1,20 +1,46 @@
-from src.models.base_model import BaseEntity
-from src.models.person import Person
-from src.utils.logger import get_logger
+import orjson
 
-logger = get_logger(__name__)
+from src.models.person import PersonMixin
 
 
-class Snapshot(BaseEntity):
-    def __init__(self, entity_id: int, persons: list[Person], earthquake_status: bool) -> None:
-        super().__init__()
+def serialize_persons(persons: list[PersonMixin]) -> bytes:
+    return b"[" + b",".join([person.to_json() for person in persons]) + b"]"
+
+
+class Snapshot:
+    """
+    read-only view of an entity line, the persons are kept pre-serialized so
+    an unchanged line can be served again without touching the persons.
+    """
+
+    __slots__ = ("entity_id", "persons_json", "earthquake_status", "version", "etag", "_body")
+
+    def __init__(
+        self,
+        entity_id: int,
+        persons_json: bytes,
+        earthquake_status: bool,
+        version: str,
+    ) -> None:
         self.entity_id: int = entity_id
-        self.persons: list[Person] = persons
+        self.persons_json: bytes = persons_json
         self.earthquake_status: bool = earthquake_status
-        logger.info(f"snapshot with id:{self.id} was created for entity with id:{entity_id}")
+        self.version: str = version
+        self.etag: str = f'"{version}"'
+        self._body: bytes | None = None
+
+    def to_json(self) -> bytes:
+        if self._body is None:
+            self._body = b'{"entity_id":%d,"persons":%s,"earthquake_status":%s}' % (
+                self.entity_id,
+                self.persons_json,
+                b"true" if self.earthquake_status else b"false",
+            )
+        return self._body
+
     def to_dict(self):
         return {
             "entity_id": self.entity_id,
-            "persons": self.persons,
+            "persons": orjson.loads(self.persons_json),
             "earthquake_status": self.earthquake_status,
         }
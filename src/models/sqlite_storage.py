@@ -0,0 +1,433 @@
+from collections import OrderedDict
+from datetime import datetime
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Iterator
+
+import orjson
+
+from src.models.entity import Entity
+from src.models.enums import EntityEnum, EntityStatus, Gender, PersonStatus
+from src.models.line_index import LineIndex
+from src.models.person import PersonMixin
+from src.models.repository import EavRepository, EntityRepository, WorldStorage
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+DROP TABLE IF EXISTS persons;
+DROP TABLE IF EXISTS entities;
+DROP TABLE IF EXISTS eavs;
+CREATE TABLE persons (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    gender TEXT NOT NULL,
+    birth_date TEXT NOT NULL,
+    national_code TEXT NOT NULL,
+    status TEXT NOT NULL,
+    current_entity TEXT NOT NULL,
+    entity_status TEXT NOT NULL,
+    creation_date TEXT NOT NULL,
+    modified_date TEXT NOT NULL,
+    death_date TEXT
+);
+CREATE INDEX persons_line ON persons (current_entity, entity_status);
+CREATE INDEX persons_status ON persons (status);
+CREATE INDEX persons_national_code ON persons (national_code);
+CREATE TABLE entities (
+    id INTEGER PRIMARY KEY,
+    entity_type TEXT NOT NULL,
+    max_capacity INTEGER NOT NULL,
+    used_capacity INTEGER NOT NULL,
+    creation_date TEXT NOT NULL,
+    modified_date TEXT NOT NULL
+);
+CREATE TABLE eavs (
+    id INTEGER PRIMARY KEY,
+    entity_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    creation_date TEXT NOT NULL,
+    modified_date TEXT NOT NULL
+);
+CREATE INDEX eavs_entity ON eavs (entity_id);
+"""
+
+PERSON_COLUMNS = (
+    "id",
+    "name",
+    "gender",
+    "birth_date",
+    "national_code",
+    "status",
+    "current_entity",
+    "entity_status",
+    "creation_date",
+    "modified_date",
+    "death_date",
+)
+(
+    _ID,
+    _NAME,
+    _GENDER,
+    _BIRTH_DATE,
+    _NATIONAL_CODE,
+    _STATUS,
+    _CURRENT_ENTITY,
+    _ENTITY_STATUS,
+    _CREATION_DATE,
+    _MODIFIED_DATE,
+    _DEATH_DATE,
+) = range(len(PERSON_COLUMNS))
+
+SELECT_PERSON = f"SELECT {', '.join(PERSON_COLUMNS)} FROM persons WHERE id = ?"
+SELECT_PERSONS_AFTER = (
+    f"SELECT {', '.join(PERSON_COLUMNS)} FROM persons WHERE id > ? ORDER BY id LIMIT ?"
+)
+UPSERT_PERSON = (
+    f"INSERT OR REPLACE INTO persons ({', '.join(PERSON_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(PERSON_COLUMNS))})"
+)
+UPSERT_ENTITY = (
+    "INSERT OR REPLACE INTO entities "
+    "(id, entity_type, max_capacity, used_capacity, creation_date, modified_date) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+INSERT_EAV = (
+    "INSERT INTO eavs (id, entity_id, name, value, creation_date, modified_date) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+# rows read per query when iterating over every person
+_PAGE_SIZE = 1000
+
+
+def _date(value: str | None) -> datetime | None:
+    return None if value is None else datetime.fromisoformat(value)
+
+
+def _iso(value: datetime | None) -> str | None:
+    return None if value is None else value.isoformat()
+
+
+def _column(
+    index: int, decode: Callable[[Any], Any], encode: Callable[[Any], Any] | None = None
+) -> property:
+    # a person attribute backed by one column of the row, writable when encode is given
+    def getter(view: "SQLitePersonView") -> Any:
+        return decode(view.row[index])
+
+    if encode is None:
+        return property(getter)
+
+    def setter(view: "SQLitePersonView", value: Any) -> None:
+        view.store.write(view, index, encode(value))
+
+    return property(getter, setter)
+
+
+class SQLitePersonView(PersonMixin):
+    """
+    handle on one row of a SQLitePersonStore. reads come from the row fetched
+    when the view was created, writes go to the store.
+    """
+
+    __slots__ = ("store", "id", "row")
+
+    name = _column(_NAME, str)
+    gender = _column(_GENDER, Gender)
+    birth_date = _column(_BIRTH_DATE, datetime.fromisoformat)
+    national_code = _column(_NATIONAL_CODE, str)
+    status = _column(_STATUS, PersonStatus, lambda status: status.value)
+    current_entity = _column(_CURRENT_ENTITY, EntityEnum, lambda entity: entity.value)
+    entity_status = _column(_ENTITY_STATUS, EntityStatus, lambda status: status.value)
+    creation_date = _column(_CREATION_DATE, datetime.fromisoformat)
+    modified_date = _column(_MODIFIED_DATE, datetime.fromisoformat, datetime.isoformat)
+    death_date = _column(_DEATH_DATE, _date, _iso)
+
+    def __init__(self, store: "SQLitePersonStore", row: list) -> None:
+        self.store = store
+        self.id = row[_ID]
+        self.row = row
+
+    @property
+    def line_index(self) -> LineIndex | None:
+        return self.store.line_index
+
+    @line_index.setter
+    def line_index(self, value: LineIndex | None) -> None:
+        self.store.line_index = value
+
+    @property
+    def json_cache(self) -> bytes | None:
+        return self.store.cached_json(self.id)
+
+    @json_cache.setter
+    def json_cache(self, value: bytes | None) -> None:
+        self.store.cache_json(self.id, value)
+
+
+class SQLitePersonStore:
+    """
+    person store backed by a sqlite table, the person rows live on disk.
+    the world still keeps the id of every alive person in its LineIndex,
+    about 100 bytes per person in memory. changed rows are buffered and
+    written with one executemany once `batch_size` of them are pending.
+    it behaves like the dict[int, Person] it replaces and hands out
+    SQLitePersonView objects on access. the json of at most `json_cache_size`
+    persons is kept, the least recently read are dropped first.
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        lock: threading.RLock,
+        batch_size: int,
+        json_cache_size: int = 10000,
+    ) -> None:
+        self.connection = connection
+        self.lock = lock
+        self.batch_size = batch_size
+        self.line_index: LineIndex | None = None
+        # serialized persons that were read since their last change, oldest read first
+        self.json_cache: OrderedDict[int, bytes] = OrderedDict()
+        self.json_cache_size = json_cache_size
+        # rows written since the last flush, reads see them before the table
+        self.pending: dict[int, list] = dict()
+
+    def _row(self, person_id: int) -> list | None:
+        with self.lock:
+            row = self.pending.get(person_id)
+            if row is None:
+                fetched = self.connection.execute(SELECT_PERSON, (person_id,)).fetchone()
+                row = list(fetched) if fetched else None
+            return row
+
+    def cached_json(self, person_id: int) -> bytes | None:
+        with self.lock:
+            person_json = self.json_cache.get(person_id)
+            if person_json is not None:
+                self.json_cache.move_to_end(person_id)
+            return person_json
+
+    def cache_json(self, person_id: int, person_json: bytes | None) -> None:
+        with self.lock:
+            if person_json is None:
+                self.json_cache.pop(person_id, None)
+                return
+            self.json_cache[person_id] = person_json
+            self.json_cache.move_to_end(person_id)
+            if len(self.json_cache) > self.json_cache_size:
+                self.json_cache.popitem(last=False)
+
+    def write(self, view: SQLitePersonView, index: int, value: Any) -> None:
+        with self.lock:
+            view.row[index] = value
+            # the pending row may be newer than the row of the view
+            self.pending.setdefault(view.id, view.row)[index] = value
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.pending:
+                self.connection.executemany(UPSERT_PERSON, self.pending.values())
+                self.pending.clear()
+            # also commits the deletes since the last flush
+            self.connection.commit()
+
+    def __setitem__(self, person_id: int, person: PersonMixin) -> None:
+        row = [
+            person_id,
+            person.name,
+            person.gender.value,
+            person.birth_date.isoformat(),
+            person.national_code,
+            person.status.value,
+            person.current_entity.value,
+            person.entity_status.value,
+            person.creation_date.isoformat(),
+            person.modified_date.isoformat(),
+            _iso(person.death_date),
+        ]
+        with self.lock:
+            self.json_cache.pop(person_id, None)
+            self.pending[person_id] = row
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def __delitem__(self, person_id: int) -> None:
+        with self.lock:
+            self.json_cache.pop(person_id, None)
+            self.pending.pop(person_id, None)
+            self.connection.execute("DELETE FROM persons WHERE id = ?", (person_id,))
+
+    def __contains__(self, person_id: object) -> bool:
+        return isinstance(person_id, int) and self._row(person_id) is not None
+
+    def __getitem__(self, person_id: int) -> SQLitePersonView:
+        row = self._row(person_id)
+        if row is None:
+            raise KeyError(person_id)
+        return SQLitePersonView(self, row)
+
+    def get(
+        self, person_id: int, default: SQLitePersonView | None = None
+    ) -> SQLitePersonView | None:
+        row = self._row(person_id)
+        if row is None:
+            return default
+        return SQLitePersonView(self, row)
+
+    def __len__(self) -> int:
+        with self.lock:
+            self.flush()
+            return self.connection.execute("SELECT COUNT(*) FROM persons").fetchone()[0]
+
+    def _pages(self) -> Iterator[list[tuple]]:
+        # keyset pagination keeps memory bounded and never holds the lock between pages
+        self.flush()
+        last_id = -1
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    SELECT_PERSONS_AFTER, (last_id, _PAGE_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][_ID]
+
+    def __iter__(self) -> Iterator[int]:
+        return (row[_ID] for rows in self._pages() for row in rows)
+
+    def keys(self) -> Iterator[int]:
+        return iter(self)
+
+    def values(self) -> Iterator[SQLitePersonView]:
+        return (SQLitePersonView(self, list(row)) for rows in self._pages() for row in rows)
+
+    def count_by_status(self) -> dict[PersonStatus, int]:
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM persons GROUP BY status"
+            ).fetchall()
+        return {PersonStatus(status): count for status, count in rows}
+
+
+class SQLiteNationalCodeIndex:
+    """
+    national code -> person id, looked up in the national code index of the
+    persons table instead of a dict of every person. the code is part of the
+    person row, so adding and removing entries has nothing to do.
+    """
+
+    def __init__(self, persons: SQLitePersonStore) -> None:
+        self.persons = persons
+
+    def get(self, national_code: str, default: int | None = None) -> int | None:
+        persons = self.persons
+        with persons.lock:
+            row = persons.connection.execute(
+                "SELECT id FROM persons WHERE national_code = ?", (national_code,)
+            ).fetchone()
+            if row:
+                return row[0]
+            # persons added since the last flush, national codes never change
+            for pending_row in persons.pending.values():
+                if pending_row[_NATIONAL_CODE] == national_code:
+                    return pending_row[_ID]
+        return default
+
+    def __setitem__(self, national_code: str, person_id: int) -> None:
+        pass
+
+    def pop(self, national_code: str, default: int | None = None) -> int | None:
+        return default
+
+
+class SQLiteEntityRepository(EntityRepository):
+    """
+    entities stay in memory, there are few of them, and every save writes
+    the entity row through to sqlite.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, lock: threading.RLock) -> None:
+        super().__init__()
+        self.connection = connection
+        self.lock = lock
+
+    def save(self, entity: Entity) -> None:
+        with self.lock:
+            self.connection.execute(
+                UPSERT_ENTITY,
+                (
+                    entity.id,
+                    entity.entity_type.value,
+                    entity.max_capacity,
+                    entity.used_capacity,
+                    entity.creation_date.isoformat(),
+                    entity.modified_date.isoformat(),
+                ),
+            )
+            self.connection.commit()
+
+
+class SQLiteEavRepository(EavRepository):
+    def __init__(self, connection: sqlite3.Connection, lock: threading.RLock) -> None:
+        super().__init__()
+        self.connection = connection
+        self.lock = lock
+
+    def save(self, entity_id: int) -> None:
+        # the attributes of an entity are always replaced together
+        with self.lock:
+            self.connection.execute("DELETE FROM eavs WHERE entity_id = ?", (entity_id,))
+            self.connection.executemany(
+                INSERT_EAV,
+                [
+                    (
+                        eav.id,
+                        entity_id,
+                        eav.name,
+                        orjson.dumps(eav.value).decode(),
+                        eav.creation_date.isoformat(),
+                        eav.modified_date.isoformat(),
+                    )
+                    for eav in self.get(entity_id, [])
+                ],
+            )
+            self.connection.commit()
+
+
+class SQLiteStorage(WorldStorage):
+    """
+    world storage in a sqlite database in WAL mode. the database holds one
+    world, an existing file at `path` is reset when the world starts.
+    """
+
+    def __init__(self, path: str, batch_size: int = 5000, json_cache_size: int = 10000) -> None:
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # the connection is shared by the api and scheduler threads behind one lock
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.persons = SQLitePersonStore(self.connection, self.lock, batch_size, json_cache_size)
+        self.national_code_index = SQLiteNationalCodeIndex(self.persons)
+        self.entities = SQLiteEntityRepository(self.connection, self.lock)
+        self.eavs = SQLiteEavRepository(self.connection, self.lock)
+        logger.info("sqlite storage opened at %s", path)
+
+    def flush(self) -> None:
+        self.persons.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self.persons.flush()
+            self.connection.close()
@@ -0,0 +1,50 @@
+from dataclasses import dataclass, field, fields, replace
+from typing import Any
+
+import src.config as config
+
+
+@dataclass(frozen=True)
+class WorldConfig:
+    """
+    settings of a single world model, the defaults come from src.config.
+    """
+
+    time_rate: int = field(default_factory=lambda: config.TIME_RATE)
+    person_store: str = field(default_factory=lambda: config.PERSON_STORE)
+    json_cache_size: int = field(default_factory=lambda: config.JSON_CACHE_SIZE)
+    storage: str = field(default_factory=lambda: config.STORAGE)
+    sqlite_path: str = field(default_factory=lambda: config.SQLITE_PATH)
+    sqlite_batch_size: int = field(default_factory=lambda: config.SQLITE_BATCH_SIZE)
+    sqlite_flush_interval: int = field(default_factory=lambda: config.SQLITE_FLUSH_INTERVAL)
+    line_events_history: int = field(default_factory=lambda: config.LINE_EVENTS_HISTORY)
+    persistence_dir: str | None = field(default_factory=lambda: config.PERSISTENCE_DIR)
+    snapshot_interval: int = field(default_factory=lambda: config.SNAPSHOT_INTERVAL)
+    wal_fsync: bool = field(default_factory=lambda: config.WAL_FSYNC)
+    archive_interval: int | None = field(default_factory=lambda: config.ARCHIVE_INTERVAL)
+    archive_path: str | None = field(default_factory=lambda: config.ARCHIVE_PATH)
+    initial_population: int = field(default_factory=lambda: config.INITIAL_POPULATION)
+    initial_store_line: int = field(default_factory=lambda: config.INITIAL_STORE_LINE)
+    initial_hospital_line: int = field(default_factory=lambda: config.INITIAL_HOSPITAL_LINE)
+    initial_ecu_line: int = field(default_factory=lambda: config.INITIAL_ECU_LINE)
+    rep_interval: int = field(default_factory=lambda: config.REP_INTERVAL)
+    rep_count: int = field(default_factory=lambda: config.REP_COUNT)
+    refill_interval: int = field(default_factory=lambda: config.REFILL_INTERVAL)
+    store_refill_count: int = field(default_factory=lambda: config.STORE_REFILL_COUNT)
+    hospital_refill_count: int = field(default_factory=lambda: config.HOSPITAL_REFILL_COUNT)
+    ecu_refill_count: int = field(default_factory=lambda: config.ECU_REFILL_COUNT)
+    eq_interval: int = field(default_factory=lambda: config.EQ_INTERVAL)
+    eq_duration: int = field(default_factory=lambda: config.EQ_DURATION)
+    # seed of the world random generator, None for a random seed
+    seed: int | None = None
+
+    def with_overrides(self, overrides: dict[str, Any]) -> "WorldConfig":
+        # overrides use the src.config names, e.g. {"INITIAL_POPULATION": 100}
+        names = {item.name for item in fields(self)}
+        values = {}
+        for key, value in overrides.items():
+            name = key.lower()
+            if name not in names:
+                raise ValueError(f"unknown world config: {key}")
+            values[name] = value
+        return replace(self, **values)
@@ -1,54 +1,149 @@
+import asyncio
+from collections import Counter
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
+import os
 import random
-from time import sleep
+import secrets
 import threading
-
-from src.models.person import Person
-from src.models.snapshot import Snapshot
-from src.models.entity import Entity, EntityAttributeValue
+from typing import Any, Callable, Iterator
+
+from src.models.admission import AdmissionControl
+from src.models.archive import PersonArchive
+from src.models.instrumentation import person_operation, timed_method
+from src.models.line_events import (
+    LineEvent,
+    LineEventBus,
+    LineSubscription,
+    parse_event_id,
+)
+from src.models.line_index import LineIndex
+from src.models.persistence import WorldPersistence
+from src.models.person import Person, PersonMixin
+from src.models.person_generator import generate_persons
+from src.models.person_store import ColumnarNationalCodeIndex, ColumnarPersonStore
+from src.models.repository import (
+    ANY_VALUE,
+    EavRepository,
+    EntityRepository,
+    create_storage,
+)
+from src.models.scheduler import EventScheduler, ScheduledEvent, VirtualClock
+from src.models.snapshot import Snapshot, serialize_persons
+from src.models.sqlite_storage import SQLiteNationalCodeIndex, SQLitePersonStore
+from src.models.entity import Entity
 from src.models.enums import EntityStatus, EntityEnum, PersonStatus
+from src.models.world_config import WorldConfig
+from src.utils.national_code_allocator import NationalCodeAllocator
+from src.utils.random_id_generator import UniqueIDGenerator
 from src.utils.logger import get_logger
-import src.config as config
 
 logger = get_logger(__name__)
 
 
 class WorldModel:
-    _last_eq_clock = 0
-    _last_refill_clock = 0
-    _last_populate_clock = 0
-
-    def __init__(self, time_rate: int = 1) -> None:
-        self.time_rate = time_rate
+    def __init__(
+        self,
+        time_rate: int | None = None,
+        virtual_clock: bool = False,
+        world_config: WorldConfig | None = None,
+    ) -> None:
+        self.config = world_config or WorldConfig()
+        self.time_rate = time_rate if time_rate is not None else self.config.time_rate
+        # all randomness of the world comes from its own generators so worlds
+        # with the same seed evolve the same way
+        self.random = random.Random(self.config.seed)
+        self.id_generator = UniqueIDGenerator(random.Random(self.random.random()))
+        self.national_codes = NationalCodeAllocator(random.Random(self.random.random()))
+        # in virtual clock mode the world only moves through advance(),
+        # as fast as the events can be processed
+        self.virtual_clock: VirtualClock | None = VirtualClock() if virtual_clock else None
         self.earthquake_status = False
-        self.entities: dict[int, Entity] = dict()
-        self.eavs: dict[int, list[EntityAttributeValue]] = dict()
-        self.persons: dict[int, Person] = dict()
+        if self.config.storage != "memory" and self.config.persistence_dir:
+            raise ValueError(f"{self.config.storage} storage can not be used with persistence_dir")
+        self.storage = create_storage(self.config)
+        self.entities: EntityRepository = self.storage.entities
+        self.eavs: EavRepository = self.storage.eavs
+        self.persons: dict[int, Person] | ColumnarPersonStore | SQLitePersonStore = (
+            self.storage.persons
+        )
+        self.line_index = LineIndex()
+        if not isinstance(self.persons, dict):
+            # the columnar and sqlite stores keep one line index for all their persons
+            self.persons.line_index = self.line_index
+        self.admission = AdmissionControl()
+        # national_code -> person id, the columnar and sqlite storages look it up
+        # in their own columns
+        self.national_code_index: (
+            dict[str, int] | ColumnarNationalCodeIndex | SQLiteNationalCodeIndex
+        ) = self.storage.national_code_index
+        # unique per world and per start, so two worlds or two runs of one world
+        # never share a snapshot version or a line event id
+        self.instance_token = secrets.token_hex(8)
+        self.line_events = LineEventBus(self.config.line_events_history, self.instance_token)
+        self.line_index.listener = self.publish_line_event
+        # one lock per entity type guards its lines in line_index, the
+        # used_capacity of every entity of that type and their admissions
+        self.line_locks: dict[EntityEnum, threading.RLock] = {
+            entity_type: threading.RLock() for entity_type in EntityEnum
+        }
+        # serialized INLINE line per entity type and last snapshot per entity,
+        # both reused until the line version in line_index changes
+        self.line_cache: dict[EntityEnum, tuple[int, bytes]] = dict()
+        self.snapshot_cache: dict[int, Snapshot] = dict()
+        # write-ahead log and snapshots, the world lives in memory only without it
+        self.persistence: WorldPersistence | None = (
+            WorldPersistence(self.config.persistence_dir, self.config.wal_fsync)
+            if self.config.persistence_dir
+            else None
+        )
+        # dead persons wait in the world until the next archive run moves them
+        # to the archive, a persisted world keeps its archive next to its log
+        self.dead_persons: list[int] = []
+        self.archive = (
+            PersonArchive(os.path.join(self.config.persistence_dir, "archive.bin"))
+            if self.config.persistence_dir
+            else PersonArchive(self.config.archive_path, reset=True)
+        )
         self.start_date = datetime.now()
-        self.automate_thread = threading.Thread(target=self.automate)
-        self.automate_thread.daemon = True
-        self.automate_thread.start()
+        self.scheduler = EventScheduler(self.clock_time, self.time_rate)
+        self.schedule_automation()
         logger.info(
-            f"world_model created at {self.start_date} with time_rate = {self.time_rate}"
+            "world_model created at %s with time_rate = %s",
+            self.start_date,
+            self.time_rate,
         )
 
+    @contextmanager
+    def lock_lines(self, *entity_types: EntityEnum) -> Iterator[None]:
+        # always acquire in EntityEnum declaration order to avoid deadlocks
+        with ExitStack() as stack:
+            for entity_type in EntityEnum:
+                if entity_type in entity_types:
+                    stack.enter_context(self.line_locks[entity_type])
+            yield
+
     # ==register====================================================================
+    @timed_method
     def register(
         self,
         entity_type: str,
         max_capacity: int,
         eav: dict[str, str | int | dict | list],
     ) -> dict:
-        entity = Entity(EntityEnum(entity_type.lower()), max_capacity)
+        entity = Entity(EntityEnum(entity_type.lower()), max_capacity, self.id_generator)
         entity_id = entity.id
 
-        self.entities[entity_id] = entity
-        self.eavs[entity_id] = [
-            EntityAttributeValue(entity.id, name, value) for name, value in eav.items()
-        ]
+        with self.lock_lines(entity.entity_type):
+            self.entities[entity_id] = entity
+            self.eavs.apply(entity_id, eav, self.id_generator)
+            self.journal_entity(entity)
 
         logger.info(
-            f"register - new entity regitered - entity_type: {entity_type} - max-cap: {max_capacity} - id: {entity_id}"
+            "register - new entity regitered - entity_type: %s - max-cap: %s - id: %s",
+            entity_type,
+            max_capacity,
+            entity_id,
         )
 
         return {
@@ -59,63 +154,131 @@ class WorldModel:
         }
 
     # ==snapshot====================================================================
-    def match_snapshot_persons(self, entity: Entity) -> list[Person]:
-        entity_type = entity.entity_type
-        res = [
-            person
-            for person in self.persons.values()
-            if person.current_entity == entity_type
-            and person.entity_status == EntityStatus.INLINE
-            and person.status != PersonStatus.DEAD
-        ]
-        return res
+    @timed_method
+    def match_snapshot_persons(self, entity: Entity) -> list[PersonMixin]:
+        with self.lock_lines(entity.entity_type):
+            line = self.line_index.line(entity.entity_type, EntityStatus.INLINE)
+            return [self.persons[person_id] for person_id in line]
 
+    @timed_method
     def snapshot(self, entity_id: int) -> Snapshot | bool:
         entity = self.entity_exists(entity_id)
 
         if not entity:
             return False
 
-        return Snapshot(
-            entity_id, self.match_snapshot_persons(entity), self.earthquake_status
+        entity_type = entity.entity_type
+        earthquake_status = self.earthquake_status
+        with self.lock_lines(entity_type):
+            line_version = self.line_index.version(entity_type)
+            version = self.snapshot_version(entity_type, line_version, earthquake_status)
+            snapshot = self.snapshot_cache.get(entity_id)
+            if snapshot and snapshot.version == version:
+                return snapshot
+
+            snapshot = Snapshot(
+                entity_id, self.serialized_line(entity_type)[1], earthquake_status, version
+            )
+            self.snapshot_cache[entity_id] = snapshot
+            return snapshot
+
+    def snapshot_version(
+        self, entity_type: EntityEnum, line_version: int, earthquake_status: bool
+    ) -> str:
+        return f"{self.instance_token}-{entity_type.value}-{line_version}-{int(earthquake_status)}"
+
+    def serialized_line(self, entity_type: EntityEnum) -> tuple[int, bytes]:
+        # (line version, INLINE persons json) of an entity type
+        with self.lock_lines(entity_type):
+            line_version = self.line_index.version(entity_type)
+            cached_line = self.line_cache.get(entity_type)
+            if not cached_line or cached_line[0] != line_version:
+                line = self.line_index.line(entity_type, EntityStatus.INLINE)
+                cached_line = (
+                    line_version,
+                    serialize_persons([self.persons[person_id] for person_id in line]),
+                )
+                self.line_cache[entity_type] = cached_line
+            return cached_line
+
+    # ==line events================================================================
+    def publish_line_event(self, event: str, entity_type: EntityEnum, person_id: int) -> None:
+        person_json = b"null"
+        if event in ("joined", "updated"):
+            person = self.persons.get(person_id)
+            if person:
+                person_json = person.to_json()
+        self.line_events.publish(
+            entity_type,
+            event,
+            b'{"person_id":%d,"person":%s}' % (person_id, person_json),
         )
 
-    # ==accpet persons=============================================================
-    def validate_person_to_accept(self, entity: Entity, person_id: int) -> bool:
-        person = self.persons.get(person_id)
-
-        if not person  or person.status == PersonStatus.DEAD:
-            return False
+    @timed_method
+    def open_line_stream(
+        self, entity_id: int, loop: asyncio.AbstractEventLoop, since: str | None = None
+    ) -> tuple[LineSubscription, list[LineEvent]] | None:
+        """
+        subscribe to the line of an entity. the returned events bring the client
+        up to date: the events it missed after the event id `since` when it was
+        sent by this start of the world and they are still in the history,
+        otherwise a full snapshot.
+        """
+        entity = self.entity_exists(entity_id)
+        if not entity:
+            return None
 
-        if (
-            person.current_entity != entity.entity_type
-            or person.entity_status != EntityStatus.INLINE
-        ):
-            return False
+        entity_type = entity.entity_type
+        # holding the line lock keeps the snapshot and the sequence consistent
+        with self.lock_lines(entity_type):
+            subscription, sequence = self.line_events.subscribe(entity_type, loop)
+            since_sequence = parse_event_id(self.instance_token, since)
+            if since_sequence is not None:
+                events = self.line_events.replay(entity_type, since_sequence, sequence)
+                if events is not None:
+                    return subscription, events
+
+            snapshot = self.snapshot(entity_id)
+            if not snapshot:
+                self.line_events.unsubscribe(subscription)
+                return None
+            return subscription, [(sequence, "snapshot", snapshot.to_json())]
+
+    def close_line_stream(self, subscription: LineSubscription) -> None:
+        self.line_events.unsubscribe(subscription)
 
-        return True
+    # ==accpet persons=============================================================
+    def validate_person_to_accept(self, entity: Entity, person_id: int) -> bool:
+        return self.line_index.contains(
+            person_id, entity.entity_type, EntityStatus.INLINE
+        )
 
+    @person_operation
     def accept_person(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
         entity = self.entity_exists(entity_id=entity_id)
         if not entity:
-            logger.error(f"accept-person - entity not found - entity_id: {entity_id}")
+            logger.error("accept-person - entity not found - entity_id: %s", entity_id)
             return {"accepted": [], "rejected": persons_id}
 
         accepted_persons = []
         rejected_persons = []
-        for person_id in persons_id:
-            if self.validate_person_to_accept(entity, person_id):
-                person = self.persons.get(person_id)
-                if person:
-                    person.changeEntity(entity.entity_type)
-                    person.changeEntityStatus(EntityStatus.SERVICE)
+        with self.lock_lines(entity.entity_type):
+            for person_id in persons_id:
+                if not self.validate_person_to_accept(entity, person_id):
+                    rejected_persons.append(person_id)
+                elif not self.admission.admit(entity, person_id):
+                    # the entity is full, the person keeps their place in line
+                    rejected_persons.append(person_id)
+                else:
+                    self.persons[person_id].changeEntityStatus(EntityStatus.SERVICE)
                     accepted_persons.append(person_id)
-            else:
-                rejected_persons.append(person_id)
 
-        entity.change_used_capacity(len(accepted_persons))
+            self.journal_operation(entity, accepted_persons)
         logger.info(
-            f"accept-person - entity_id: {entity_id} - accepteds: {accepted_persons} - rejecteds: {rejected_persons}"
+            "accept-person - entity_id: %s - accepteds: %s - rejecteds: %s",
+            entity_id,
+            accepted_persons,
+            rejected_persons,
         )
         return {"accepted": accepted_persons, "rejected": rejected_persons}
 
@@ -123,53 +286,53 @@ class WorldModel:
 
     # ==service done===============================================================
     def validate_person_for_service_done(self, entity: Entity, person_id: int) -> bool:
-        person = self.persons.get(person_id)
-
-        if not person  or person.status == PersonStatus.DEAD:
-            return False
-
-        if (
-            person.current_entity != entity.entity_type
-            or person.entity_status != EntityStatus.SERVICE
-        ):
-            return False
-
-        return True
+        # only the entity serving the person can finish or injure them
+        return self.line_index.contains(
+            person_id, entity.entity_type, EntityStatus.SERVICE
+        ) and self.admission.is_served_by(entity, person_id)
 
+    @person_operation
     def service_done(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
         entity = self.entity_exists(entity_id)
         if not entity:
-            logger.error(f"service_done: entity not found - entity_id: {entity_id}")
+            logger.error("service_done: entity not found - entity_id: %s", entity_id)
             return {"accepted": [], "rejected": persons_id}
 
         accepted_persons = []
         rejected_persons = []
-        for person_id in persons_id:
-            if self.validate_person_for_service_done(entity, person_id):
-                person = self.persons[person_id]
-                accepted_persons.append(person_id)
-                match entity.entity_type:
-                    case "ecu":
-                        person.changeEntityStatus(EntityStatus.INLINE)
-                        person.changeEntity(EntityEnum.HOSPITAL)
-                    case "hospital":
-                        person.changeEntityStatus(EntityStatus.IDLE)
-                        person.changeEntity(EntityEnum.CITY)
-                    case "store":
-                        person.changeEntityStatus(EntityStatus.IDLE)
-                        person.changeEntity(EntityEnum.CITY)
-            else:
-                rejected_persons.append(person_id)
-
-        entity.change_used_capacity(-1 * len(accepted_persons))
+        with self.lock_lines(entity.entity_type, EntityEnum.HOSPITAL, EntityEnum.CITY):
+            for person_id in persons_id:
+                if self.validate_person_for_service_done(entity, person_id):
+                    person = self.persons[person_id]
+                    accepted_persons.append(person_id)
+                    match entity.entity_type:
+                        case EntityEnum.ECU:
+                            # entity first, so the person never joins the ECU line
+                            person.changeEntity(EntityEnum.HOSPITAL)
+                            person.changeEntityStatus(EntityStatus.INLINE)
+                        case EntityEnum.HOSPITAL:
+                            person.changeEntityStatus(EntityStatus.IDLE)
+                            person.changeEntity(EntityEnum.CITY)
+                        case EntityEnum.STORE:
+                            person.changeEntityStatus(EntityStatus.IDLE)
+                            person.changeEntity(EntityEnum.CITY)
+                    self.admission.release(person_id, self.entities)
+                else:
+                    rejected_persons.append(person_id)
+
+            self.journal_operation(entity, accepted_persons)
         logger.info(
-            f"service_done: entity_id: {entity_id} - accepteds: {accepted_persons} - rejecteds: {rejected_persons}"
+            "service_done: entity_id: %s - accepteds: %s - rejecteds: %s",
+            entity_id,
+            accepted_persons,
+            rejected_persons,
         )
 
         return {"accepted": accepted_persons, "rejected": rejected_persons}
 
     # =============================================================================
 
+    @timed_method
     def update_self(
         self, entity_id: int, max_capacity: int, eav: dict[str, str | int | dict | list]
     ) -> bool:
@@ -180,35 +343,45 @@ class WorldModel:
         if not self.eavs.get(entity_id):
             return False
 
-        entity.update_max_capacity(max_capacity)
-
-        self.eavs[entity_id] = [
-            EntityAttributeValue(entity.id, name, value) for name, value in eav.items()
-        ]
+        with self.lock_lines(entity.entity_type):
+            # only what differs is written, most updates change nothing
+            changed = self.eavs.apply(entity_id, eav, self.id_generator)
+            if entity.max_capacity != max_capacity:
+                entity.update_max_capacity(max_capacity)
+                changed = True
+            if changed:
+                self.journal_entity(entity)
 
         return True
 
     # ==person injury==============================================================
+    @person_operation
     def person_injury(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
         entity = self.entity_exists(entity_id)
         if not entity:
-            logger.error(f"person_injury: entity not found - entity_id: {entity_id}")
+            logger.error("person_injury: entity not found - entity_id: %s", entity_id)
             return {"accepted": [], "rejected": persons_id}
         
         accepted_persons = []
         rejected_persons = []
-        for person_id in persons_id:
-            if self.validate_person_for_service_done(entity, person_id):
-                person = self.persons[person_id]
-                accepted_persons.append(person_id)
-                person.changeEntityStatus(EntityStatus.INLINE)
-                person.changeEntity(EntityEnum.ECU)
-            else:
-                rejected_persons.append(person_id)
-        
-        entity.change_used_capacity(-1 * len(accepted_persons))
+        with self.lock_lines(entity.entity_type, EntityEnum.ECU):
+            for person_id in persons_id:
+                if self.validate_person_for_service_done(entity, person_id):
+                    person = self.persons[person_id]
+                    accepted_persons.append(person_id)
+                    # entity first, so the person never joins the line it leaves
+                    person.changeEntity(EntityEnum.ECU)
+                    person.changeEntityStatus(EntityStatus.INLINE)
+                    self.admission.release(person_id, self.entities)
+                else:
+                    rejected_persons.append(person_id)
+
+            self.journal_operation(entity, accepted_persons)
         logger.info(
-            f"person_injury: entity_id: {entity_id} - accepteds: {accepted_persons} - rejecteds: {rejected_persons}"
+            "person_injury: entity_id: %s - accepteds: %s - rejecteds: %s",
+            entity_id,
+            accepted_persons,
+            rejected_persons,
         )
         return {"accepted": accepted_persons, "rejected": rejected_persons}
     #==============================================================================
@@ -225,38 +398,191 @@ class WorldModel:
 
         return True
 
+    @person_operation
     def person_death(self, entity_id: int, persons_id: list) -> dict[str, list[int]]:
         entity = self.entity_exists(entity_id)
         if not entity:
-            logger.error(f"person_death: entity not found - entity_id: {entity_id}")
+            logger.error("person_death: entity not found - entity_id: %s", entity_id)
             return {"accepted": [], "rejected": persons_id}
 
         accepted_persons = []
         rejected_persons = []
-        for person_id in persons_id:
-            if self.validate_person_for_person_death(entity, person_id):
-                person = self.persons[person_id]
-                accepted_persons.append(person_id)
-                person.die()
-            else:
-                rejected_persons.append(person_id)
-
-        entity.change_used_capacity(-1 * len(accepted_persons))
+        # entities other than this one that were serving a person who died
+        released_entities = set()
+        with self.lock_lines(entity.entity_type):
+            for person_id in persons_id:
+                if self.validate_person_for_person_death(entity, person_id):
+                    person = self.persons[person_id]
+                    accepted_persons.append(person_id)
+                    person.die()
+                    self.dead_persons.append(person_id)
+                    # only a person in service holds a slot, one in line holds none
+                    serving_entity = self.admission.release(person_id, self.entities)
+                    if serving_entity and serving_entity is not entity:
+                        released_entities.add(serving_entity)
+                else:
+                    rejected_persons.append(person_id)
+
+            self.journal_operation(entity, accepted_persons)
+            for serving_entity in released_entities:
+                self.journal_operation(serving_entity, [])
         logger.info(
-            f"person_death: entity_id: {entity_id} - accepteds: {accepted_persons} - rejecteds: {rejected_persons}"
+            "person_death: entity_id: %s - accepteds: %s - rejecteds: %s",
+            entity_id,
+            accepted_persons,
+            rejected_persons,
         )
 
         return {"accepted": accepted_persons, "rejected": rejected_persons}
 
+    # ==batch======================================================================
+    @timed_method
+    def batch(
+        self, operations: list[tuple[str, int, list[int]]]
+    ) -> list[dict[str, str | int | list[int]]]:
+        handlers = {
+            "accept_person": self.accept_person,
+            "service_done": self.service_done,
+            "person_injury": self.person_injury,
+            "person_death": self.person_death,
+        }
+
+        results = []
+        for op, entity_id, persons_id in operations:
+            result = handlers[op](entity_id, persons_id)
+            results.append({"op": op, "entity_id": entity_id, **result})
+
+        logger.info("batch - applied %s operations", len(operations))
+        return results
+
+    # =============================================================================
+
     def start_earthquake(self) -> None:
         self.earthquake_status = True
-        logger.info(f"earthquake started at clock={ self.clock()} ")
+        self.publish_earthquake_status()
+        logger.info("earthquake started at clock=%s ", self.clock())
 
     def stop_earthquake(self) -> None:
         self.earthquake_status = False
-        logger.info(f"earthquake stopped at clock={ self.clock()} ")
+        self.publish_earthquake_status()
+        logger.info("earthquake stopped at clock=%s ", self.clock())
+
+    def publish_earthquake_status(self) -> None:
+        data = b'{"earthquake_status":%s}' % (b"true" if self.earthquake_status else b"false")
+        for entity_type in EntityEnum:
+            self.line_events.publish(entity_type, "earthquake", data)
         
 
+    # ==entity queries=============================================================
+    @timed_method
+    def find_entities(
+        self,
+        name: str,
+        value: Any = ANY_VALUE,
+        entity_type: EntityEnum | None = None,
+    ) -> list[dict]:
+        # looked up in the attribute index, no entity is scanned
+        entities = []
+        for entity_id in sorted(self.eavs.find(name, value)):
+            entity = self.entities.get(entity_id)
+            if entity and (entity_type is None or entity.entity_type == entity_type):
+                entities.append(
+                    {
+                        "entity_id": entity.id,
+                        "entity_type": entity.entity_type,
+                        "max_capacity": entity.max_capacity,
+                        "used_capacity": entity.used_capacity,
+                        "eav": {
+                            attribute.name: attribute.value
+                            for attribute in self.eavs.get(entity_id, [])
+                        },
+                    }
+                )
+        return entities
+
+    # ==statistics=================================================================
+    def population_by_status(self) -> dict[PersonStatus, int]:
+        return {status: count for status, count in self.line_index.population.items() if count}
+
+    def count_population(self) -> Counter[PersonStatus]:
+        # scans every person, the archive only holds dead persons
+        if isinstance(self.persons, dict):
+            counts = Counter(person.status for person in list(self.persons.values()))
+        else:
+            counts = Counter(self.persons.count_by_status())
+        counts[PersonStatus.DEAD] += len(self.archive)
+        return counts
+
+    # ==capacity===================================================================
+    def utilization(self, entity_type: EntityEnum | None = None) -> list[dict]:
+        return [
+            self.admission.utilization(entity)
+            for entity in list(self.entities.values())
+            if entity_type is None or entity.entity_type == entity_type
+        ]
+
+    def entity_utilization(self, entity_id: int) -> dict | None:
+        entity = self.entity_exists(entity_id)
+        if not entity:
+            return None
+        return self.admission.utilization(entity)
+
+    # ==archive====================================================================
+    @timed_method
+    def archive_dead_persons(self) -> int:
+        """
+        move the persons who died since the last run out of the world into the
+        archive, they are still found by get_person and national code.
+        """
+        with self.lock_lines(*EntityEnum):
+            person_ids, self.dead_persons = self.dead_persons, []
+            persons = [
+                person
+                for person in (self.persons.get(person_id) for person_id in person_ids)
+                if person is not None
+            ]
+            if persons:
+                # the archive has the persons before the log says they left
+                self.archive.add(persons)
+                if self.persistence:
+                    self.persistence.log_archived([person.id for person in persons])
+                for person in persons:
+                    self.national_code_index.pop(person.national_code, None)
+                    del self.persons[person.id]
+        logger.info(
+            "archive - %s dead persons archived at clock=%s - archived: %s",
+            len(persons),
+            self.clock(),
+            len(self.archive),
+        )
+        return len(persons)
+
+    # ==persistence================================================================
+    def journal_operation(self, entity: Entity | None, person_ids: list[int]) -> None:
+        # called with the line locks of the operation held, so the log keeps
+        # the order in which persons changed
+        if entity:
+            self.entities.save(entity)
+        if self.persistence:
+            self.persistence.log_operation(
+                entity,
+                [self.persons[person_id] for person_id in person_ids],
+                self.admission.serving,
+            )
+
+    def journal_entity(self, entity: Entity) -> None:
+        self.entities.save(entity)
+        self.eavs.save(entity.id)
+        if self.persistence:
+            self.persistence.log_entity(entity, self.eavs.get(entity.id, []))
+
+    @timed_method
+    def save_snapshot(self) -> None:
+        if self.persistence:
+            self.persistence.snapshot(self)
+
+    # =============================================================================
+
     def entity_exists(self, entity_id) -> Entity | None:
         entity = self.entities.get(entity_id)
 
@@ -265,61 +591,159 @@ class WorldModel:
 
         return entity
 
+    def add_person(self, person: Person) -> None:
+        self.add_persons([person])
+
+    def add_persons(self, persons: list[Person]) -> None:
+        # one lock acquisition for the whole batch
+        entity_types = {person.current_entity for person in persons}
+        with self.lock_lines(*entity_types):
+            for person in persons:
+                person.line_index = self.line_index
+                self.persons[person.id] = person
+                self.national_code_index[person.national_code] = person.id
+                self.line_index.count_status(None, person.status)
+                if person.status != PersonStatus.DEAD:
+                    self.line_index.add(
+                        person.id, person.current_entity, person.entity_status
+                    )
+            if self.persistence:
+                self.persistence.log_persons(
+                    persons, self.national_codes.getstate()["counter"]
+                )
+
+    def get_person(self, person_id: int) -> PersonMixin | None:
+        person = self.persons.get(person_id)
+        if person is None:
+            return self.archive.get(person_id)
+        return person
+
+    def find_person_by_national_code(self, national_code: str) -> PersonMixin | None:
+        person_id = self.national_code_index.get(national_code)
+        if person_id is None:
+            return self.archive.find_by_national_code(national_code)
+        return self.persons.get(person_id)
+
+    @timed_method
     def populate_worldModel(self, persons_count: int = 1):
-        for _ in range(persons_count):
-            person = Person.generateRandomPerson()
-            self.persons[person.id] = person
+        self.add_persons(
+            generate_persons(
+                persons_count, self.random, self.id_generator, self.national_codes
+            )
+        )
         logger.info(
-            f"world_model populated with {persons_count} persons at clock = {self.clock()}"
+            "world_model populated with %s persons at clock = %s",
+            persons_count,
+            self.clock(),
         )
 
+    @timed_method
     def fill_entity_line(self, entity: EntityEnum, count: int = 1):
-        logger.info(f"trying to fill {entity.value} line with {count} persons")
-        persons = list(self.persons.values())
-        idle_persons = list(
-            filter(
-                lambda x: x.entity_status == EntityStatus.IDLE
-                and x.current_entity == EntityEnum.CITY,
-                persons,
-            )
-        )
-        idle_persons_count = len(idle_persons)
+        logger.info("trying to fill %s line with %s persons", entity.value, count)
         c = 0
-        for _ in range(min(count, idle_persons_count)):
-            person = random.choice(idle_persons)
-            person.changeEntity(entity)
-            person.changeEntityStatus(EntityStatus.INLINE)
-            c += 1
+        with self.lock_lines(EntityEnum.CITY, entity):
+            person_ids = self.line_index.idle_pool.sample(self.random, count)
+            for person_id in person_ids:
+                person = self.persons[person_id]
+                person.changeEntity(entity)
+                person.changeEntityStatus(EntityStatus.INLINE)
+                c += 1
+            self.journal_operation(None, person_ids)
         logger.info(
-            f"{entity.value} line filled with {c} persons at clock={self.clock()}"
+            "%s line filled with %s persons at clock=%s",
+            entity.value,
+            c,
+            self.clock(),
         )
 
+    def initialize(self) -> None:
+        # a persisted world continues where it stopped
+        if self.persistence and self.persistence.restore(self):
+            return
+        self.populate_worldModel(self.config.initial_population)
+        self.fill_entity_line(EntityEnum.HOSPITAL, self.config.initial_hospital_line)
+        self.fill_entity_line(EntityEnum.ECU, self.config.initial_ecu_line)
+        self.fill_entity_line(EntityEnum.STORE, self.config.initial_store_line)
+        if self.persistence:
+            self.save_snapshot()
+
+    def refill_entity_lines(self) -> None:
+        self.fill_entity_line(EntityEnum.STORE, self.config.store_refill_count)
+        self.fill_entity_line(EntityEnum.HOSPITAL, self.config.hospital_refill_count)
+        self.fill_entity_line(EntityEnum.ECU, self.config.ecu_refill_count)
+
+    def repopulate(self) -> None:
+        self.populate_worldModel(self.config.rep_count)
+
+    def clock_time(self) -> float:
+        if self.virtual_clock is not None:
+            return self.virtual_clock()
+        delta = datetime.now() - self.start_date
+        return delta.total_seconds() * self.time_rate
+
     def clock(self):
-        now = datetime.now()
-        delta = now - self.start_date
-        return int(delta.total_seconds() * self.time_rate)
-
-    def automate(self):
-        while True:
-            clock = self.clock()
-
-            if clock - WorldModel._last_eq_clock >= config.EQ_INTERVAL:
-                self.start_earthquake()
-                WorldModel._last_eq_clock = clock
-
-            if self.earthquake_status and (
-                clock - WorldModel._last_eq_clock >= config.EQ_DURATION
-            ):
-                self.stop_earthquake()
-
-            if clock - WorldModel._last_refill_clock >= config.REFILL_INTERVAL:
-                self.fill_entity_line(EntityEnum.STORE, config.STORE_REFILL_COUNT)
-                self.fill_entity_line(EntityEnum.HOSPITAL, config.HOSPITAL_REFILL_COUNT)
-                self.fill_entity_line(EntityEnum.ECU, config.ECU_REFILL_COUNT)
-                WorldModel._last_refill_clock = clock
-                
-            if clock - WorldModel._last_populate_clock >= config.REP_INTERVAL:
-                self.populate_worldModel(config.REP_COUNT)
-                WorldModel._last_populate_clock = clock
-            
-            sleep(1 / self.time_rate)
\ No newline at end of file
+        return int(self.clock_time())
+
+    # ==automation=================================================================
+    def schedule_automation(self) -> None:
+        self.register_periodic_event(
+            "earthquake-start", self.config.eq_interval, self.start_earthquake
+        )
+        self.register_periodic_event(
+            "earthquake-stop",
+            self.config.eq_interval,
+            self.stop_earthquake,
+            first_due=self.config.eq_interval + self.config.eq_duration,
+        )
+        self.register_periodic_event(
+            "refill", self.config.refill_interval, self.refill_entity_lines
+        )
+        self.register_periodic_event("repopulate", self.config.rep_interval, self.repopulate)
+        if self.config.storage != "memory":
+            self.register_periodic_event(
+                "storage-flush", self.config.sqlite_flush_interval, self.storage.flush
+            )
+        if self.config.archive_interval:
+            self.register_periodic_event(
+                "archive", self.config.archive_interval, self.archive_dead_persons
+            )
+        if self.persistence:
+            self.register_periodic_event(
+                "snapshot", self.config.snapshot_interval, self.save_snapshot
+            )
+
+    def register_periodic_event(
+        self,
+        name: str,
+        interval: float,
+        callback: Callable[[], None],
+        first_due: float | None = None,
+    ) -> ScheduledEvent:
+        # first_due defaults to one interval after the current clock
+        return self.scheduler.schedule_periodic(name, callback, interval, first_due)
+
+    def advance(self, clocks: float = 1) -> int:
+        """
+        move a virtual clock world forward, running every event that falls due.
+        """
+        if self.virtual_clock is None:
+            raise RuntimeError("advance is only available in virtual clock mode")
+        return self.scheduler.run_until(
+            self.virtual_clock() + clocks, self.virtual_clock
+        )
+
+    def start(self) -> None:
+        if self.virtual_clock is not None:
+            raise RuntimeError("virtual clock worlds are driven with advance")
+        self.scheduler.start()
+        logger.info("world_model automation started at clock=%s", self.clock())
+
+    def stop(self) -> None:
+        self.scheduler.stop()
+        if self.persistence:
+            # a snapshot on shutdown leaves no log to replay on the next start
+            self.save_snapshot()
+            self.persistence.close()
+        self.storage.close()
+        self.archive.close()
+        logger.info("world_model automation stopped at clock=%s", self.clock())
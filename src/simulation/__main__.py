@@ -0,0 +1,62 @@
+"""
+headless fast-forward simulation:
+
+    python -m src.simulation --clocks 10000 --agents 2 --seed 42
+    python -m src.simulation --clocks 10000 --worlds 8 --processes 4 --set INITIAL_POPULATION=500
+    python -m src.simulation --scenarios scenarios.json
+"""
+
+import argparse
+import json
+import logging
+
+import orjson
+
+from src.simulation.multi_world import run_worlds
+from src.simulation.runner import run_simulation
+from src.utils.logger import APP_LOGGER_NAME
+
+
+def parse_overrides(items: list[str]) -> dict:
+    overrides = dict()
+    for item in items:
+        key, _, value = item.partition("=")
+        overrides[key] = json.loads(value)
+    return overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="run a virtual clock worldmodel simulation")
+    parser.add_argument("--clocks", type=int, default=1000, help="clocks to simulate")
+    parser.add_argument("--agents", type=int, default=1, help="scripted agents per entity type")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the first world")
+    parser.add_argument("--log-level", default="WARNING", help="app log level during the run")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="NAME=VALUE",
+        help="override a src.config world setting, e.g. EQ_INTERVAL=100",
+    )
+    parser.add_argument("--worlds", type=int, default=1, help="worlds to run with consecutive seeds")
+    parser.add_argument("--processes", type=int, default=None, help="process pool size")
+    parser.add_argument("--scenarios", help="json file with a list of scenarios")
+    args = parser.parse_args()
+
+    logging.getLogger(APP_LOGGER_NAME).setLevel(args.log_level)
+    overrides = parse_overrides(args.set)
+
+    if args.scenarios:
+        with open(args.scenarios) as scenarios_file:
+            report = run_worlds(json.load(scenarios_file), args.processes)
+    elif args.worlds > 1:
+        first_seed = args.seed or 0
+        scenarios = [
+            {"clocks": args.clocks, "agents": args.agents, "seed": first_seed + i, "config": overrides}
+            for i in range(args.worlds)
+        ]
+        report = run_worlds(scenarios, args.processes)
+    else:
+        report = run_simulation(args.clocks, args.agents, args.seed, overrides)
+    print(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import random
+
+import orjson
+
+from src.models.enums import EntityEnum
+from src.models.world_model import WorldModel
+
+
+class ScriptedAgent:
+    """
+    in-process stand-in for an entity agent: it accepts persons from its line up
+    to its capacity and finishes their service after `service_clocks` clocks.
+    """
+
+    entity_type: EntityEnum
+
+    def __init__(
+        self,
+        world_model: WorldModel,
+        rng: random.Random,
+        max_capacity: int = 5,
+        service_clocks: int = 5,
+    ) -> None:
+        self.world_model = world_model
+        self.rng = rng
+        self.max_capacity = max_capacity
+        self.service_clocks = service_clocks
+        self.entity_id: int = world_model.register(
+            self.entity_type.value, max_capacity, {}
+        )["entity_id"]
+        # person id -> clock the service started
+        self.in_service: dict[int, int] = dict()
+        self.calls = 0
+        self.accepted: dict[str, int] = dict()
+        self.rejected: dict[str, int] = dict()
+
+    def record(self, op: str, result: dict[str, list[int]]) -> None:
+        self.calls += 1
+        self.accepted[op] = self.accepted.get(op, 0) + len(result["accepted"])
+        self.rejected[op] = self.rejected.get(op, 0) + len(result["rejected"])
+        # persons rejected here were moved or killed by someone else
+        for person_id in result["accepted"] + result["rejected"]:
+            self.in_service.pop(person_id, None)
+
+    def step(self, clock: int, earthquake: bool) -> None:
+        if earthquake:
+            self.on_earthquake()
+
+        done = [
+            person_id
+            for person_id, started in self.in_service.items()
+            if clock - started >= self.service_clocks
+        ]
+        if done:
+            self.record("service_done", self.world_model.service_done(self.entity_id, done))
+
+        free = self.max_capacity - len(self.in_service)
+        if free <= 0:
+            return
+
+        snapshot = self.world_model.snapshot(self.entity_id)
+        self.calls += 1
+        if not snapshot:
+            return
+        line = [person["id"] for person in orjson.loads(snapshot.persons_json)]
+        if not line:
+            return
+
+        result = self.world_model.accept_person(self.entity_id, line[:free])
+        self.record("accept_person", result)
+        for person_id in result["accepted"]:
+            self.in_service[person_id] = clock
+
+    def on_earthquake(self) -> None:
+        pass
+
+    def pick_in_service(self, rate: float) -> list[int]:
+        return [person_id for person_id in self.in_service if self.rng.random() < rate]
+
+
+class StoreAgent(ScriptedAgent):
+    entity_type = EntityEnum.STORE
+    injury_rate = 0.1
+
+    def on_earthquake(self) -> None:
+        injured = self.pick_in_service(self.injury_rate)
+        if injured:
+            self.record("person_injury", self.world_model.person_injury(self.entity_id, injured))
+
+
+class ECUAgent(ScriptedAgent):
+    entity_type = EntityEnum.ECU
+
+
+class HospitalAgent(ScriptedAgent):
+    entity_type = EntityEnum.HOSPITAL
+    death_rate = 0.02
+
+    def on_earthquake(self) -> None:
+        dead = self.pick_in_service(self.death_rate)
+        if dead:
+            self.record("person_death", self.world_model.person_death(self.entity_id, dead))
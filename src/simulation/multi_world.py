@@ -0,0 +1,53 @@
+from concurrent.futures import ProcessPoolExecutor
+from statistics import mean
+from typing import Any
+
+from src.simulation.runner import run_simulation
+
+
+def run_scenario(scenario: dict[str, Any]) -> dict:
+    # runs in a worker process, every scenario gets its own independent world
+    return run_simulation(
+        scenario.get("clocks", 1000),
+        scenario.get("agents", 1),
+        scenario.get("seed"),
+        scenario.get("config"),
+    )
+
+
+def aggregate(reports: list[dict]) -> dict:
+    def total(key: str) -> dict[str, int]:
+        res: dict[str, int] = dict()
+        for report in reports:
+            for name, count in report[key].items():
+                res[name] = res.get(name, 0) + count
+        return res
+
+    throughputs = [report["clocks_per_second"] or 0 for report in reports]
+    return {
+        "worlds": len(reports),
+        "clocks": sum(report["clocks"] for report in reports),
+        "calls": sum(report["calls"] for report in reports),
+        "clocks_per_second": {
+            "mean": mean(throughputs),
+            "min": min(throughputs),
+            "max": max(throughputs),
+        },
+        "mean_population": mean(report["population"] for report in reports),
+        "persons_by_status": total("persons_by_status"),
+        "accepted": total("accepted"),
+        "rejected": total("rejected"),
+    }
+
+
+def run_worlds(scenarios: list[dict[str, Any]], processes: int | None = None) -> dict:
+    """
+    run every scenario in its own world on a process pool and aggregate the
+    reports. a scenario is a dict with optional clocks, agents, seed and config
+    (src.config overrides) keys.
+    """
+    if not scenarios:
+        return {"reports": [], "summary": {}}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        reports = list(pool.map(run_scenario, scenarios))
+    return {"reports": reports, "summary": aggregate(reports)}
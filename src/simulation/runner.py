@@ -0,0 +1,75 @@
+from collections import Counter
+from dataclasses import replace
+import random
+from time import perf_counter
+from typing import Any
+
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.world_model import WorldModel
+from src.models.world_config import WorldConfig
+from src.simulation.agents import ECUAgent, HospitalAgent, ScriptedAgent, StoreAgent
+
+
+def run_simulation(
+    clocks: int,
+    agents_per_type: int = 1,
+    seed: int | None = None,
+    overrides: dict[str, Any] | None = None,
+) -> dict:
+    """
+    run a virtual clock world for `clocks` clocks with scripted agents calling
+    the world model in-process, and report throughput and final statistics.
+    `overrides` replaces world settings by their src.config name.
+    """
+    rng = random.Random(seed)
+
+    world_config = replace(WorldConfig().with_overrides(overrides or {}), seed=seed)
+    world_model = WorldModel(virtual_clock=True, world_config=world_config)
+    world_model.initialize()
+    agents: list[ScriptedAgent] = [
+        agent_class(world_model, rng)
+        for agent_class in (StoreAgent, ECUAgent, HospitalAgent)
+        for _ in range(agents_per_type)
+    ]
+
+    events = 0
+    start = perf_counter()
+    for _ in range(clocks):
+        events += world_model.advance(1)
+        clock = world_model.clock()
+        for agent in agents:
+            agent.step(clock, world_model.earthquake_status)
+    elapsed = perf_counter() - start
+
+    calls = sum(agent.calls for agent in agents)
+    accepted: Counter[str] = Counter()
+    rejected: Counter[str] = Counter()
+    for agent in agents:
+        accepted.update(agent.accepted)
+        rejected.update(agent.rejected)
+
+    return {
+        "seed": seed,
+        "overrides": overrides or {},
+        "clocks": clocks,
+        "agents": len(agents),
+        "elapsed_seconds": elapsed,
+        "clocks_per_second": clocks / elapsed if elapsed else None,
+        "calls": calls,
+        "calls_per_second": calls / elapsed if elapsed else None,
+        "scheduled_events": events,
+        "population": len(world_model.persons) + len(world_model.archive),
+        "archived": len(world_model.archive),
+        "persons_by_status": dict(
+            Counter(person.status.value for person in world_model.persons.values())
+        ),
+        "line_lengths": {
+            entity_type.value: world_model.line_index.line_length(
+                entity_type, EntityStatus.INLINE
+            )
+            for entity_type in EntityEnum
+            if entity_type != EntityEnum.CITY
+        },
+        "accepted": dict(accepted),
+        "rejected": dict(rejected),
+    }
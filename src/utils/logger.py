@@ -1,39 +1,81 @@
 """
 logging handling module to create custom and particular loggers.
+
+every logger of the app is a child of a single app logger that owns the
+handlers, the handlers are created once per process from config.
 """
 
+import atexit
 import logging
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+import os
+import queue
+import random
+import threading
 from typing import Literal
 from colorlog.formatter import ColoredFormatter
-import datetime
+import orjson
+
+import src.config as config
 
 LogLevelType = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] | None
 
-DEFAULT_LOG_LEVEL: LogLevelType = "INFO"
+APP_LOGGER_NAME = "worldmodel"
 
 
 class ColorfulFormatter(ColoredFormatter):
     pass
 
 
-def get_logger(
-    name: str = "worldmodel-app",
-    log_level: LogLevelType = DEFAULT_LOG_LEVEL,
-):
-    # create logger
-    logger = logging.getLogger(name=name)
+class JsonFormatter(logging.Formatter):
+    """
+    one json object per line, for log shipping and ad-hoc analysis.
+    """
 
-    # set log level
-    if log_level is not None:
-        logger.setLevel(log_level)
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(data).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    keeps only a fraction of the records below WARNING.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
 
-    # Disable propagation to avoid duplicate logs
-    # logger.propagate = False
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
 
-    # Remove all existing handlers before adding the custom one
-    if logger.hasHandlers():
-        logger.handlers.clear()
 
+class LazyQueueHandler(QueueHandler):
+    """
+    queue handler that leaves message formatting to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+
+_setup_lock = threading.Lock()
+_configured = False
+_sinks: list[logging.Handler] = []
+_queue_listener: QueueListener | None = None
+
+
+def _create_sinks() -> list[logging.Handler]:
     # # set logger handler and formating
     console_handler = logging.StreamHandler()
     formatter = ColorfulFormatter(
@@ -48,15 +90,84 @@ def get_logger(
         },
     )
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    # TODO read LOGS path from CONFIG
-    log_file_name = (
-        f"LOGS/app-log-{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+
+    os.makedirs(config.LOG_DIR, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        os.path.join(config.LOG_DIR, config.LOG_FILE_NAME),
+        maxBytes=config.LOG_FILE_MAX_BYTES,
+        backupCount=config.LOG_FILE_BACKUP_COUNT,
     )
-    fileHandler = logging.FileHandler(log_file_name)
-    fileHandler.setFormatter(
-        logging.Formatter(fmt="%(levelname)s : %(asctime)s - %(name)s - %(message)s")
+    if config.LOG_JSON:
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(
+            logging.Formatter(fmt="%(levelname)s : %(asctime)s - %(name)s - %(message)s")
+        )
+    # records are written to the file in batches, WARNING and above right away
+    buffered_file_handler = MemoryHandler(
+        config.LOG_BUFFER_CAPACITY, flushLevel=logging.WARNING, target=file_handler
     )
-    logger.addHandler(fileHandler)
+    return [console_handler, buffered_file_handler]
+
+
+def setup_logging() -> None:
+    """
+    configure the app logger, later calls are no-ops.
+    """
+    global _configured, _queue_listener
+    with _setup_lock:
+        if _configured:
+            return
+
+        app_logger = logging.getLogger(APP_LOGGER_NAME)
+        app_logger.setLevel(config.LOG_LEVEL)
+        app_logger.propagate = False
+        app_logger.handlers.clear()
+
+        _sinks.extend(_create_sinks())
+        if config.LOG_QUEUE:
+            # records are put on a queue by the calling thread and written by a single
+            # background listener, so request threads never block on console or file i/o
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            handlers: list[logging.Handler] = [LazyQueueHandler(log_queue)]
+            _queue_listener = QueueListener(log_queue, *_sinks)
+            _queue_listener.start()
+        else:
+            handlers = list(_sinks)
+
+        for handler in handlers:
+            if config.LOG_SAMPLE_RATE < 1:
+                handler.addFilter(SamplingFilter(config.LOG_SAMPLE_RATE))
+            app_logger.addHandler(handler)
+
+        atexit.register(shutdown_logging)
+        _configured = True
+
+
+def shutdown_logging() -> None:
+    # drain the queue and flush the buffered file sink
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+    for sink in _sinks:
+        try:
+            sink.flush()
+        except ValueError:
+            # the stream was closed before the interpreter exit, e.g. by a test runner
+            pass
+
+
+def get_logger(name: str = APP_LOGGER_NAME, log_level: LogLevelType = None) -> logging.Logger:
+    setup_logging()
+
+    if name != APP_LOGGER_NAME and not name.startswith(f"{APP_LOGGER_NAME}."):
+        name = f"{APP_LOGGER_NAME}.{name}"
+    logger = logging.getLogger(name)
+
+    # per-module levels from config take precedence
+    log_level = config.LOG_LEVELS.get(name.removeprefix(f"{APP_LOGGER_NAME}."), log_level)
+    if log_level is not None:
+        logger.setLevel(log_level)
 
     return logger
@@ -0,0 +1,176 @@
+"""
+process wide metrics in the prometheus text format, a minimal counterpart of
+prometheus_client: counters, gauges and histograms with labels, kept in a
+registry that renders them for the /metrics endpoint.
+"""
+
+from bisect import bisect_left
+import math
+import threading
+from typing import Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds of the default latency buckets, in seconds
+DEFAULT_BUCKETS = tuple(
+    scale * step for scale in (0.0001, 0.001, 0.01, 0.1, 1.0) for step in (1, 2.5, 5)
+) + (10.0,)
+
+Sample = tuple[str, dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape(value: str) -> str:
+    # label values escape their quotes too, help texts do not
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: "MetricsRegistry | None" = None,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.values: dict[tuple[str, ...], float] = dict()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        with self.lock:
+            values = list(self.values.items())
+        for key, value in values:
+            yield f"{self.name}_total", self._labels(key), value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.values: dict[tuple[str, ...], float] = dict()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def remove(self, **labels: str) -> None:
+        with self.lock:
+            self.values.pop(self._key(labels), None)
+
+    def samples(self) -> Iterator[Sample]:
+        with self.lock:
+            values = list(self.values.items())
+        for key, value in values:
+            yield self.name, self._labels(key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket, with a last +Inf bucket], sum
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = dict()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self.lock:
+            counts, total = self.values.get(key) or self.values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def samples(self) -> Iterator[Sample]:
+        with self.lock:
+            values = [(key, counts[:], total[0]) for key, (counts, total) in self.values.items()]
+        for key, counts, total in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = dict()
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+
+    def render(self, skip_empty: bool = False) -> str:
+        # skip_empty leaves out the metrics without samples, so the output of
+        # processes that record different metrics can be concatenated
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            samples = list(metric.samples())
+            if skip_empty and not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# the registry every metric joins unless it is given another one
+REGISTRY = MetricsRegistry()
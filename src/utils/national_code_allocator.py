@@ -0,0 +1,68 @@
+import random
+import threading
+
+NATIONAL_CODE_MIN = 1_000_000_000
+NATIONAL_CODE_MAX = 9_999_999_999
+
+
+class NationalCodeAllocator:
+    """
+    hands out unique 10-digit national codes in a random-looking order.
+    the n-th code is a keyed permutation of n over the whole code space (a
+    feistel network with cycle walking), so uniqueness needs no lookups.
+    """
+
+    _half_bits = 17
+    _rounds = 4
+
+    def __init__(self, rng: random.Random | None = None) -> None:
+        source = rng or random.Random()
+        self._size = NATIONAL_CODE_MAX - NATIONAL_CODE_MIN + 1
+        self._half_mask = (1 << self._half_bits) - 1
+        self._keys = [source.getrandbits(32) for _ in range(self._rounds)]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _round(self, value: int, key: int) -> int:
+        value = (value * 0x9E3779B1 + key) & 0xFFFFFFFF
+        value ^= value >> 15
+        value = (value * 0x85EBCA6B) & 0xFFFFFFFF
+        return (value ^ (value >> 13)) & self._half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self._half_bits) | right
+
+    def _permute(self, index: int) -> int:
+        # the feistel domain is a bit larger than the code space, walk the
+        # cycle until the value falls back inside it
+        value = self._encrypt(index)
+        while value >= self._size:
+            value = self._encrypt(value)
+        return value
+
+    def allocate_many(self, count: int) -> list[str]:
+        with self._lock:
+            start = self._counter
+            if start + count > self._size:
+                raise RuntimeError("national code space is exhausted")
+            self._counter += count
+        return [str(NATIONAL_CODE_MIN + self._permute(index)) for index in range(start, start + count)]
+
+    def allocate(self) -> str:
+        return self.allocate_many(1)[0]
+
+    def getstate(self) -> dict:
+        with self._lock:
+            return {"keys": list(self._keys), "counter": self._counter}
+
+    def setstate(self, state: dict) -> None:
+        with self._lock:
+            self._keys = list(state["keys"])
+            self._counter = state["counter"]
+
+
+# used by persons created outside of a world model
+default_national_code_allocator = NationalCodeAllocator()
@@ -0,0 +1,101 @@
+"""
+sampling profiler: a background thread records the stack of every other
+thread at a fixed interval. the stacks are kept in the collapsed format
+("frame;frame;frame count" per line) read by flamegraph.pl and speedscope.
+"""
+
+from collections import Counter
+from datetime import datetime
+import os
+import sys
+import threading
+from types import FrameType
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+class SamplingProfiler:
+    def __init__(self) -> None:
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float) -> bool:
+        # returns False when the profiler is already running
+        with self.lock:
+            if self._thread is not None:
+                return False
+            self.stacks.clear()
+            self.samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        logger.info("profiler - started with a %ss interval", interval)
+        return True
+
+    def stop(self) -> bool:
+        # returns False when the profiler was not running
+        with self.lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return False
+        self._stop.set()
+        thread.join()
+        logger.info("profiler - stopped after %s samples", self.samples)
+        return True
+
+    def _run(self, interval: float) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            sampled = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                current: FrameType | None = frame
+                while current is not None:
+                    stack.append(_frame_name(current))
+                    current = current.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                sampled.append(";".join(reversed(stack)))
+            with self.lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        with self.lock:
+            stacks = sorted(self.stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def dump(self, directory: str) -> str:
+        """
+        write the collapsed stacks recorded so far to a new file in `directory`
+        and return its path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now():%Y%m%d-%H%M%S-%f}.folded")
+        with open(path, "w") as profile_file:
+            profile_file.write(self.collapsed())
+        logger.info("profiler - %s samples written to %s", self.samples, path)
+        return path
+
+
+# the profiler of the process, behind the /api/profiler routes
+default_profiler = SamplingProfiler()
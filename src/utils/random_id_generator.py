@@ -1,20 +1,51 @@
 import random
+import threading
+
 
 class UniqueIDGenerator:
-    _available_ids = set(range(1, 1_000))
-    _id_start = 1_001
+    # each id space hands out ids from its own shuffled block of consecutive ids,
+    # popping from the end of the block keeps generate_id O(1)
     _id_increment = 1_000
-    
-    @staticmethod
-    def generate_id():
-        if not UniqueIDGenerator._available_ids:
-            UniqueIDGenerator._extend_id_pool()
-        new_id = random.choice(tuple(UniqueIDGenerator._available_ids))
-        UniqueIDGenerator._available_ids.remove(new_id)
-        return new_id
-    
-    @staticmethod
-    def _extend_id_pool():
-        new_ids = set(range(UniqueIDGenerator._id_start, UniqueIDGenerator._id_start + UniqueIDGenerator._id_increment))
-        UniqueIDGenerator._available_ids.update(new_ids)
-        UniqueIDGenerator._id_start += UniqueIDGenerator._id_increment
+
+    def __init__(self, rng: random.Random | None = None) -> None:
+        self._random = rng or random.Random()
+        self._pools: dict[str, list[int]] = dict()
+        self._id_starts: dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+    def generate_id(self, space: str = "default") -> int:
+        with self._lock:
+            pool = self._pools.get(space)
+            if not pool:
+                pool = self._extend_id_pool(space)
+            return pool.pop()
+
+    def generate_ids(self, count: int, space: str = "default") -> list[int]:
+        # the ids generate_id would return for `count` calls, under one lock
+        ids = []
+        with self._lock:
+            for _ in range(count):
+                pool = self._pools.get(space)
+                if not pool:
+                    pool = self._extend_id_pool(space)
+                ids.append(pool.pop())
+        return ids
+
+    def reserve(self, space: str, last_id: int) -> None:
+        # ids up to last_id are taken, e.g. by objects restored from disk
+        with self._lock:
+            if last_id >= self._id_starts.get(space, 1):
+                self._pools.pop(space, None)
+                self._id_starts[space] = last_id + 1
+
+    def _extend_id_pool(self, space: str) -> list[int]:
+        id_start = self._id_starts.get(space, 1)
+        new_ids = list(range(id_start, id_start + self._id_increment))
+        self._random.shuffle(new_ids)
+        self._pools[space] = new_ids
+        self._id_starts[space] = id_start + self._id_increment
+        return new_ids
+
+
+# used by objects created outside of a world model
+default_id_generator = UniqueIDGenerator()
@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+import pytest
+
+import src.config as config
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    # imported here, importing the app sets up logging outside the output capture
+    from src.main import app
+
+    # small worlds of their own for every test
+    monkeypatch.setattr(config, "API_WORLDS", 2)
+    monkeypatch.setattr(config, "INITIAL_POPULATION", 200)
+    monkeypatch.setattr(config, "INITIAL_STORE_LINE", 10)
+    monkeypatch.setattr(config, "INITIAL_ECU_LINE", 10)
+    monkeypatch.setattr(config, "INITIAL_HOSPITAL_LINE", 10)
+    monkeypatch.setattr(config, "PERSISTENCE_DIR", None)
+    monkeypatch.setattr(config, "ARCHIVE_PATH", None)
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "worldmodel.db"))
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,68 @@
+def register(client, entity_type: str, max_capacity: int = 5) -> int:
+    response = client.post(
+        "/api/register",
+        json={"entity_type": entity_type, "max_capacity": max_capacity, "eav": {}},
+    )
+    return response.json()["entity_id"]
+
+
+def line(client, entity_id: int) -> list[int]:
+    return [person["id"] for person in client.get(f"/api/snapshot/{entity_id}").json()["persons"]]
+
+
+def test_batch_results_follow_the_operations(client):
+    store_id = register(client, "store", max_capacity=2)
+    hospital_id = register(client, "hospital")
+    store_line = line(client, store_id)
+    hospital_line = line(client, hospital_id)
+
+    response = client.post(
+        "/api/batch",
+        json={
+            "operations": [
+                {"op": "accept_person", "entity_id": store_id, "persons_id": store_line[:3]},
+                {"op": "service_done", "entity_id": store_id, "persons_id": store_line[:1]},
+                {"op": "accept_person", "entity_id": -1, "persons_id": [1, 2]},
+                {"op": "person_death", "entity_id": hospital_id, "persons_id": hospital_line[:1]},
+                {"op": "accept_person", "entity_id": store_id, "persons_id": store_line[2:3]},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        # the store is full after two persons, the third keeps their place
+        {
+            "op": "accept_person",
+            "entity_id": store_id,
+            "accepted": store_line[:2],
+            "rejected": store_line[2:3],
+        },
+        {"op": "service_done", "entity_id": store_id, "accepted": store_line[:1], "rejected": []},
+        # a failed operation does not stop the ones after it
+        {"op": "accept_person", "entity_id": -1, "accepted": [], "rejected": [1, 2]},
+        {
+            "op": "person_death",
+            "entity_id": hospital_id,
+            "accepted": hospital_line[:1],
+            "rejected": [],
+        },
+        # the service done above freed a place
+        {
+            "op": "accept_person",
+            "entity_id": store_id,
+            "accepted": store_line[2:3],
+            "rejected": [],
+        },
+    ]
+    assert not set(store_line[:3]) & set(line(client, store_id))
+    dead = client.get(f"/api/person/{hospital_line[0]}").json()
+    assert dead["status"] == "dead"
+
+
+def test_batch_rejects_unknown_operations(client):
+    response = client.post(
+        "/api/batch",
+        json={"operations": [{"op": "teleport", "entity_id": 1, "persons_id": [1]}]},
+    )
+    assert response.status_code == 422
+    assert client.post("/api/batch", json={"operations": []}).json() == {"results": []}
@@ -0,0 +1,24 @@
+def test_routes_are_labelled_by_template(client):
+    for entity_id in (123456, 654321):
+        assert client.get(f"/api/snapshot/{entity_id}").status_code == 404
+    client.get("/api/not-a-route")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE worldmodel_http_request_duration_seconds histogram" in lines
+    snapshot_count = [
+        line
+        for line in lines
+        if line.startswith("worldmodel_http_request_duration_seconds_count{")
+        and 'route="/api/snapshot/{entity_id}"' in line
+        and 'status="404"' in line
+    ]
+    assert len(snapshot_count) == 1
+    assert int(snapshot_count[0].rsplit(" ", 1)[1]) >= 2
+    assert 'route="unmatched"' in response.text
+    # entity ids never become label values
+    assert "123456" not in response.text
+    # the world gauges are filled in for the scrape
+    assert any(line.startswith("worldmodel_") and "world=" in line for line in lines)
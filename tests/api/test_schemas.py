@@ -0,0 +1,53 @@
+from datetime import datetime
+import random
+
+import orjson
+
+from src.api.responses import ORJSONResponse
+from src.api.schemas import PersonResponse, SnapshotResponse
+from src.models.person import Person
+
+
+def test_serialized_bytes_are_sent_as_they_are():
+    assert ORJSONResponse(b'{"a":1}').body == b'{"a":1}'
+    assert ORJSONResponse({"at": datetime(2024, 1, 2, 3, 4, 5)}).body == (
+        b'{"at":"2024-01-02T03:04:05"}'
+    )
+
+
+def test_person_json_matches_its_schema():
+    person = Person.generateRandomPerson(random.Random(1))
+    person_json = person.to_json()
+    parsed = PersonResponse.model_validate_json(person_json)
+    assert parsed.model_dump() == PersonResponse.model_validate(person.to_dict()).model_dump()
+    assert person.to_json() is person_json
+
+    # a change drops the cached json
+    person.die()
+    assert orjson.loads(person.to_json())["status"] == "dead"
+
+
+def test_responses_match_their_schemas(client):
+    entity_id = client.post(
+        "/api/register", json={"entity_type": "store", "max_capacity": 5, "eav": {}}
+    ).json()["entity_id"]
+    response = client.get(f"/api/snapshot/{entity_id}")
+    assert response.headers["content-type"] == "application/json"
+    snapshot = SnapshotResponse.model_validate_json(response.content)
+    assert snapshot.entity_id == entity_id
+
+    person = snapshot.persons[0]
+    by_id = client.get(f"/api/person/{person.id}")
+    assert PersonResponse.model_validate_json(by_id.content) == person
+    by_code = client.get(f"/api/person/national-code/{person.national_code}")
+    assert by_code.content == by_id.content
+
+    assert client.get("/api/person/0").status_code == 404
+
+
+def test_openapi_names_the_response_models(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    schema = paths["/api/person/{person_id}"]["get"]["responses"]["200"]["content"]
+    assert schema["application/json"]["schema"]["$ref"].endswith("/PersonResponse")
+    schema = paths["/api/snapshot/{entity_id}"]["get"]["responses"]["200"]["content"]
+    assert schema["application/json"]["schema"]["$ref"].endswith("/SnapshotResponse")
@@ -0,0 +1,70 @@
+def register(client, entity_type: str = "store", world_id: str = "0") -> int:
+    response = client.post(
+        "/api/register",
+        json={"entity_type": entity_type, "max_capacity": 5, "eav": {}},
+        headers={"X-World-Id": world_id},
+    )
+    assert response.status_code == 200
+    return response.json()["entity_id"]
+
+
+def test_snapshot_has_an_etag(client):
+    entity_id = register(client)
+    response = client.get(f"/api/snapshot/{entity_id}")
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["vary"] == "X-World-Id"
+    body = response.json()
+    assert body["entity_id"] == entity_id
+    assert len(body["persons"]) == 10
+
+
+def test_not_modified(client):
+    entity_id = register(client)
+    etag = client.get(f"/api/snapshot/{entity_id}").headers["etag"]
+    for if_none_match in (
+        etag,
+        f"W/{etag}",
+        f'"other", {etag}',
+        f' "other" ,W/{etag} ',
+        "*",
+    ):
+        response = client.get(
+            f"/api/snapshot/{entity_id}", headers={"If-None-Match": if_none_match}
+        )
+        assert response.status_code == 304, if_none_match
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+
+def test_changed_line_is_sent_again(client):
+    entity_id = register(client)
+    first = client.get(f"/api/snapshot/{entity_id}")
+    etag = first.headers["etag"]
+    for if_none_match in ('"other"', 'W/"other", "more"', etag.strip('"')):
+        response = client.get(
+            f"/api/snapshot/{entity_id}", headers={"If-None-Match": if_none_match}
+        )
+        assert response.status_code == 200, if_none_match
+
+    person_id = first.json()["persons"][0]["id"]
+    client.post("/api/accept-person", json={"entity_id": entity_id, "persons_id": [person_id]})
+    response = client.get(f"/api/snapshot/{entity_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_etags_differ_between_worlds(client):
+    first = register(client, world_id="0")
+    second = register(client, world_id="1")
+    first_etag = client.get(f"/api/snapshot/{first}", headers={"X-World-Id": "0"}).headers["etag"]
+    response = client.get(
+        f"/api/snapshot/{second}", headers={"X-World-Id": "1", "If-None-Match": first_etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != first_etag
+
+
+def test_missing_entity(client):
+    assert client.get("/api/snapshot/1").status_code == 404
+    assert client.get("/api/snapshot/1", headers={"X-World-Id": "9"}).status_code == 404
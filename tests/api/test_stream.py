@@ -0,0 +1,7 @@
+from src.api.routes import format_sse
+
+
+def test_sse_ids_carry_the_token():
+    assert format_sse((7, "joined", b'{"person_id":1}'), "abc") == (
+        b'id: abc-7\nevent: joined\ndata: {"person_id":1}\n\n'
+    )
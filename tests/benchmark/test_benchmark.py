@@ -0,0 +1,66 @@
+import pytest
+
+from src.benchmark.http_load import run_http_load
+from src.benchmark.micro import run_microbenchmarks
+from src.benchmark.stats import percentile, summarize
+import src.config as config
+
+
+def check_summary(result: dict) -> None:
+    assert result["samples"] >= 1
+    assert result["operations"] >= result["samples"]
+    assert 0 < result["p50_us"] <= result["p99_us"]
+    assert result["mean_us"] > 0
+    assert result["ops_per_second"] > 0
+
+
+def test_percentiles_of_known_samples():
+    ordered = [float(value) for value in range(1, 101)]
+    assert percentile(ordered, 0.50) == 50.0
+    assert percentile(ordered, 0.99) == 99.0
+    assert percentile(ordered, 0.07) == 7.0
+    assert percentile(ordered, 1.0) == 100.0
+    assert percentile(ordered, 0.0) == 1.0
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.5) == 0.0
+
+    summary = summarize([0.002, 0.001, 0.004, 0.003], operations=2)
+    assert summary["samples"] == 4
+    assert summary["operations"] == 8
+    assert summary["p50_us"] == pytest.approx(1000)
+    assert summary["p99_us"] == pytest.approx(2000)
+    assert summary["mean_us"] == pytest.approx(1250)
+    assert summary["ops_per_second"] == pytest.approx(800)
+
+
+@pytest.mark.parametrize("store", ["object", "columnar", "sqlite"])
+def test_microbenchmarks_run_once(store):
+    results = run_microbenchmarks([200], store=store, repeat=1)
+    assert [result["benchmark"] for result in results] == [
+        "populate_worldModel",
+        "generate_id",
+        "fill_entity_line",
+        "match_snapshot_persons",
+        "accept_person",
+        "service_done",
+    ]
+    for result in results:
+        assert (result["population"], result["store"]) == (200, store)
+        check_summary(result)
+    assert results[0]["operations"] == 200
+
+
+def test_http_load_runs(tmp_path):
+    results = run_http_load(
+        duration=0.3,
+        population=200,
+        overrides={"ARCHIVE_PATH": None, "SQLITE_PATH": str(tmp_path / "worldmodel.db")},
+    )
+    routes = {result["benchmark"] for result in results}
+    assert {"http:register", "http:snapshot", "http:all"} <= routes
+    for result in results:
+        assert result["agents"] == 3
+        check_summary(result)
+    assert results[-1]["errors"] == 0
+    # the overrides only hold for the run
+    assert config.SQLITE_PATH != str(tmp_path / "worldmodel.db")
@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+from src.cluster.owner import WorldOwner
+from src.cluster.remote import connect_worlds
+from src.cluster.shared_lines import SharedLines
+from src.models.async_world_model import AsyncWorldModel
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.line_events import event_id
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+def run_with_owner(socket_path: str, test) -> None:
+    # an owner serving one world and a worker connected to it, in one event loop
+    async def main():
+        world = AsyncWorldModel(
+            WorldModel(
+                world_config=WorldConfig(
+                    seed=1,
+                    initial_population=100,
+                    initial_store_line=5,
+                    initial_ecu_line=5,
+                    initial_hospital_line=5,
+                ),
+                virtual_clock=True,
+            )
+        )
+        await world.initialize()
+        name = f"worldmodel-test-{os.getpid()}"
+        lines = SharedLines.create(name, 64 * 1024)
+        owner = WorldOwner({"default": world}, {"default": lines})
+        owner.publish("default")
+        server = await asyncio.start_unix_server(owner.handle_connection, socket_path)
+        connection, remote_worlds = await connect_worlds(
+            {"socket": socket_path, "lines": {"default": name}}
+        )
+        try:
+            await test(world, remote_worlds["default"], owner)
+        finally:
+            await connection.close()
+            remote_worlds["default"].close()
+            server.close()
+            await owner.close_connections()
+            await world.stop()
+            lines.close()
+            lines.unlink()
+
+    asyncio.run(main())
+
+
+async def next_event(subscription) -> tuple:
+    return await asyncio.wait_for(subscription.queue.get(), 5)
+
+
+def test_stream_gets_the_line_events_of_the_owner(tmp_path):
+    async def test(world, remote, owner):
+        store_id = (await remote.register("store", 5, {}))["entity_id"]
+        subscription, [(sequence, name, data)] = await remote.open_line_stream(store_id)
+        assert name == "snapshot"
+        assert data == (await world.snapshot(store_id)).to_json()
+        assert subscription.token == world.world_model.instance_token
+
+        line = list(world.world_model.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+        await remote.accept_person(store_id, line[:2])
+        events = [await next_event(subscription), await next_event(subscription)]
+        assert [event[:2] for event in events] == [(sequence + 1, "left"), (sequence + 2, "left")]
+        assert b'"person_id":%d' % line[0] in events[0][2]
+
+        # a resume from the owner history
+        resumed, replayed = await remote.open_line_stream(
+            store_id, event_id(subscription.token, sequence)
+        )
+        assert replayed == events
+        remote.close_line_stream(resumed)
+
+        remote.close_line_stream(subscription)
+        await asyncio.sleep(0.05)
+        assert not remote.owner.streams
+        assert not any(owner.streams.values())
+        assert not world.world_model.line_events._subscriptions[EntityEnum.STORE]
+
+    run_with_owner(str(tmp_path / "owner.sock"), test)
+
+
+def test_foreign_event_id_gets_a_snapshot(tmp_path):
+    async def test(world, remote, owner):
+        store_id = (await remote.register("store", 5, {}))["entity_id"]
+        subscription, events = await remote.open_line_stream(
+            store_id, event_id("0123456789abcdef", 1)
+        )
+        assert [event[1] for event in events] == ["snapshot"]
+        remote.close_line_stream(subscription)
+        assert await remote.open_line_stream(-1) is None
+
+    run_with_owner(str(tmp_path / "owner.sock"), test)
+
+
+def test_streams_end_with_the_connection(tmp_path):
+    async def test(world, remote, owner):
+        store_id = (await remote.register("store", 5, {}))["entity_id"]
+        subscription, _ = await remote.open_line_stream(store_id)
+        await owner.close_connections()
+        await asyncio.sleep(0.05)
+        assert subscription.overflowed
+        assert not world.world_model.line_events._subscriptions[EntityEnum.STORE]
+
+    run_with_owner(str(tmp_path / "owner.sock"), test)
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+
+import orjson
+import pytest
+
+from src.cluster.shared_lines import SharedLine, SharedLines
+from src.models.enums import EntityEnum
+
+
+@pytest.fixture
+def lines():
+    lines = SharedLines.create(f"worldmodel-test-{os.getpid()}", 256)
+    yield lines
+    lines.close()
+    lines.unlink()
+
+
+def test_unpublished_line_reads_none(lines):
+    assert lines.read(EntityEnum.STORE) is None
+    assert lines.sequence(EntityEnum.STORE) == 0
+
+
+def test_write_and_read(lines):
+    assert lines.write(EntityEnum.STORE, b"[1,2]", True, "token-store-3-1")
+    line = lines.read(EntityEnum.STORE)
+    assert line == SharedLine(2, b"[1,2]", True, "token-store-3-1")
+    # the other slots are untouched
+    assert lines.read(EntityEnum.HOSPITAL) is None
+
+    assert lines.write(EntityEnum.STORE, b"[]", False, "v2")
+    assert lines.read(EntityEnum.STORE) == SharedLine(4, b"[]", False, "v2")
+
+
+def test_unchanged_slot_returns_the_cached_line(lines):
+    lines.write(EntityEnum.ECU, b"[1]", False, "v1")
+    first = lines.read(EntityEnum.ECU)
+    assert lines.read(EntityEnum.ECU) is first
+
+
+def test_long_line_overflows(lines):
+    assert not lines.write(EntityEnum.HOSPITAL, b"x" * 257, False, "v1")
+    line = lines.read(EntityEnum.HOSPITAL)
+    assert line is not None
+    assert line.persons_json is None
+    assert line.version == "v1"
+
+
+def test_attach_sees_the_published_lines(lines):
+    lines.write(EntityEnum.STORE, b"[7]", False, "v1")
+    reader = SharedLines.attach(lines.shm.name)
+    try:
+        assert reader.line_size == lines.line_size
+        assert reader.read(EntityEnum.STORE).persons_json == b"[7]"
+    finally:
+        reader.close()
+
+
+def write_lines(name: str, count: int) -> None:
+    lines = SharedLines.attach(name)
+    try:
+        for number in range(count):
+            # the payload length changes with the number, the version names it
+            persons_json = orjson.dumps(list(range(number % 40)))
+            lines.write(EntityEnum.STORE, persons_json, bool(number % 2), str(number))
+    finally:
+        lines.close()
+
+
+def test_reads_are_never_torn(lines):
+    # a reader in this process against a writer in another one: every line
+    # read must be the one its version names
+    writer = multiprocessing.get_context("spawn").Process(
+        target=write_lines, args=(lines.shm.name, 200_000)
+    )
+    writer.start()
+    reads = 0
+    while writer.is_alive() or reads == 0:
+        line = lines.read(EntityEnum.STORE)
+        if line is None:
+            continue
+        number = int(line.version)
+        assert line.persons_json == orjson.dumps(list(range(number % 40)))
+        assert line.earthquake_status == bool(number % 2)
+        reads += 1
+    writer.join()
+    assert writer.exitcode == 0
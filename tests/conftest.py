@@ -0,0 +1,8 @@
+import tempfile
+
+import src.config as config
+
+# the app logger writes its file under LOG_DIR, keep it out of the working tree
+config.LOG_DIR = tempfile.mkdtemp(prefix="worldmodel-tests-")
+# records are written by the thread that logs them, inside the output capture of its test
+config.LOG_QUEUE = False
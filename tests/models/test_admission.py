@@ -0,0 +1,107 @@
+import pytest
+
+from src.models.admission import AdmissionControl
+from src.models.entity import Entity
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+# ==admission control===========================================================
+def test_admit_until_full():
+    admission = AdmissionControl()
+    entity = Entity(EntityEnum.STORE, 2)
+    assert admission.admit(entity, 1)
+    assert admission.admit(entity, 2)
+    assert not admission.admit(entity, 3)
+    assert entity.used_capacity == 2
+    assert admission.is_served_by(entity, 1)
+    assert not admission.is_served_by(entity, 3)
+
+
+def test_release_frees_the_slot():
+    admission = AdmissionControl()
+    entity = Entity(EntityEnum.STORE, 1)
+    admission.admit(entity, 1)
+    assert admission.release(1, {entity.id: entity}) is entity
+    assert entity.used_capacity == 0
+    # a person is released once
+    assert admission.release(1, {entity.id: entity}) is None
+    assert entity.used_capacity == 0
+    assert admission.admit(entity, 2)
+
+
+def test_lower_max_capacity_blocks_admission():
+    admission = AdmissionControl()
+    entity = Entity(EntityEnum.HOSPITAL, 3)
+    for person_id in range(3):
+        admission.admit(entity, person_id)
+    entity.update_max_capacity(1)
+    assert not admission.admit(entity, 5)
+    admission.release(0, {entity.id: entity})
+    admission.release(1, {entity.id: entity})
+    assert not admission.admit(entity, 5)
+    admission.release(2, {entity.id: entity})
+    assert admission.admit(entity, 5)
+
+
+def test_utilization():
+    admission = AdmissionControl()
+    entity = Entity(EntityEnum.ECU, 4)
+    admission.admit(entity, 1)
+    utilization = admission.utilization(entity)
+    assert utilization["used_capacity"] == 1
+    assert utilization["free_capacity"] == 3
+    assert utilization["utilization"] == 0.25
+    assert admission.utilization(Entity(EntityEnum.ECU, 0))["utilization"] is None
+
+
+# ==world capacity rules========================================================
+@pytest.fixture
+def world():
+    world = WorldModel(
+        world_config=WorldConfig(
+            seed=1,
+            initial_population=200,
+            initial_store_line=20,
+            initial_ecu_line=20,
+            initial_hospital_line=20,
+        ),
+        virtual_clock=True,
+    )
+    world.initialize()
+    yield world
+    world.stop()
+
+
+def test_full_entity_keeps_persons_in_line(world):
+    store_id = world.register("store", 2, {})["entity_id"]
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+    result = world.accept_person(store_id, line[:3])
+    assert result == {"accepted": line[:2], "rejected": line[2:3]}
+    assert world.line_index.contains(line[2], EntityEnum.STORE, EntityStatus.INLINE)
+    assert world.entity_utilization(store_id)["used_capacity"] == 2
+
+    world.service_done(store_id, line[:1])
+    assert world.entity_utilization(store_id)["used_capacity"] == 1
+    assert world.accept_person(store_id, line[2:3])["accepted"] == line[2:3]
+
+
+def test_only_the_serving_entity_releases_a_person(world):
+    first = world.register("store", 5, {})["entity_id"]
+    second = world.register("store", 5, {})["entity_id"]
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+    world.accept_person(first, line[:1])
+    assert world.service_done(second, line[:1])["rejected"] == line[:1]
+    assert world.person_injury(second, line[:1])["rejected"] == line[:1]
+    assert world.entity_utilization(first)["used_capacity"] == 1
+
+
+def test_injury_and_death_release_the_slot(world):
+    store_id = world.register("store", 2, {})["entity_id"]
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+    world.accept_person(store_id, line[:2])
+    world.person_injury(store_id, line[:1])
+    world.person_death(store_id, line[1:2])
+    assert world.entity_utilization(store_id)["used_capacity"] == 0
+    assert not world.admission.serving
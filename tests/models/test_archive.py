@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from src.models.archive import PersonArchive
+from src.models.enums import EntityEnum, EntityStatus, PersonStatus
+from src.models.person import Person
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+def dead_persons(count: int) -> list[Person]:
+    rng = random.Random(1)
+    persons = [Person.generateRandomPerson(rng) for _ in range(count)]
+    for person in persons:
+        person.die()
+    return persons
+
+
+# ==person archive=============================================================
+def test_archived_persons_are_read_back(tmp_path):
+    path = str(tmp_path / "archive.bin")
+    persons = dead_persons(3)
+    archive = PersonArchive(path)
+    archive.add(persons)
+    assert len(archive) == 3
+    assert archive.get(persons[1].id).name == persons[1].name
+    assert archive.find_by_national_code(persons[2].national_code).id == persons[2].id
+    assert archive.get(0) is None
+    archive.close()
+
+    reopened = PersonArchive(path)
+    assert len(reopened) == 3
+    assert reopened.get(persons[0].id).status == PersonStatus.DEAD
+    reopened.close()
+
+
+def test_a_person_is_archived_once(tmp_path):
+    archive = PersonArchive(str(tmp_path / "archive.bin"))
+    persons = dead_persons(2)
+    archive.add(persons[:1])
+    archive.add(persons)
+    size = archive.nbytes()
+    archive.add(persons)
+    assert len(archive) == 2
+    assert archive.nbytes() == size
+    archive.close()
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = tmp_path / "archive.bin"
+    archive = PersonArchive(str(path))
+    archive.add(dead_persons(2))
+    archive.close()
+    path.write_bytes(path.read_bytes()[:-3])
+
+    reopened = PersonArchive(str(path))
+    assert len(reopened) == 1
+    reopened.add(dead_persons(2)[1:])
+    reopened.close()
+    assert len(PersonArchive(str(path))) == 2
+
+
+# ==restore====================================================================
+def persisted_world(directory: str) -> WorldModel:
+    world = WorldModel(
+        world_config=WorldConfig(
+            seed=4,
+            persistence_dir=directory,
+            initial_population=200,
+            initial_store_line=10,
+            initial_ecu_line=5,
+            initial_hospital_line=5,
+        ),
+        virtual_clock=True,
+    )
+    world.initialize()
+    return world
+
+
+def kill(world: WorldModel, count: int) -> list[int]:
+    store_id = world.register("store", 5, {})["entity_id"]
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))[:count]
+    assert world.person_death(store_id, line)["accepted"] == line
+    return line
+
+
+@pytest.mark.parametrize("crash_before_log", [False, True])
+def test_restore_keeps_archived_persons_out_of_the_world(tmp_path, crash_before_log):
+    world = persisted_world(str(tmp_path))
+    dead = kill(world, 3)
+    if crash_before_log:
+        # the archive has the persons, the process dies before the log says so
+        world.persistence.log_archived = lambda person_ids: None
+    assert world.archive_dead_persons() == 3
+    population = world.population_by_status()
+    world.persistence.close()
+    world.archive.close()
+
+    restored = persisted_world(str(tmp_path))
+    for person_id in dead:
+        assert person_id not in restored.persons
+        assert restored.get_person(person_id).status == PersonStatus.DEAD
+        national_code = restored.get_person(person_id).national_code
+        assert restored.find_person_by_national_code(national_code).id == person_id
+    assert restored.dead_persons == []
+    assert restored.population_by_status() == population
+    assert len(restored.archive) == 3
+
+    size = restored.archive.nbytes()
+    assert restored.archive_dead_persons() == 0
+    assert restored.archive.nbytes() == size
+    restored.stop()
@@ -0,0 +1,92 @@
+import asyncio
+from dataclasses import replace
+import threading
+
+import pytest
+
+from src.models.async_world_model import AsyncWorldModel
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+def small_world(**overrides) -> WorldModel:
+    world_config = WorldConfig(
+        initial_population=100,
+        initial_store_line=5,
+        initial_ecu_line=5,
+        initial_hospital_line=5,
+        seed=1,
+    )
+    return WorldModel(world_config=replace(world_config, **overrides))
+
+
+def test_virtual_clock_worlds_are_not_started():
+    async def main():
+        world = AsyncWorldModel(WorldModel(virtual_clock=True))
+        with pytest.raises(RuntimeError):
+            world.start()
+        await world.stop()
+
+    asyncio.run(main())
+
+
+def test_events_run_on_the_io_thread():
+    async def main():
+        world = AsyncWorldModel(small_world(time_rate=1000))
+        await world.initialize()
+        assert len(world.world_model.persons) == 100
+
+        ran = asyncio.Event()
+        threads = []
+        loop = asyncio.get_running_loop()
+
+        def probe():
+            threads.append(threading.current_thread())
+            loop.call_soon_threadsafe(ran.set)
+
+        world.world_model.register_periodic_event("probe", 1, probe)
+        world.start()
+        await asyncio.wait_for(ran.wait(), 5)
+        assert threads[0] is not threading.current_thread()
+        assert threads[0].name.startswith("world-model-io")
+
+        await world.stop()
+        assert world.scheduler_task is None
+        count = len(threads)
+        await asyncio.sleep(0.05)
+        assert len(threads) == count
+
+    asyncio.run(main())
+
+
+def test_stop_cancels_the_scheduler_and_writes_the_final_snapshot(tmp_path):
+    async def main():
+        world = AsyncWorldModel(small_world(persistence_dir=str(tmp_path)))
+        await world.initialize()
+        world.start()
+        task = world.scheduler_task
+        store_id = (await world.register("store", 5, {}))["entity_id"]
+        await world.stop()
+        assert task.cancelled()
+        assert world.world_model.persistence.wal is None
+        return store_id
+
+    store_id = asyncio.run(main())
+    restored = small_world(persistence_dir=str(tmp_path))
+    restored.initialize()
+    assert store_id in restored.entities
+    restored.stop()
+
+
+def test_sqlite_calls_run_on_the_io_thread(tmp_path):
+    async def main():
+        world = AsyncWorldModel(
+            small_world(storage="sqlite", sqlite_path=str(tmp_path / "world.db"))
+        )
+        assert world.offload_calls
+        await world.initialize()
+        entity_id = (await world.register("store", 5, {}))["entity_id"]
+        assert await world.snapshot(entity_id)
+        await world.stop()
+
+    asyncio.run(main())
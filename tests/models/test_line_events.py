@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.line_events import LineEventBus, event_id, parse_event_id
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+def test_event_ids_name_the_world_start():
+    assert event_id("abc", 57) == "abc-57"
+    assert parse_event_id("abc", "abc-57") == 57
+    assert parse_event_id("abc", "def-57") is None
+    # a plain number is from before event ids had a token
+    assert parse_event_id("abc", "57") is None
+    assert parse_event_id("abc", "abc-") is None
+    assert parse_event_id("abc", "abc--1") is None
+    assert parse_event_id("abc", None) is None
+
+
+def test_replay_from_the_history():
+    bus = LineEventBus(history=3, token="abc")
+    for number in range(5):
+        bus.publish(EntityEnum.STORE, "joined", b"%d" % number)
+    assert [event[0] for event in bus.replay(EntityEnum.STORE, 2, 5)] == [3, 4, 5]
+    assert bus.replay(EntityEnum.STORE, 5, 5) == []
+    # events 2 and before are gone, and a sequence from the future is not ours
+    assert bus.replay(EntityEnum.STORE, 1, 5) is None
+    assert bus.replay(EntityEnum.STORE, 6, 5) is None
+
+
+@pytest.fixture
+def world():
+    world = WorldModel(
+        world_config=WorldConfig(
+            seed=1,
+            initial_population=100,
+            initial_store_line=5,
+            initial_ecu_line=5,
+            initial_hospital_line=5,
+            line_events_history=10,
+        ),
+        virtual_clock=True,
+    )
+    world.initialize()
+    yield world
+    world.stop()
+
+
+def open_stream(world: WorldModel, entity_id: int, since: str | None) -> list:
+    loop = asyncio.new_event_loop()
+    try:
+        subscription, events = world.open_line_stream(entity_id, loop, since)
+        assert subscription.token == world.instance_token
+        world.close_line_stream(subscription)
+        return events
+    finally:
+        loop.close()
+
+
+def test_resume_or_snapshot(world):
+    store_id = world.register("store", 5, {})["entity_id"]
+    [(sequence, name, _)] = open_stream(world, store_id, None)
+    assert name == "snapshot"
+
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+    world.accept_person(store_id, line[:2])
+    since = event_id(world.instance_token, sequence)
+    assert [event[1] for event in open_stream(world, store_id, since)] == ["left", "left"]
+
+    # an id of another start of the world, a malformed one or one that left the history
+    other_start = event_id("0123456789abcdef", sequence)
+    for last_event_id in (other_start, str(sequence), "garbage"):
+        assert [event[1] for event in open_stream(world, store_id, last_event_id)] == ["snapshot"]
+    world.fill_entity_line(EntityEnum.STORE, 20)
+    assert [event[1] for event in open_stream(world, store_id, since)] == ["snapshot"]
@@ -0,0 +1,216 @@
+import random
+
+import pytest
+
+from src.models.enums import EntityEnum, EntityStatus, PersonStatus
+from src.models.line_index import IdlePool, LineIndex
+from src.models.person import Person
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+def check_positions(pool: IdlePool) -> None:
+    assert len(pool.positions) == len(pool.ids)
+    for position, person_id in enumerate(pool.ids):
+        assert pool.positions[person_id] == position
+
+
+# ==idle pool==================================================================
+def test_pool_swap_remove_keeps_positions():
+    pool = IdlePool()
+    for person_id in range(10):
+        pool[person_id] = None
+    pool[3] = None
+    assert len(pool) == 10
+
+    assert pool.pop(3, False) is None
+    # the last id took the freed slot
+    assert pool.ids[3] == 9
+    assert 3 not in pool
+    check_positions(pool)
+
+    assert pool.pop(8, False) is None
+    assert pool.pop(3, False) is False
+    assert sorted(pool) == [0, 1, 2, 4, 5, 6, 7, 9]
+    check_positions(pool)
+
+
+def test_pool_pop_last_and_only():
+    pool = IdlePool()
+    pool[1] = None
+    pool[2] = None
+    assert pool.pop(2, False) is None
+    assert list(pool) == [1]
+    assert pool.pop(1, False) is None
+    assert len(pool) == 0
+    check_positions(pool)
+
+
+def test_pool_reset():
+    pool = IdlePool()
+    pool[1] = None
+    pool.reset([5, 6, 7])
+    assert list(pool) == [5, 6, 7]
+    assert 1 not in pool
+    check_positions(pool)
+
+
+def test_pool_sample():
+    pool = IdlePool()
+    pool.reset(list(range(100)))
+    sample = pool.sample(random.Random(1), 10)
+    assert len(set(sample)) == 10
+    assert set(sample) <= set(range(100))
+    assert sorted(pool) == list(range(100))
+    check_positions(pool)
+
+    other = IdlePool()
+    other.reset(list(range(100)))
+    assert other.sample(random.Random(1), 10) == sample
+    assert sorted(pool.sample(random.Random(2), 1_000)) == list(range(100))
+
+
+# ==line index=================================================================
+def recording_index() -> tuple[LineIndex, list]:
+    line_index = LineIndex()
+    events: list = []
+    line_index.listener = lambda *event: events.append(event)
+    return line_index, events
+
+
+def test_inline_changes_bump_version_and_notify():
+    line_index, events = recording_index()
+    hospital = (EntityEnum.HOSPITAL, EntityStatus.INLINE)
+
+    line_index.add(1, *hospital)
+    line_index.add(2, *hospital)
+    line_index.touch(2, *hospital)
+    line_index.remove(1, *hospital, event="died")
+    assert events == [
+        ("joined", EntityEnum.HOSPITAL, 1),
+        ("joined", EntityEnum.HOSPITAL, 2),
+        ("updated", EntityEnum.HOSPITAL, 2),
+        ("died", EntityEnum.HOSPITAL, 1),
+    ]
+    assert line_index.version(EntityEnum.HOSPITAL) == 4
+    assert list(line_index.line(*hospital)) == [2]
+
+
+def test_other_lines_are_silent():
+    line_index, events = recording_index()
+    line_index.add(1, EntityEnum.CITY, EntityStatus.IDLE)
+    line_index.move(1, (EntityEnum.CITY, EntityStatus.IDLE), (EntityEnum.ECU, EntityStatus.SERVICE))
+    line_index.touch(1, EntityEnum.ECU, EntityStatus.SERVICE)
+    # removing a person that is not in the line is no change
+    line_index.remove(2, EntityEnum.ECU, EntityStatus.INLINE)
+    assert events == []
+    assert all(version == 0 for version in line_index.versions.values())
+    assert line_index.contains(1, EntityEnum.ECU, EntityStatus.SERVICE)
+    assert line_index.line_length(EntityEnum.CITY, EntityStatus.IDLE) == 0
+
+
+def test_move_between_inline_lines():
+    line_index, events = recording_index()
+    ecu = (EntityEnum.ECU, EntityStatus.INLINE)
+    hospital = (EntityEnum.HOSPITAL, EntityStatus.INLINE)
+    line_index.add(1, *ecu)
+    line_index.move(1, ecu, hospital)
+    line_index.move(1, hospital, hospital)
+    assert events == [
+        ("joined", EntityEnum.ECU, 1),
+        ("left", EntityEnum.ECU, 1),
+        ("joined", EntityEnum.HOSPITAL, 1),
+        ("updated", EntityEnum.HOSPITAL, 1),
+    ]
+    assert line_index.version(EntityEnum.ECU) == 2
+    assert line_index.version(EntityEnum.HOSPITAL) == 2
+
+
+def test_city_idle_line_is_the_pool():
+    line_index = LineIndex()
+    line_index.add(1, EntityEnum.CITY, EntityStatus.IDLE)
+    assert line_index.line(EntityEnum.CITY, EntityStatus.IDLE) is line_index.idle_pool
+    assert 1 in line_index.idle_pool
+
+    line_index.restore_line(EntityEnum.CITY, EntityStatus.IDLE, [4, 5])
+    assert line_index.line(EntityEnum.CITY, EntityStatus.IDLE) is line_index.idle_pool
+    assert list(line_index.idle_pool) == [4, 5]
+
+
+def test_restore_line_keeps_order_without_events():
+    line_index, events = recording_index()
+    line_index.restore_line(EntityEnum.HOSPITAL, EntityStatus.INLINE, [3, 1, 2])
+    assert list(line_index.line(EntityEnum.HOSPITAL, EntityStatus.INLINE)) == [3, 1, 2]
+    assert events == []
+    assert line_index.version(EntityEnum.HOSPITAL) == 0
+
+
+
+# ==population=================================================================
+def test_population_counters():
+    line_index = LineIndex()
+    line_index.count_status(None, PersonStatus.ALIVE)
+    line_index.count_status(None, PersonStatus.ALIVE)
+    line_index.count_status(PersonStatus.ALIVE, PersonStatus.INJURED)
+    line_index.count_status(PersonStatus.INJURED, PersonStatus.DEAD)
+    assert line_index.population == {
+        PersonStatus.ALIVE: 1,
+        PersonStatus.INJURED: 0,
+        PersonStatus.DEAD: 1,
+    }
+
+
+def test_person_status_changes_are_counted():
+    line_index = LineIndex()
+    person = Person.generateRandomPerson(random.Random(1))
+    person.line_index = line_index
+    line_index.count_status(None, person.status)
+    line_index.add(person.id, person.current_entity, person.entity_status)
+
+    person.injure()
+    assert line_index.population[PersonStatus.INJURED] == 1
+    person.heal()
+    person.die()
+    assert line_index.population == {
+        PersonStatus.ALIVE: 0,
+        PersonStatus.INJURED: 0,
+        PersonStatus.DEAD: 1,
+    }
+    assert person.id not in line_index.idle_pool
+
+
+@pytest.mark.parametrize(
+    "person_store, storage", [("object", "memory"), ("columnar", "memory"), ("object", "sqlite")]
+)
+def test_population_counters_match_a_scan(tmp_path, person_store, storage):
+    world = WorldModel(
+        world_config=WorldConfig(
+            seed=2,
+            person_store=person_store,
+            storage=storage,
+            sqlite_path=str(tmp_path / "world.db"),
+            initial_population=300,
+            initial_store_line=20,
+            initial_ecu_line=20,
+            initial_hospital_line=20,
+        ),
+        virtual_clock=True,
+    )
+    world.initialize()
+    store_id = world.register("store", 10, {})["entity_id"]
+    ecu_id = world.register("ecu", 10, {})["entity_id"]
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+    world.accept_person(store_id, line[:6])
+    world.person_injury(store_id, line[:3])
+    world.person_death(store_id, line[3:4])
+    world.accept_person(ecu_id, line[:2])
+    world.person_death(ecu_id, line[:1])
+    world.repopulate()
+    world.archive_dead_persons()
+
+    population = world.population_by_status()
+    assert population[PersonStatus.DEAD] == 2
+    assert population == {
+        status: count for status, count in world.count_population().items() if count
+    }
+    world.stop()
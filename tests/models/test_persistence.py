@@ -0,0 +1,166 @@
+import random
+import threading
+
+import pytest
+
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.persistence import (
+    RECORD_HEADER,
+    RecordKind,
+    WriteAheadLog,
+    decode_persons,
+    encode_persons,
+    encode_record,
+    iter_records,
+    read_records,
+)
+from src.models.person import Person
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+from src.utils.national_code_allocator import NationalCodeAllocator
+
+
+# ==write-ahead log=============================================================
+def test_records_round_trip():
+    data = encode_record(RecordKind.ENTITY, b"first") + encode_record(RecordKind.CAPACITY, b"")
+    records = list(iter_records(data, "test"))
+    assert records == [
+        (0, RecordKind.ENTITY, b"first"),
+        (RECORD_HEADER.size + 5, RecordKind.CAPACITY, b""),
+    ]
+
+
+def test_corrupt_record_ends_the_log():
+    first = encode_record(RecordKind.ENTITY, b"first")
+    second = bytearray(encode_record(RecordKind.ENTITY, b"second"))
+    second[-1] ^= 0xFF
+    third = encode_record(RecordKind.ENTITY, b"third")
+    data = first + bytes(second) + third
+    assert [payload for _, _, payload in iter_records(data, "test")] == [b"first"]
+
+
+@pytest.mark.parametrize("cut", [1, RECORD_HEADER.size - 1, RECORD_HEADER.size + 3])
+def test_torn_tail_is_ignored(cut):
+    first = encode_record(RecordKind.ENTITY, b"first")
+    second = encode_record(RecordKind.ENTITY, b"second")
+    data = first + second[:cut]
+    assert [payload for _, _, payload in iter_records(data, "test")] == [b"first"]
+
+
+def test_read_records(tmp_path):
+    path = tmp_path / "wal-00000001.log"
+    path.write_bytes(
+        encode_record(RecordKind.NATIONAL_CODES, b"{}")
+        + encode_record(RecordKind.ARCHIVED, b"\x01" * 8)[:-1]
+    )
+    assert list(read_records(str(path))) == [(RecordKind.NATIONAL_CODES, b"{}")]
+
+
+def test_wal_writes_appends_in_order(tmp_path):
+    path = str(tmp_path / "wal-00000001.log")
+    wal = WriteAheadLog(path)
+    records = [encode_record(RecordKind.ENTITY, b"%d" % number) for number in range(1000)]
+    threads = [
+        threading.Thread(target=lambda part=part: [wal.append(record) for record in part])
+        for part in (records[:500], records[500:])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wal.append(records[0], records[1])
+    # close returns once everything queued is on file
+    wal.close()
+    payloads = [payload for _, payload in read_records(path)]
+    assert sorted(payloads[:1000], key=int) == [b"%d" % number for number in range(1000)]
+    assert payloads[1000:] == [b"0", b"1"]
+    # the appends of each thread keep their order
+    first = [payload for payload in payloads[:1000] if int(payload) < 500]
+    assert first == sorted(first, key=int)
+
+
+def test_persons_round_trip():
+    allocator = NationalCodeAllocator(random.Random(1))
+    rng = random.Random(1)
+    persons = [Person.generateRandomPerson(rng, national_codes=allocator) for _ in range(3)]
+    persons[1].die()
+    record = encode_persons(persons, 3)
+    [(_, kind, payload)] = iter_records(record, "test")
+    assert kind == RecordKind.PERSONS
+
+    counter, restored = decode_persons(payload)
+    assert counter == 3
+    fields = ("id", "name", "gender", "birth_date", "national_code", "status", "death_date")
+    for person, copy in zip(persons, restored):
+        for field in fields:
+            assert getattr(copy, field) == getattr(person, field)
+        assert (copy.current_entity, copy.entity_status) == (
+            person.current_entity,
+            person.entity_status,
+        )
+
+
+# ==restore=====================================================================
+def world_state(world: WorldModel) -> tuple:
+    persons = {}
+    for person_id in world.persons:
+        person = world.persons[person_id]
+        persons[person_id] = (
+            person.status,
+            person.current_entity,
+            person.entity_status,
+            person.name,
+            person.national_code,
+        )
+    lines = {
+        key: list(line)
+        for key, line in world.line_index.lines.items()
+        if key != (EntityEnum.CITY, EntityStatus.IDLE)
+    }
+    entities = {
+        entity_id: (entity.entity_type, entity.max_capacity, entity.used_capacity)
+        for entity_id, entity in world.entities.items()
+    }
+    return (
+        persons,
+        lines,
+        entities,
+        sorted(world.line_index.idle_pool),
+        dict(world.national_code_index),
+        dict(world.admission.serving),
+        world.population_by_status(),
+    )
+
+
+@pytest.mark.parametrize("person_store", ["object", "columnar"])
+def test_restore_from_snapshot_and_wal(tmp_path, person_store):
+    world_config = WorldConfig(
+        seed=3,
+        person_store=person_store,
+        persistence_dir=str(tmp_path),
+        initial_population=300,
+        initial_store_line=20,
+        initial_ecu_line=20,
+        initial_hospital_line=20,
+    )
+    world = WorldModel(world_config=world_config, virtual_clock=True)
+    world.initialize()
+    # everything below is only in the write-ahead log
+    store_id = world.register("store", 10, {"name": "store"})["entity_id"]
+    world.register("ecu", 5, {})
+    line = list(world.line_index.line(EntityEnum.STORE, EntityStatus.INLINE))
+    world.accept_person(store_id, line[:5])
+    world.person_injury(store_id, line[:2])
+    world.service_done(store_id, line[2:4])
+    world.person_death(store_id, line[4:5])
+    world.repopulate()
+    before = world_state(world)
+    # no final snapshot, as after a crash
+    world.persistence.close()
+
+    restored = WorldModel(world_config=world_config, virtual_clock=True)
+    restored.initialize()
+    assert world_state(restored) == before
+    # new ids do not collide with the restored ones
+    assert restored.register("store", 1, {})["entity_id"] not in before[2]
+    restored.stop()
@@ -0,0 +1,67 @@
+import logging
+import random
+
+from src.models.enums import EntityEnum, EntityStatus, PersonStatus
+from src.models.person import Person
+from src.models.person_generator import generate_persons
+from src.utils.logger import APP_LOGGER_NAME
+from src.utils.national_code_allocator import NationalCodeAllocator
+from src.utils.random_id_generator import UniqueIDGenerator
+
+
+def generate(count: int, seed: int) -> list[Person]:
+    return generate_persons(
+        count,
+        random.Random(seed),
+        UniqueIDGenerator(random.Random(seed)),
+        NationalCodeAllocator(random.Random(seed)),
+    )
+
+
+def test_persons_are_idle_in_the_city():
+    persons = generate(3_000, 1)
+    assert len({person.id for person in persons}) == 3_000
+    assert len({person.national_code for person in persons}) == 3_000
+    for person in persons:
+        assert isinstance(person, Person)
+        assert person.status == PersonStatus.ALIVE
+        assert (person.current_entity, person.entity_status) == (EntityEnum.CITY, EntityStatus.IDLE)
+        assert person.death_date is None
+        assert person.line_index is None
+        assert " " in person.name
+        assert person.to_json()
+
+
+def test_same_seed_gives_same_persons():
+    first = [person.to_dict() for person in generate(100, 7)]
+    second = [person.to_dict() for person in generate(100, 7)]
+    for person in first + second:
+        del person["creation_date"], person["modified_date"]
+    assert first == second
+
+
+def test_ids_match_generate_id():
+    generator = UniqueIDGenerator(random.Random(3))
+    reference = UniqueIDGenerator(random.Random(3))
+    ids = generator.generate_ids(2_500, "person")
+    assert ids == [reference.generate_id("person") for _ in range(2_500)]
+
+
+class RecordCounter(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records += 1
+
+
+def test_no_log_record_per_person():
+    app_logger = logging.getLogger(APP_LOGGER_NAME)
+    counter = RecordCounter()
+    app_logger.addHandler(counter)
+    try:
+        generate(1_000, 1)
+    finally:
+        app_logger.removeHandler(counter)
+    assert counter.records == 0
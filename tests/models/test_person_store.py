@@ -0,0 +1,103 @@
+import random
+
+from src.models.enums import PersonStatus
+from src.models.person import Person
+from src.models.person_generator import generate_persons
+from src.models.person_store import ColumnarNationalCodeIndex, ColumnarPersonStore
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+
+
+def add_persons(store: ColumnarPersonStore, count: int) -> list[Person]:
+    persons = generate_persons(count, random.Random(1))
+    for person in persons:
+        store[person.id] = person
+    return persons
+
+
+def test_views_read_and_write_the_columns():
+    store = ColumnarPersonStore()
+    [person, other] = add_persons(store, 2)
+    view = store[person.id]
+    assert view.to_dict() == person.to_dict()
+    assert person.id in store and 0 not in store and "1" not in store
+    assert store.get(0) is None
+    assert len(store) == 2
+
+    view.die()
+    assert store[person.id].status == PersonStatus.DEAD
+    assert store[person.id].death_date is not None
+    assert store.count_by_status()[PersonStatus.DEAD] == 1
+
+    del store[other.id]
+    assert other.id not in store
+    assert list(store) == [person.id]
+
+
+def test_json_cache_is_bounded():
+    store = ColumnarPersonStore(json_cache_size=5)
+    ids = [person.id for person in add_persons(store, 20)]
+    for person_id in ids:
+        store[person_id].to_json()
+    assert list(store.json_cache) == ids[-5:]
+
+    store[ids[-5]].to_json()
+    store[ids[0]].to_json()
+    assert ids[-4] not in store.json_cache
+    assert ids[-5] in store.json_cache
+
+    # a change drops the cached json
+    store[ids[0]].die()
+    assert ids[0] not in store.json_cache
+    assert b'"dead"' in store[ids[0]].to_json()
+
+
+def test_national_code_index():
+    store = ColumnarPersonStore()
+    persons = add_persons(store, 3000)
+    index = ColumnarNationalCodeIndex(store)
+    assert len(index) == 3000
+    # sized for the persons, not a table of a slot per national code
+    assert index.nbytes() <= 16 * 3000
+    assert dict(index) == {person.national_code: person.id for person in persons}
+
+    removed = persons[::2]
+    for person in removed:
+        assert index.pop(person.national_code) == person.id
+    assert index.pop(removed[0].national_code) is None
+    assert len(index) == 1500
+    for person in persons[1::2]:
+        assert index.get(person.national_code) == person.id
+    assert index.get(removed[1].national_code) is None
+
+    # codes are only found by their own spelling
+    national_code = persons[1].national_code
+    for other_spelling in ("0" + national_code, f" {national_code}", "x", ""):
+        assert index.get(other_spelling) is None
+
+    # new codes reuse the table, tombstones are dropped when it is rebuilt
+    for person in removed:
+        index[person.national_code] = person.id
+    assert len(index) == 3000
+    assert dict(index) == {person.national_code: person.id for person in persons}
+
+
+def test_world_with_columnar_store():
+    world = WorldModel(
+        world_config=WorldConfig(
+            seed=1,
+            person_store="columnar",
+            initial_population=200,
+            initial_store_line=5,
+            initial_ecu_line=5,
+            initial_hospital_line=5,
+        ),
+        virtual_clock=True,
+    )
+    world.initialize()
+    assert isinstance(world.national_code_index, ColumnarNationalCodeIndex)
+    assert world.persons.line_index is world.line_index
+    for person_id in list(world.persons)[:20]:
+        national_code = world.persons[person_id].national_code
+        assert world.find_person_by_national_code(national_code).id == person_id
+    world.stop()
@@ -0,0 +1,89 @@
+import random
+
+from src.models.enums import EntityEnum
+from src.models.repository import ANY_VALUE, EavRepository
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+from src.utils.random_id_generator import UniqueIDGenerator
+
+
+def repository() -> tuple[EavRepository, UniqueIDGenerator]:
+    return EavRepository(), UniqueIDGenerator(random.Random(1))
+
+
+def test_find_by_name_and_value():
+    eavs, ids = repository()
+    assert eavs.apply(1, {"City": "tehran", "beds": 10}, ids)
+    eavs.apply(2, {"city": "shiraz"}, ids)
+    # names are case insensitive
+    assert eavs.find("CITY") == {1, 2}
+    assert eavs.find("city", ANY_VALUE) == {1, 2}
+    assert eavs.find("city", "tehran") == {1}
+    assert eavs.find("beds", 10) == {1}
+    assert eavs.find("beds", "10") == set()
+    assert eavs.find("missing") == set()
+
+
+def test_list_values_are_found_by_each_item():
+    eavs, ids = repository()
+    eavs.apply(1, {"tags": ["a", "b"], "meta": {"y": 2, "x": 1}}, ids)
+    eavs.apply(2, {"tags": ["b"]}, ids)
+    assert eavs.find("tags", "a") == {1}
+    assert eavs.find("tags", "b") == {1, 2}
+    assert eavs.find("tags", ["a", "b"]) == {1}
+    assert eavs.find("tags", ["b", "a"]) == set()
+    # dict keys are compared in any order
+    assert eavs.find("meta", {"x": 1, "y": 2}) == {1}
+
+
+def test_index_follows_the_diff():
+    eavs, ids = repository()
+    eavs.apply(1, {"city": "tehran", "tags": ["a", "b"], "beds": 1}, ids)
+    [beds] = [attribute for attribute in eavs.get(1) if attribute.name == "beds"]
+
+    assert eavs.apply(1, {"city": "shiraz", "tags": ["b", "c"], "beds": 1}, ids)
+    assert eavs.find("city", "tehran") == set()
+    assert eavs.find("city", "shiraz") == {1}
+    assert eavs.find("tags", "a") == set()
+    assert eavs.find("tags", "b") == {1}
+    assert eavs.find("tags", "c") == {1}
+    # an unchanged attribute keeps its object
+    assert [attribute for attribute in eavs.get(1) if attribute.name == "beds"] == [beds]
+
+    # true is not 1, the value changes and is found by its own key
+    assert eavs.apply(1, {"city": "shiraz", "tags": ["b", "c"], "beds": True}, ids)
+    assert eavs.find("beds", 1) == set()
+    assert eavs.find("beds", True) == {1}
+
+    assert not eavs.apply(1, {"city": "shiraz", "tags": ["b", "c"], "beds": True}, ids)
+    assert eavs.apply(1, {"city": "shiraz"}, ids)
+    assert eavs.find("tags") == set()
+    assert eavs.find("tags", "b") == set()
+    assert eavs.find("beds") == set()
+
+
+def test_world_finds_entities_by_attribute():
+    world = WorldModel(
+        world_config=WorldConfig(
+            seed=1,
+            initial_population=50,
+            initial_store_line=5,
+            initial_ecu_line=5,
+            initial_hospital_line=5,
+        ),
+        virtual_clock=True,
+    )
+    world.initialize()
+    store_id = world.register("store", 5, {"zone": ["north", "east"]})["entity_id"]
+    hospital_id = world.register("hospital", 5, {"zone": ["north"]})["entity_id"]
+
+    def found(value, entity_type=None) -> list[int]:
+        entities = world.find_entities("zone", value, entity_type)
+        return [entity["entity_id"] for entity in entities]
+
+    assert found("north") == sorted([store_id, hospital_id])
+    assert found("north", EntityEnum.HOSPITAL) == [hospital_id]
+    assert world.update_self(store_id, 5, {"zone": ["south"]})
+    assert found("north") == [hospital_id]
+    assert found("south") == [store_id]
+    world.stop()
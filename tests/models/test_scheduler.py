@@ -0,0 +1,70 @@
+from src.models.scheduler import EventScheduler, VirtualClock
+
+
+def virtual_scheduler() -> tuple[EventScheduler, VirtualClock]:
+    clock = VirtualClock()
+    return EventScheduler(clock, time_rate=1), clock
+
+
+def test_periodic_events_keep_their_grid():
+    scheduler, clock = virtual_scheduler()
+    runs = []
+    event = scheduler.schedule_periodic("tick", lambda: runs.append(clock()), 10)
+    assert scheduler.run_until(35, clock) == 3
+    assert runs == [10, 20, 30]
+    assert clock() == 35
+    assert event.due == 40
+
+
+def test_missed_occurrences_are_skipped():
+    scheduler, clock = virtual_scheduler()
+    dues = []
+
+    def slow() -> None:
+        dues.append(event.last_due)
+        if len(dues) == 1:
+            # the first run takes the clock past two more occurrences
+            clock.now = 47
+
+    event = scheduler.schedule_periodic("slow", slow, 10)
+    scheduler.run_until(60, clock)
+    # the run due at 20 is late and runs once, 30 and 40 are dropped,
+    # the next runs are back on the grid
+    assert dues == [10, 20, 50, 60]
+
+
+def test_run_until_runs_in_due_order():
+    scheduler, clock = virtual_scheduler()
+    runs = []
+    for name, due in (("c", 5), ("a", 3), ("b", 3), ("late", 12)):
+        scheduler.schedule(name, lambda name=name: runs.append((name, clock())), due)
+    scheduler.schedule("cancelled", lambda: runs.append("cancelled"), 4).cancel()
+
+    # events due at the same clock run in the order they were scheduled
+    assert scheduler.run_until(4, clock) == 2
+    assert runs == [("a", 3), ("b", 3)]
+    assert clock() == 4
+    assert scheduler.run_until(10, clock) == 1
+    assert runs[-1] == ("c", 5)
+    assert clock() == 10
+
+    # an event scheduled by another one runs in the same call when it is due
+    def chain() -> None:
+        scheduler.schedule("next", lambda: runs.append("next"), 11)
+
+    scheduler.schedule("chain", chain, 10)
+    assert scheduler.run_until(11, clock) == 2
+    assert runs[-1] == "next"
+
+
+def test_a_failing_event_does_not_stop_the_others():
+    scheduler, clock = virtual_scheduler()
+    runs = []
+
+    def broken() -> None:
+        raise ValueError("broken")
+
+    scheduler.schedule("broken", broken, 1)
+    scheduler.schedule("after", lambda: runs.append(clock()), 2)
+    assert scheduler.run_until(5, clock) == 2
+    assert runs == [2]
@@ -0,0 +1,54 @@
+import random
+
+from src.models.person import Person
+from src.models.sqlite_storage import SQLiteStorage
+
+
+def add_persons(storage: SQLiteStorage, count: int) -> list[int]:
+    rng = random.Random(1)
+    ids = []
+    for _ in range(count):
+        person = Person.generateRandomPerson(rng)
+        storage.persons[person.id] = person
+        ids.append(person.id)
+    return ids
+
+
+def test_json_cache_is_bounded(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "world.db"), batch_size=10, json_cache_size=5)
+    ids = add_persons(storage, 20)
+    for person_id in ids:
+        storage.persons[person_id].to_json()
+    assert list(storage.persons.json_cache) == ids[-5:]
+
+    # a read keeps a person cached, the least recently read one is dropped
+    storage.persons[ids[-5]].to_json()
+    storage.persons[ids[0]].to_json()
+    assert ids[-4] not in storage.persons.json_cache
+    assert ids[-5] in storage.persons.json_cache
+    assert len(storage.persons.json_cache) == 5
+    storage.close()
+
+
+def test_json_cache_follows_changes(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "world.db"), json_cache_size=5)
+    [person_id] = add_persons(storage, 1)
+    person = storage.persons[person_id]
+    before = person.to_json()
+    person.die()
+    assert person_id not in storage.persons.json_cache
+    after = storage.persons[person_id].to_json()
+    assert after != before
+    assert b'"dead"' in after
+    storage.close()
+
+
+def test_national_code_lookup(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "world.db"), batch_size=3)
+    ids = add_persons(storage, 4)
+    # three rows are flushed, the last one is still pending
+    for person_id in ids:
+        national_code = storage.persons[person_id].national_code
+        assert storage.national_code_index.get(national_code) == person_id
+    assert storage.national_code_index.get("0") is None
+    storage.close()
@@ -0,0 +1,58 @@
+from src.models.enums import EntityEnum, EntityStatus
+from src.models.world_config import WorldConfig
+from src.models.world_model import WorldModel
+from src.simulation.runner import run_simulation
+
+SMALL_WORLD = {
+    "INITIAL_POPULATION": 300,
+    "INITIAL_STORE_LINE": 20,
+    "INITIAL_ECU_LINE": 20,
+    "INITIAL_HOSPITAL_LINE": 20,
+    "PERSISTENCE_DIR": None,
+    "ARCHIVE_PATH": None,
+}
+# measured by the wall clock, they differ from run to run
+TIMINGS = ("elapsed_seconds", "clocks_per_second", "calls_per_second")
+
+
+def report(seed: int) -> dict:
+    # long enough for an earthquake and its injuries and deaths
+    result = run_simulation(400, 1, seed, SMALL_WORLD)
+    for key in TIMINGS:
+        result.pop(key)
+    return result
+
+
+def test_same_seed_same_simulation():
+    first = report(7)
+    assert first == report(7)
+    assert first["calls"] > 0
+    assert first != report(8)
+
+
+def world_state(seed: int) -> tuple:
+    world = WorldModel(
+        world_config=WorldConfig(seed=seed).with_overrides(SMALL_WORLD), virtual_clock=True
+    )
+    world.initialize()
+    assert world.advance(120) > 0
+    state = (
+        world.clock(),
+        {
+            person_id: (person.name, person.national_code, person.status, person.current_entity)
+            for person_id, person in world.persons.items()
+        },
+        [
+            list(world.line_index.line(entity_type, EntityStatus.INLINE))
+            for entity_type in EntityEnum
+        ],
+    )
+    world.stop()
+    return state
+
+
+def test_same_seed_same_world():
+    clock, persons, lines = world_state(3)
+    assert clock == 120
+    assert (clock, persons, lines) == world_state(3)
+    assert persons != world_state(4)[1]
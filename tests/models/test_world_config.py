@@ -0,0 +1,43 @@
+from dataclasses import FrozenInstanceError
+
+import pytest
+
+from src.models.world_config import WorldConfig
+import src.config as config
+
+
+def test_defaults_come_from_config(monkeypatch):
+    monkeypatch.setattr(config, "TIME_RATE", 7)
+    monkeypatch.setattr(config, "INITIAL_POPULATION", 123)
+    world_config = WorldConfig()
+    assert world_config.time_rate == 7
+    assert world_config.initial_population == 123
+    assert world_config.seed is None
+
+
+def test_overrides_use_the_config_names():
+    world_config = WorldConfig(seed=1)
+    overridden = world_config.with_overrides(
+        {"INITIAL_POPULATION": 10, "archive_path": None, "JSON_CACHE_SIZE": 5}
+    )
+    assert overridden.initial_population == 10
+    assert overridden.archive_path is None
+    assert overridden.json_cache_size == 5
+    # the other settings are kept and the original is left as it was
+    assert overridden.seed == 1
+    assert overridden.time_rate == world_config.time_rate
+    assert world_config.initial_population == config.INITIAL_POPULATION
+    assert world_config.with_overrides({}) == world_config
+
+
+def test_unknown_overrides_are_refused():
+    with pytest.raises(ValueError, match="NOT_A_SETTING"):
+        WorldConfig().with_overrides({"NOT_A_SETTING": 1})
+    # module settings that are not per world are not overrides either
+    with pytest.raises(ValueError):
+        WorldConfig().with_overrides({"API_WORLDS": 2})
+
+
+def test_world_config_is_frozen():
+    with pytest.raises(FrozenInstanceError):
+        WorldConfig().seed = 3
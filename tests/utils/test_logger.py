@@ -0,0 +1,72 @@
+import logging
+import queue
+import sys
+
+import orjson
+
+from src.utils import logger as logger_module
+from src.utils.logger import (
+    APP_LOGGER_NAME,
+    JsonFormatter,
+    LazyQueueHandler,
+    SamplingFilter,
+    get_logger,
+)
+import src.config as config
+
+
+def record(level: int, msg: str = "%s persons", args: tuple = (3,), exc_info=None):
+    return logging.LogRecord("worldmodel.test", level, __file__, 1, msg, args, exc_info)
+
+
+def test_sampling_keeps_warnings(monkeypatch):
+    sampled = SamplingFilter(0.25)
+    monkeypatch.setattr(logger_module.random, "random", lambda: 0.1)
+    assert sampled.filter(record(logging.INFO))
+    monkeypatch.setattr(logger_module.random, "random", lambda: 0.5)
+    assert not sampled.filter(record(logging.INFO))
+    assert not sampled.filter(record(logging.DEBUG))
+    assert sampled.filter(record(logging.WARNING))
+    assert sampled.filter(record(logging.ERROR))
+
+    assert not SamplingFilter(0).filter(record(logging.INFO))
+    assert SamplingFilter(1).filter(record(logging.INFO))
+
+
+def test_per_module_levels(monkeypatch):
+    monkeypatch.setattr(config, "LOG_LEVELS", {"tests.quiet": "ERROR"})
+    quiet = get_logger("tests.quiet", "DEBUG")
+    assert quiet.name == f"{APP_LOGGER_NAME}.tests.quiet"
+    # the config wins over the level asked for in the code
+    assert quiet.level == logging.ERROR
+    assert not quiet.isEnabledFor(logging.WARNING)
+
+    loud = get_logger("tests.loud", "DEBUG")
+    assert loud.level == logging.DEBUG
+    # a logger without a level of its own follows the app logger
+    assert get_logger(f"{APP_LOGGER_NAME}.tests.default").level == logging.NOTSET
+
+
+def test_queue_handler_leaves_formatting_to_the_listener():
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.handle(record(logging.INFO))
+    queued = log_queue.get_nowait()
+    assert (queued.msg, queued.args) == ("%s persons", (3,))
+    assert queued.getMessage() == "3 persons"
+
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        handler.handle(record(logging.ERROR, exc_info=sys.exc_info()))
+    queued = log_queue.get_nowait()
+    # the traceback can not cross to the listener, it is formatted right away
+    assert queued.exc_info is None
+    assert "ValueError: broken" in queued.msg
+
+
+def test_json_lines():
+    line = orjson.loads(JsonFormatter().format(record(logging.WARNING)))
+    assert line["level"] == "WARNING"
+    assert line["logger"] == "worldmodel.test"
+    assert line["message"] == "3 persons"
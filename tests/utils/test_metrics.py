@@ -0,0 +1,62 @@
+import pytest
+
+from src.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_text_format():
+    registry = MetricsRegistry()
+    requests = Counter("app_requests", 'calls, "all" of them', ("route",), registry=registry)
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    requests.inc(route='say "hi"\n')
+    Gauge("app_up", "1 when up", registry=registry).set(1)
+
+    assert registry.render() == (
+        '# HELP app_requests calls, "all" of them\n'
+        "# TYPE app_requests counter\n"
+        'app_requests_total{route="/a"} 3\n'
+        'app_requests_total{route="say \\"hi\\"\\n"} 1\n'
+        "# HELP app_up 1 when up\n"
+        "# TYPE app_up gauge\n"
+        "app_up 1\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = Histogram(
+        "app_seconds", "latency", ("route",), registry=registry, buckets=(0.1, 1.0)
+    )
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, route="/a")
+
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        # a value on a bound falls in its bucket
+        'app_seconds_bucket{route="/a",le="0.1"} 2',
+        'app_seconds_bucket{route="/a",le="1"} 3',
+        'app_seconds_bucket{route="/a",le="+Inf"} 4',
+        'app_seconds_sum{route="/a"} 3.65',
+        'app_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_empty_metrics_can_be_skipped():
+    registry = MetricsRegistry()
+    Gauge("app_unused", "never set", registry=registry)
+    Gauge("app_used", "set", registry=registry).set(0.5)
+    assert "app_unused" in registry.render()
+    assert registry.render(skip_empty=True) == (
+        "# HELP app_used set\n# TYPE app_used gauge\napp_used 0.5\n"
+    )
+
+
+def test_labels_and_names_are_checked():
+    registry = MetricsRegistry()
+    requests = Counter("app_requests", "calls", ("route",), registry=registry)
+    with pytest.raises(ValueError):
+        requests.inc(path="/a")
+    with pytest.raises(ValueError):
+        requests.inc()
+    with pytest.raises(ValueError):
+        Counter("app_requests", "again", registry=registry)
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from src.utils.national_code_allocator import (
+    NATIONAL_CODE_MAX,
+    NATIONAL_CODE_MIN,
+    NationalCodeAllocator,
+)
+
+
+def test_codes_are_unique_ten_digit_strings():
+    allocator = NationalCodeAllocator(random.Random(1))
+    codes = allocator.allocate_many(50_000)
+    assert len(set(codes)) == len(codes)
+    for code in codes:
+        assert len(code) == 10
+        assert NATIONAL_CODE_MIN <= int(code) <= NATIONAL_CODE_MAX
+
+
+def test_same_seed_gives_same_codes():
+    first = NationalCodeAllocator(random.Random(7)).allocate_many(100)
+    second = NationalCodeAllocator(random.Random(7)).allocate_many(100)
+    other = NationalCodeAllocator(random.Random(8)).allocate_many(100)
+    assert first == second
+    assert first != other
+
+
+def test_allocate_continues_allocate_many():
+    allocator = NationalCodeAllocator(random.Random(3))
+    reference = NationalCodeAllocator(random.Random(3)).allocate_many(11)
+    codes = allocator.allocate_many(10)
+    codes.append(allocator.allocate())
+    assert codes == reference
+
+
+def test_setstate_continues_after_getstate():
+    allocator = NationalCodeAllocator(random.Random(5))
+    allocator.allocate_many(1_000)
+    state = allocator.getstate()
+    expected = allocator.allocate_many(100)
+
+    restored = NationalCodeAllocator(random.Random(99))
+    restored.setstate(state)
+    assert restored.allocate_many(100) == expected
+
+
+def test_exhausted_code_space_raises():
+    allocator = NationalCodeAllocator(random.Random(1))
+    allocator.setstate({**allocator.getstate(), "counter": NATIONAL_CODE_MAX - NATIONAL_CODE_MIN})
+    allocator.allocate()
+    with pytest.raises(RuntimeError):
+        allocator.allocate()